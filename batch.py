@@ -0,0 +1,245 @@
+"""
+Модуль пакетной обработки - команды редактора над множеством файлов без окна
+
+Каждый файл обрабатывается отдельным HeadlessEditor в процессе из пула
+(ProcessPoolExecutor): те же загрузка, поиск, замена, сортировка и
+сохранение, что и в окне. Результат по каждому файлу печатается строкой
+JSON, как только файл готов, поэтому порядок строк - порядок завершения.
+Запуск: python main.py <команда> ... (см. python main.py <команда> -h)
+"""
+
+import fnmatch
+import json
+import os
+import sys
+import time
+
+
+DEFAULT_PATTERNS = ("*.txt", "*.wcd")
+# Заданий в очереди пула на один процесс: хватает, чтобы процессы не простаивали,
+# а список из тысяч файлов не превращается в тысячи ожидающих заданий
+PENDING_PER_WORKER = 4
+MAX_MATCHES = 100
+CONTEXT_CHARS = 200
+FILE_TIMEOUT = 600
+FORMATS = {"txt": ".txt", "wcd": ".wcd"}
+
+
+def collect_files(paths, patterns=DEFAULT_PATTERNS):
+    """Файлы из списка путей; каталоги обходятся рекурсивно по шаблонам имен"""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, subdirectories, names in os.walk(path):
+            subdirectories.sort()
+            for name in sorted(names):
+                if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                    yield os.path.join(directory, name)
+
+
+def output_path(path, options, extension=None):
+    """Куда записать результат: на место файла или в каталог вывода; None - не записывать"""
+    if options.get("output_dir"):
+        relative = os.path.relpath(os.path.abspath(path), options["root"])
+        target = os.path.join(options["output_dir"], relative)
+    elif options.get("in_place"):
+        target = path
+    else:
+        return None
+    if extension is not None:
+        target = os.path.splitext(target)[0] + extension
+    return target
+
+
+def save(editor, path, options, extension=None):
+    target = output_path(path, options, extension)
+    if target is None:
+        return None
+    directory = os.path.dirname(target)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    editor.save(target, timeout=FILE_TIMEOUT)
+    return target
+
+
+def select_all(editor):
+    """Выделить весь текст, кроме перевода строки в конце файла; False - выделять нечего"""
+    text_area = editor.text_area
+    end = "end-2c" if text_area.get("end-2c", "end-1c") == "\n" else "end-1c"
+    text_area.tag_remove("sel", "1.0", "end")
+    text_area.tag_add("sel", "1.0", end)
+    return bool(text_area.tag_ranges("sel"))
+
+
+def make_query(options):
+    from search import SearchQuery
+    return SearchQuery(options["pattern"], options.get("case_sensitive", False),
+                       options.get("whole_word", False), options.get("regex", False))
+
+
+# === ОПЕРАЦИИ НАД ОДНИМ ФАЙЛОМ ===
+
+def op_stats(editor, path, options):
+    stats = editor.text_stats
+    return {"chars": stats.chars, "words": stats.words, "lines": stats.lines,
+            "bytes": os.path.getsize(path)}
+
+
+def op_find(editor, path, options):
+    snapshot = editor.document.snapshot()
+    engine = editor.search_engine
+    hits = engine.search(snapshot, make_query(options))
+    text = snapshot.text()
+    matches = []
+    for start, end in zip(engine.starts[:options.get("max_matches", MAX_MATCHES)], engine.ends):
+        line, column = snapshot.offset_to_index(start).split(".")
+        line_start = text.rfind("\n", 0, start) + 1
+        line_end = text.find("\n", end)
+        if line_end < 0:
+            line_end = len(text)
+        matches.append({"line": int(line), "column": int(column), "match": text[start:end],
+                        "context": text[line_start:min(line_end, line_start + CONTEXT_CHARS)]})
+    return {"hits": hits, "matches": matches}
+
+
+def op_replace_all(editor, path, options):
+    from search import apply_replacements, find_replacements
+    snapshot = editor.document.snapshot()
+    edits = find_replacements(snapshot, make_query(options), options["replacement"])
+    count = apply_replacements(editor.text_area, snapshot, edits)
+    return {"replaced": count, "written": save(editor, path, options) if count else None}
+
+
+def op_sort(editor, path, options):
+    if select_all(editor):
+        editor.sort_selection(options.get("reverse", False))
+    return {"lines": editor.text_stats.lines, "written": save(editor, path, options)}
+
+
+def op_case(editor, path, options):
+    mode = options["mode"]
+    if not select_all(editor):
+        pass
+    elif mode == "cycle":
+        # Как кнопка «Регистр»: ВЕРХНИЙ -> нижний -> Заглавные -> ВЕРХНИЙ
+        editor.change_case()
+    else:
+        text = editor.text_area.get("sel.first", "sel.last")
+        editor.replace_selection(getattr(text, mode)())
+    return {"mode": mode, "written": save(editor, path, options)}
+
+
+def op_convert(editor, path, options):
+    extension = FORMATS[options["to"]]
+    if os.path.splitext(path)[1].lower() == extension and not options.get("output_dir"):
+        return {"written": None, "skipped": "файл уже в этом формате"}
+    if not options.get("output_dir"):
+        # Новый файл рядом с исходным: исходный не перезаписывается
+        options = dict(options, in_place=True)
+    return {"written": save(editor, path, options, extension)}
+
+
+OPERATIONS = {
+    "stats": op_stats,
+    "find": op_find,
+    "replace-all": op_replace_all,
+    "sort": op_sort,
+    "case": op_case,
+    "convert": op_convert,
+}
+
+
+def process_file(command, path, options):
+    """Выполнить команду над одним файлом (в процессе пула)"""
+    from headless import HeadlessEditor
+    started = time.perf_counter()
+    result = {"file": path, "command": command}
+    try:
+        with HeadlessEditor() as editor:
+            editor.open(path, timeout=FILE_TIMEOUT)
+            result.update(OPERATIONS[command](editor, path, options))
+        result["ok"] = True
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def run(command, paths, options, jobs=None, patterns=DEFAULT_PATTERNS, out=sys.stdout):
+    """Обработать файлы пулом процессов, печатая результаты строками JSON
+
+    Возвращает код выхода: 0 - все файлы обработаны, 1 - были ошибки.
+    """
+    # Пул импортируется здесь: main.py импортирует модуль и при запуске окна
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    files = collect_files(paths, patterns)
+    paths = [os.path.abspath(path) for path in paths]
+    options = dict(options, root=os.path.commonpath(paths) if paths else os.getcwd())
+    if paths and not os.path.isdir(options["root"]):
+        options["root"] = os.path.dirname(options["root"])
+    jobs = jobs or os.cpu_count() or 1
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < jobs * PENDING_PER_WORKER:
+                path = next(files, None)
+                if path is None:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(process_file, command, path, options))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                failed += not result["ok"]
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+    return 1 if failed else 0
+
+
+def add_commands(subparsers):
+    """Подкоманды пакетного режима для парсера main.py"""
+    def add(name, help, *arguments, query=False, output=True):
+        """arguments - позиционные аргументы перед путями: (имя, параметры add_argument)"""
+        parser = subparsers.add_parser(name, help=help)
+        if query:
+            parser.add_argument("pattern", help="что искать")
+            parser.add_argument("--case-sensitive", action="store_true", help="учитывать регистр")
+            parser.add_argument("--whole-word", action="store_true", help="слово целиком")
+            parser.add_argument("--regex", action="store_true", help="регулярное выражение")
+        for argument, options in arguments:
+            parser.add_argument(argument, **options)
+        parser.add_argument("paths", nargs="+", help="файлы и каталоги (обходятся рекурсивно)")
+        parser.add_argument("-j", "--jobs", type=int, help="число процессов (по умолчанию - ядер)")
+        parser.add_argument("--glob", action="append",
+                            help=f"шаблон имен в каталогах (по умолчанию {', '.join(DEFAULT_PATTERNS)})")
+        if output:
+            parser.add_argument("--in-place", action="store_true", help="перезаписать исходные файлы")
+            parser.add_argument("--output-dir", help="записать результаты в каталог, сохраняя пути")
+        return parser
+
+    add("stats", "число символов, слов и строк", output=False)
+    parser = add("find", "найти совпадения", query=True, output=False)
+    parser.add_argument("--max-matches", type=int, default=MAX_MATCHES,
+                        help="сколько совпадений выводить по файлу")
+    add("replace-all", "заменить все совпадения",
+        ("replacement", {"help": "на что заменить (\\1 - группы выражения)"}), query=True)
+    parser = add("sort", "отсортировать строки")
+    parser.add_argument("--reverse", action="store_true", help="от Я до А")
+    add("case", "изменить регистр", ("mode", {"choices": ("upper", "lower", "title", "cycle")}))
+    parser = add("convert", "преобразовать формат (.txt <-> .wcd); без --output-dir - файл рядом",
+                 output=False)
+    parser.add_argument("--to", choices=tuple(FORMATS), required=True)
+    parser.add_argument("--output-dir", help="записать результаты в каталог, сохраняя пути")
+
+
+def main(args):
+    """Выполнить подкоманду, разобранную парсером main.py"""
+    options = {name: value for name, value in vars(args).items()
+               if name not in ("command", "paths", "jobs", "glob") and not name.startswith("_")}
+    return run(args.command, args.paths, options, args.jobs, tuple(args.glob or DEFAULT_PATTERNS))
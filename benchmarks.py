@@ -0,0 +1,465 @@
+"""
+Замеры производительности редактора
+
+Запуск:
+  python benchmarks.py                      целевые замеры (нужен дисплей или Xvfb)
+  python benchmarks.py run -o result.json   команды редактора на документах 1 КБ - 100 МБ
+  python benchmarks.py compare base.json result.json   регрессии относительно базы
+
+run по умолчанию работает без окна (headless.HeadlessEditor); --backend tk
+создает настоящее окно редактора: xvfb-run python benchmarks.py run --backend tk
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+from document import Document
+from fileio import new_hasher
+from history import DocumentHistory
+from richformat import apply_header, encode_runs, header_prefix, read_rich
+from search import SearchQuery, apply_replacements, find_replacements
+
+
+def make_text(size, seed=0):
+    """Случайный текст из слов и строк заданного размера"""
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "текст", "строка", "документ", "формат"]
+    lines = []
+    total = 0
+    while total < size:
+        line = " ".join(rng.choice(words) for _ in range(rng.randint(4, 14)))
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)[:size]
+
+
+def make_rich_file(path, size, runs, seed=0):
+    """Файл .wcd с текстом size символов и runs отрезками тегов"""
+    text = make_text(size, seed)
+    tags = ["bold", "italic", "underline", "color", "bgcolor", "heading", "size_14", "font_Georgia"]
+    options = {
+        "bold": {"font": ["Arial", 12, "bold"]},
+        "italic": {"font": ["Arial", 12, "italic"]},
+        "underline": {"underline": 1},
+        "color": {"foreground": "#c83232"},
+        "bgcolor": {"background": "#ffff00"},
+        "heading": {"font": ["Arial", 18, "bold"]},
+        "size_14": {"font": ["Arial", 14]},
+        "font_Georgia": {"font": ["Georgia", 12]},
+    }
+    step = size // runs
+    ranges = {tag: [] for tag in tags}
+    for number in range(runs):
+        start = number * step
+        ranges[tags[number % len(tags)]].append((start, start + max(1, step // 2)))
+    header = {
+        "tags": [[tag, options[tag]] for tag in tags],
+        "runs": {tag: encode_runs(tag_ranges) for tag, tag_ranges in ranges.items()},
+    }
+    with open(path, "w", encoding="utf-8", newline="\n") as file:
+        file.write(header_prefix(header))
+        file.write(text)
+
+
+def bench_rich_load(size=5 << 20, runs=100_000):
+    """Загрузка документа .wcd 5 МБ со 100 тыс. отрезков стилей (цель - меньше секунды)"""
+    root = tk.Tk()
+    root.withdraw()
+    text_area = tk.Text(root)
+    text_area.pack()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.wcd")
+        make_rich_file(path, size, runs)
+        start = time.perf_counter()
+        header, text = read_rich(path)
+        text_area.insert("1.0", text)
+        apply_header(text_area, header, text)
+        text_area.update_idletasks()
+        elapsed = time.perf_counter() - start
+    root.destroy()
+    return {"name": "rich_load", "size": size, "runs": runs, "seconds": elapsed, "ok": elapsed < 1.0}
+
+
+def make_needle_text(size, hits, needle="needle", seed=0):
+    """Текст size символов, в котором needle встречается ровно hits раз"""
+    text = make_text(size - hits * len(needle), seed)
+    step = len(text) // hits
+    parts = [text[number * step:(number + 1) * step] for number in range(hits)]
+    parts.append(text[hits * step:])
+    return needle.join(parts)
+
+
+def bench_replace_all(size=20 << 20, hits=100_000):
+    """Замена 100 тыс. совпадений в документе 20 МБ точечными правками
+
+    Проверяется, что теги остального текста и положение вида сохраняются,
+    для сравнения замеряется прежняя перезапись всего текста.
+    """
+    root = tk.Tk()
+    root.withdraw()
+    text_area = tk.Text(root, undo=True, maxundo=-1)
+    text_area.pack()
+    text = make_needle_text(size, hits)
+    text_area.insert("1.0", text)
+    text_area.tag_add("bold", "1.0", "end")
+    text_area.yview_moveto(0.5)
+    text_area.update_idletasks()
+    view = text_area.yview()
+    snapshot = Document(text).snapshot()
+
+    start = time.perf_counter()
+    edits = find_replacements(snapshot, SearchQuery("needle", case_sensitive=True), "pin")
+    count = apply_replacements(text_area, snapshot, edits)
+    text_area.update_idletasks()
+    elapsed = time.perf_counter() - start
+    kept = len(text_area.tag_ranges("bold")) == 2 and text_area.yview() == view
+
+    rewrite_start = time.perf_counter()
+    content = text_area.get("1.0", "end-1c")
+    text_area.delete("1.0", "end")
+    text_area.insert("1.0", content.replace("pin", "needle"))
+    text_area.update_idletasks()
+    rewrite = time.perf_counter() - rewrite_start
+    root.destroy()
+    return {"name": "replace_all", "size": size, "hits": count, "seconds": elapsed,
+            "rewrite_seconds": rewrite, "ok": count == hits and kept}
+
+
+def bench_history(size=10 << 20, revisions=1000, edits=5):
+    """1000 сохранений документа 10 МБ: объем истории и время восстановления
+
+    Восстанавливается самая дальняя от полной копии ревизия (цель - меньше секунды).
+    """
+    rng = random.Random(0)
+    document = Document(make_text(size))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.txt")
+        history = DocumentHistory(document, path)
+        # Отпечаток текста в редакторе считает поток сохранения, здесь он вне замера
+        commit_seconds = 0.0
+        for number in range(revisions):
+            for _ in range(edits):
+                offset = rng.randrange(len(document))
+                if rng.random() < 0.7:
+                    document.insert(offset, "правка ")
+                else:
+                    document.delete(offset, min(offset + 20, len(document)))
+            snapshot = document.snapshot()
+            hasher = new_hasher()
+            for chunk in snapshot.iter_chunks():
+                hasher.update(chunk.encode("utf-8"))
+            digest = hasher.hexdigest()
+            start = time.perf_counter()
+            history.mark()
+            history.commit(path, snapshot, digest)
+            commit_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        history.close()
+        commit_seconds += time.perf_counter() - start
+        store = history.store
+        storage = store.storage_size()
+        worst = max(range(len(store.revisions)),
+                    key=lambda position: (position % store.checkpoint_interval, position))
+        start = time.perf_counter()
+        store.restore(worst)
+        elapsed = time.perf_counter() - start
+    return {"name": "history_restore", "size": size, "revisions": revisions, "seconds": elapsed,
+            "commit_seconds": commit_seconds, "storage_bytes": storage,
+            "ok": elapsed < 1.0 and storage < 20 * size}
+
+
+# === НАБОР ЗАМЕРОВ КОМАНД ===
+
+# Размеры документов, символов
+SIZES = {"1K": 1 << 10, "64K": 1 << 16, "1M": 1 << 20, "10M": 10 << 20, "100M": 100 << 20}
+DEFAULT_SIZES = ("1K", "64K", "1M", "10M")
+REPEATS = 3
+# Совпадений needle на килобайт документа - работа для поиска и замены
+HITS_PER_KB = 1
+# Отрезков, которым назначается стиль в замере форматирования
+FORMAT_RUNS = 1000
+WAIT_TIMEOUT = 600
+# Регрессия - замер медленнее базы больше чем на долю порога и больше чем на
+# NOISE_FLOOR секунд (миллисекундные замеры маленьких документов шумят)
+REGRESSION_THRESHOLD = 0.2
+NOISE_FLOOR = 0.002
+
+
+def make_editor(backend="headless"):
+    """Редактор для замеров: без окна или настоящее окно (нужен дисплей)
+
+    Журнал, история версий и индекс поиска выключены в обоих случаях,
+    чтобы фоновые потоки не искажали замеры.
+    """
+    from headless import HeadlessDialogs, HeadlessEditor
+    if backend == "headless":
+        return HeadlessEditor()
+    from gui import WordClone
+
+    class BenchWindow(WordClone):
+        def offer_recovery(self):
+            # Журналы настоящих сеансов замеры не трогают
+            pass
+
+    editor = BenchWindow()
+    editor.answers = HeadlessDialogs()
+    editor.messagebox = editor.filedialog = editor.colorchooser = editor.answers
+    editor.journal_enabled = editor.history_enabled = editor.search_index_enabled = False
+    editor.stop_journal(discard=True)
+    editor.stop_history()
+    editor.update()
+    return editor
+
+
+def wait(editor, until, timeout=WAIT_TIMEOUT):
+    """Крутить цикл событий редактора, пока until() не станет истинным"""
+    deadline = time.perf_counter() + timeout
+    while not until():
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"Команда не закончилась за {timeout} с")
+        editor.update()
+        time.sleep(0.001)
+
+
+def settle(editor):
+    """Дать окну перерисоваться (без окна - выполнить вызовы простоя)"""
+    editor.update()
+
+
+def load(editor, path):
+    editor.load_file(path)
+    wait(editor, lambda: editor.loader is None)
+    settle(editor)
+
+
+def select(editor, start="1.0", end="end-1c"):
+    editor.text_area.tag_remove("sel", "1.0", "end")
+    editor.text_area.tag_add("sel", start, end)
+
+
+def command_open_file(editor, path):
+    editor.answers.paths.append(path)
+    start = time.perf_counter()
+    editor.open_file()
+    wait(editor, lambda: editor.loader is None)
+    settle(editor)
+    return time.perf_counter() - start
+
+
+def command_save_file(editor, path):
+    load(editor, path)
+    # Другой файл: сохранение пишет документ целиком
+    editor.current_file = path + ".saved"
+    start = time.perf_counter()
+    editor.save_file()
+    wait(editor, lambda: editor.saver is None and editor.pending_save is None)
+    elapsed = time.perf_counter() - start
+    os.remove(path + ".saved")
+    return elapsed
+
+
+def command_update_status(editor, path):
+    load(editor, path)
+    select(editor)
+    start = time.perf_counter()
+    editor.update_status()
+    wait(editor, lambda: editor.status_pending is None)
+    return time.perf_counter() - start
+
+
+def command_find(editor, path):
+    """Цикл поиска диалога «Найти»: все совпадения и их подсветка"""
+    load(editor, path)
+    query = SearchQuery("needle")
+    start = time.perf_counter()
+    snapshot = editor.document.snapshot()
+    editor.search_engine.clear()
+    editor.search_engine.search(snapshot, query, editor.search_index)
+    editor.search_highlighter.show(snapshot, editor.search_engine.starts, editor.search_engine.ends)
+    settle(editor)
+    return time.perf_counter() - start
+
+
+def command_replace_all(editor, path):
+    """«Заменить все» диалога замены"""
+    load(editor, path)
+    query = SearchQuery("needle")
+    start = time.perf_counter()
+    snapshot = editor.document.snapshot()
+    apply_replacements(editor.text_area, snapshot, find_replacements(snapshot, query, "pin"))
+    settle(editor)
+    return time.perf_counter() - start
+
+
+def command_sort(editor, path):
+    load(editor, path)
+    select(editor)
+    start = time.perf_counter()
+    editor.sort_selection()
+    settle(editor)
+    return time.perf_counter() - start
+
+
+def command_change_case(editor, path):
+    load(editor, path)
+    select(editor)
+    start = time.perf_counter()
+    editor.change_case()
+    settle(editor)
+    return time.perf_counter() - start
+
+
+def command_update_zoom(editor, path):
+    load(editor, path)
+    editor.zoom_level = 150
+    start = time.perf_counter()
+    editor.update_zoom()
+    settle(editor)
+    elapsed = time.perf_counter() - start
+    editor.zoom_level = 100
+    editor.update_zoom()
+    return elapsed
+
+
+def command_format(editor, path):
+    """Жирный, курсив и подчеркивание на FORMAT_RUNS отрезках по всему документу"""
+    load(editor, path)
+    snapshot = editor.document.snapshot()
+    runs = max(1, min(FORMAT_RUNS, len(snapshot) // 32))
+    step = len(snapshot) // runs
+    changes = ({"weight": "bold"}, {"slant": "italic"}, {"underline": True})
+    start = time.perf_counter()
+    for number in range(runs):
+        offset = number * step
+        select(editor, snapshot.offset_to_index(offset), snapshot.offset_to_index(offset + step // 2))
+        editor.apply_char_style(**changes[number % len(changes)])
+    settle(editor)
+    return time.perf_counter() - start
+
+
+COMMANDS = {
+    "open_file": command_open_file,
+    "save_file": command_save_file,
+    "update_status": command_update_status,
+    "find": command_find,
+    "replace_all": command_replace_all,
+    "sort": command_sort,
+    "change_case": command_change_case,
+    "update_zoom": command_update_zoom,
+    "format": command_format,
+}
+
+
+def run_suite(backend="headless", sizes=DEFAULT_SIZES, names=None, repeats=REPEATS, log=print):
+    """Замерить команды на документах заданных размеров; время - лучший из повторов"""
+    names = list(names or COMMANDS)
+    results = []
+    editor = make_editor(backend)
+    with tempfile.TemporaryDirectory() as directory:
+        for label in sizes:
+            size = SIZES[label]
+            path = os.path.join(directory, f"bench_{label}.txt")
+            with open(path, "w", encoding="utf-8", newline="\n") as file:
+                file.write(make_needle_text(size, max(1, size * HITS_PER_KB >> 10)))
+            for name in names:
+                runs = [COMMANDS[name](editor, path) for _ in range(repeats)]
+                results.append({"name": name, "size": label, "chars": size,
+                                "seconds": min(runs), "runs": runs})
+                if log is not None:
+                    log(f"{name:<16} {label:>5} {min(runs):10.4f} с")
+    if backend == "headless":
+        editor.close()
+    else:
+        editor.destroy()
+    return {"created": time.time(), "backend": backend, "python": platform.python_version(),
+            "platform": platform.platform(), "repeats": repeats, "results": results}
+
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD, noise=NOISE_FLOOR):
+    """Строки сравнения (команда, размер, база, сейчас, отношение, вывод)"""
+    base = {(result["name"], result["size"]): result["seconds"] for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        key = (result["name"], result["size"])
+        seconds = result["seconds"]
+        if key not in base:
+            rows.append(key + (None, seconds, None, "нет в базе"))
+            continue
+        before = base[key]
+        ratio = seconds / before if before else float("inf")
+        if seconds > before * (1 + threshold) and seconds - before > noise:
+            verdict = "РЕГРЕССИЯ"
+        elif seconds < before * (1 - threshold) and before - seconds > noise:
+            verdict = "быстрее"
+        else:
+            verdict = ""
+        rows.append(key + (before, seconds, ratio, verdict))
+    return rows
+
+
+def run_targets():
+    for bench in (bench_rich_load, bench_replace_all, bench_history):
+        result = bench()
+        status = "OK" if result.get("ok", True) else "МЕДЛЕННО"
+        print(f"{result['name']:<20} {result['seconds']:.3f} с  {status}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности редактора")
+    commands = parser.add_subparsers(dest="command")
+    run = commands.add_parser("run", help="замерить команды редактора")
+    run.add_argument("--backend", choices=("headless", "tk"), default="headless",
+                     help="headless - без окна, tk - окно редактора (дисплей или Xvfb)")
+    run.add_argument("--sizes", default=",".join(DEFAULT_SIZES),
+                     help=f"размеры документов через запятую из {', '.join(SIZES)}")
+    run.add_argument("--only", help=f"команды через запятую из {', '.join(COMMANDS)}")
+    run.add_argument("--repeats", type=int, default=REPEATS)
+    run.add_argument("-o", "--output", help="записать результаты в JSON")
+    compare = commands.add_parser("compare", help="сравнить результаты с базой")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                         help="допустимое замедление, доля (0.2 - на 20%%)")
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        run_targets()
+        return 0
+    if args.command == "run":
+        sizes = [label.strip() for label in args.sizes.split(",") if label.strip()]
+        names = [name.strip() for name in args.only.split(",")] if args.only else None
+        unknown = [label for label in sizes if label not in SIZES]
+        unknown += [name for name in names or () if name not in COMMANDS]
+        if unknown:
+            parser.error(f"неизвестные размеры или команды: {', '.join(unknown)}")
+        data = run_suite(args.backend, sizes, names, args.repeats)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                json.dump(data, file, ensure_ascii=False, indent=1)
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(args.current, encoding="utf-8") as file:
+        current = json.load(file)
+    if baseline.get("backend") != current.get("backend"):
+        print(f"Внимание: база снята с {baseline.get('backend')}, замер - с {current.get('backend')}")
+    rows = compare_results(baseline, current, args.threshold)
+    for name, size, before, seconds, ratio, verdict in rows:
+        before_text = f"{before:10.4f}" if before is not None else " " * 10
+        ratio_text = f"{ratio:6.2f}x" if ratio is not None else " " * 7
+        print(f"{name:<16} {size:>5} {before_text} {seconds:10.4f} {ratio_text}  {verdict}")
+    regressions = sum(1 for row in rows if row[-1] == "РЕГРЕССИЯ")
+    print(f"Регрессий: {regressions}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Модуль уборки тегов - сжатие и удаление ненужных тегов в фоне
+
+Проход разбит на шаги: тег разбирается порциями по RANGE_CHUNK отрезков,
+и между порциями управление возвращается в цикл событий. Отрезки читаются
+из виджета в начале разбора тега; если между порциями изменились текст или
+теги, тег откладывается до следующего прохода. Уборка снимает с тега
+отрезки, полностью перекрытые тегами выше по приоритету, которые задают те
+же настройки; сливает тег с соседним по приоритету тегом с теми же
+настройками; удаляет тег без отрезков.
+"""
+
+from heapq import merge
+import time
+
+from richformat import TRANSIENT_TAGS, tag_options
+from styles import index_key
+
+
+# Сколько отрезков разбирается за один шаг
+RANGE_CHUNK = 500
+
+
+def read_ranges_steps(text_area, tag, ranges):
+    """Отрезки тега порциями: в ranges дописываются ((строка, столбец), (строка, столбец))"""
+    indices = text_area.tag_ranges(tag)
+    for first in range(0, len(indices), 2 * RANGE_CHUNK):
+        keys = [index_key(index) for index in indices[first:first + 2 * RANGE_CHUNK]]
+        ranges.extend(zip(keys[::2], keys[1::2]))
+        yield
+
+
+def union_steps(range_lists, merged):
+    """Объединение упорядоченных списков отрезков порциями, результат - в merged"""
+    for count, (start, end) in enumerate(merge(*range_lists), 1):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+        if count % RANGE_CHUNK == 0:
+            yield
+
+
+def intersect_steps(first, second, result):
+    """Пересечение двух упорядоченных списков непересекающихся отрезков порциями"""
+    i = j = 0
+    count = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            result.append((start, end))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+        count += 1
+        if count % RANGE_CHUNK == 0:
+            yield
+
+
+def flatten(ranges):
+    indices = []
+    for (line, column), (end_line, end_column) in ranges:
+        indices.append(f"{line}.{column}")
+        indices.append(f"{end_line}.{end_column}")
+    return indices
+
+
+class TagCompactor:
+    """Уборка тегов текстовой области по шагам
+
+    styles - StyleRegistry: его теги удаляются только через sweep.
+    garbage - функция, возвращающая теги, все отрезки которых уже не нужны.
+    version - функция, значение которой меняется при правке текста или тегов.
+    """
+
+    def __init__(self, text_area, styles, garbage=lambda: (), version=lambda: None):
+        self.text_area = text_area
+        self.styles = styles
+        self.garbage = garbage
+        self.version = version
+        self.steps = None
+        self.report = {"tags": 0, "ranges": 0, "seconds": 0.0}
+        self.last = None
+
+    def start(self):
+        """Начать новый проход"""
+        self.steps = self.pass_steps()
+        self.report = {"tags": 0, "ranges": 0, "seconds": 0.0}
+
+    def run(self, budget):
+        """Выполнять шаги не дольше budget секунд (хотя бы один); True - проход закончен"""
+        if self.steps is None:
+            self.start()
+        started = time.perf_counter()
+        deadline = started + budget
+        finished = False
+        while True:
+            if next(self.steps, None) is None:
+                finished = True
+                break
+            if time.perf_counter() >= deadline:
+                break
+        self.report["seconds"] += time.perf_counter() - started
+        if finished:
+            self.steps = None
+            self.last = self.report
+        return finished
+
+    def pass_steps(self):
+        for tag in self.garbage():
+            if self.text_area.tag_ranges(tag):
+                self.report["ranges"] += len(self.text_area.tag_ranges(tag)) // 2
+                self.text_area.tag_remove(tag, "1.0", "end")
+            yield True
+        for tag in self.text_area.tag_names():
+            if tag not in TRANSIENT_TAGS:
+                yield from self.tag_steps(tag)
+        self.report["tags"] += self.styles.sweep()
+        yield True
+
+    def tag_steps(self, tag):
+        """Шаги уборки тега; после правки между шагами тег ждет следующего прохода"""
+        version = self.version()
+        for _ in self.compact_tag(tag):
+            yield True
+            if self.version() != version:
+                return
+        yield True
+
+    def compact_tag(self, tag):
+        """Уборка одного тега порциями (генератор шагов)"""
+        text = self.text_area
+        names = text.tag_names()
+        if tag not in names:
+            return
+        ranges = []
+        yield from read_ranges_steps(text, tag, ranges)
+        registered = tag in self.styles.styles
+        if not ranges:
+            if not registered:
+                text.tag_delete(tag)
+                self.report["tags"] += 1
+            return
+        options = tag_options(text, tag)
+        if not options:
+            return
+        higher = names[names.index(tag) + 1:]
+        if not registered and higher and higher[0] not in TRANSIENT_TAGS \
+                and higher[0] not in self.styles.styles and tag_options(text, higher[0]) == options:
+            # Соседний по приоритету тег с теми же настройками: отрезки переходят к нему.
+            # Прерванный перенос безвреден: отрезок под обоими тегами выглядит так же
+            before = len(ranges) + len(text.tag_ranges(higher[0])) // 2
+            for first in range(0, len(ranges), RANGE_CHUNK):
+                text.tag_add(higher[0], *flatten(ranges[first:first + RANGE_CHUNK]))
+                yield
+            text.tag_delete(tag)
+            self.report["tags"] += 1
+            self.report["ranges"] += before - len(text.tag_ranges(higher[0])) // 2
+            return
+        # Отрезки, где каждую настройку тега перекрывает тег выше
+        higher_ranges = {}
+        for name in higher:
+            if name in TRANSIENT_TAGS or (registered and name in self.styles.styles):
+                continue
+            values = tag_options(text, name)
+            if any(option in values for option in options):
+                higher_ranges[name] = (values, [])
+                yield from read_ranges_steps(text, name, higher_ranges[name][1])
+        cover = None
+        for option in options:
+            covering = []
+            yield from union_steps([found for values, found in higher_ranges.values() if option in values],
+                                   covering)
+            if cover is not None:
+                intersection = []
+                yield from intersect_steps(cover, covering, intersection)
+                covering = intersection
+            cover = covering
+            if not cover:
+                return
+        # Только целиком перекрытые отрезки: частичная обрезка дробила бы тег
+        shadowed = []
+        j = 0
+        for count, (start, end) in enumerate(ranges, 1):
+            while j < len(cover) and cover[j][1] <= start:
+                j += 1
+            if j < len(cover) and cover[j][0] <= start and end <= cover[j][1]:
+                shadowed.append((start, end))
+            if count % RANGE_CHUNK == 0:
+                yield
+        for first in range(0, len(shadowed), RANGE_CHUNK):
+            # Text.tag_remove принимает один отрезок, команда Tk - любое число
+            indices = flatten(shadowed[first:first + RANGE_CHUNK])
+            text.tk.call((text._w, "tag", "remove", tag) + tuple(indices))
+            yield
+        self.report["ranges"] += len(shadowed)
+        if shadowed and len(shadowed) == len(ranges) and not registered:
+            text.tag_delete(tag)
+            self.report["tags"] += 1
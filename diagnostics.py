@@ -0,0 +1,107 @@
+"""
+Модуль диагностики памяти - что занимает память в сеансе редактора
+
+Сводка собирается по запросу из уже имеющегося состояния: теги текстовой
+области, стек отмены, буферы документа, окна и изображения Tk. Снимки
+tracemalloc включаются отдельно: трассировка замедляет каждое выделение
+памяти, поэтому она работает только между start и stop.
+"""
+
+import time
+import tkinter as tk
+import tracemalloc
+
+
+TRACE_FRAMES = 10
+TOP_DIFFS = 25
+
+
+def tag_stats(text_area, largest=10):
+    """Число тегов, их отрезков и теги с наибольшим числом отрезков"""
+    names = text_area.tag_names()
+    ranges = {tag: len(text_area.tag_ranges(tag)) // 2 for tag in names}
+    return {
+        "tags": len(names),
+        "ranges": sum(ranges.values()),
+        "largest": sorted(ranges.items(), key=lambda item: item[1], reverse=True)[:largest],
+    }
+
+
+def window_stats(root):
+    """Виджеты, окна Toplevel (видимые и спрятанные) и изображения Tk"""
+    widgets = toplevels = visible = 0
+    pending = [root]
+    while pending:
+        widget = pending.pop()
+        widgets += 1
+        if isinstance(widget, tk.Toplevel):
+            toplevels += 1
+            if widget.winfo_viewable():
+                visible += 1
+        pending.extend(widget.winfo_children())
+    images = {}
+    photo_bytes = 0
+    for name in root.tk.splitlist(root.tk.call("image", "names")):
+        kind = str(root.tk.call("image", "type", name))
+        images[kind] = images.get(kind, 0) + 1
+        if kind == "photo":
+            # Tk хранит пиксели фото по 4 байта
+            photo_bytes += 4 * int(root.tk.call("image", "width", name)) * int(root.tk.call("image", "height", name))
+    return {"widgets": widgets, "toplevels": toplevels, "visible_toplevels": visible,
+            "images": images, "photo_bytes": photo_bytes}
+
+
+class MemoryTracer:
+    """Снимки tracemalloc: mark - опорная точка, diff - что выросло с нее"""
+
+    def __init__(self, frames=TRACE_FRAMES):
+        self.frames = frames
+        self.baseline = None
+        self.marked = None
+        self.last_diff = None
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not self.tracing:
+            tracemalloc.start(self.frames)
+        self.mark()
+
+    def stop(self):
+        if self.tracing:
+            tracemalloc.stop()
+        self.baseline = None
+        self.marked = None
+
+    def snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def mark(self):
+        self.baseline = self.snapshot()
+        self.marked = time.time()
+
+    def diff(self, limit=TOP_DIFFS):
+        """Строки кода с наибольшим ростом памяти с опорной точки"""
+        if self.baseline is None:
+            return None
+        stats = self.snapshot().compare_to(self.baseline, "lineno")
+        self.last_diff = [{
+            "where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size": stat.size,
+            "size_diff": stat.size_diff,
+            "count_diff": stat.count_diff,
+        } for stat in stats[:limit]]
+        return self.last_diff
+
+    def stats(self):
+        if not self.tracing:
+            return {"tracing": False}
+        current, peak = tracemalloc.get_traced_memory()
+        return {"tracing": True, "current": current, "peak": peak, "marked": self.marked,
+                "overhead": tracemalloc.get_tracemalloc_memory()}
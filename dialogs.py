@@ -0,0 +1,121 @@
+"""
+Модуль диалогов - окна строятся один раз и прячутся вместо уничтожения
+
+Диалог регистрируется функцией build(window): она создает виджеты в уже
+созданном скрытом окне и возвращает reset - функцию, которая приводит
+диалог в начальное состояние при каждом показе (или None). Окно строится
+при первом показе или заранее в warm_up; закрытие только прячет его,
+поэтому повторное открытие - это reset и deiconify. Немодальный диалог
+(modal=False) не захватывает ввод: главное окно остается доступным.
+"""
+
+from collections import deque
+import time
+import tkinter as tk
+
+import customtkinter as ctk
+
+
+# Сколько последних открытий помнить для статистики
+LATENCY_SAMPLES = 50
+# Пауза между построениями при прогреве, мс: ввод успевает обработаться
+WARM_UP_INTERVAL = 50
+
+
+class PooledDialog:
+    """Построенное окно диалога и его замеры"""
+
+    __slots__ = ("window", "reset", "build_seconds", "latencies")
+
+    def __init__(self, window, reset, build_seconds):
+        self.window = window
+        self.reset = reset
+        self.build_seconds = build_seconds
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+
+class DialogManager:
+    """Пул модальных диалогов главного окна"""
+
+    def __init__(self, root):
+        self.root = root
+        self.specs = {}     # имя -> (заголовок, размер, build, модальный)
+        self.dialogs = {}   # имя -> PooledDialog
+
+    def register(self, name, title, geometry, build, modal=True):
+        self.specs[name] = (title, geometry, build, modal)
+
+    def build(self, name):
+        """Окно диалога; строится скрытым при первом обращении"""
+        dialog = self.dialogs.get(name)
+        if dialog is None:
+            title, geometry, build = self.specs[name][:3]
+            started = time.perf_counter()
+            window = ctk.CTkToplevel(self.root)
+            window.withdraw()
+            window.title(title)
+            window.geometry(geometry)
+            window.transient(self.root)
+            window.protocol("WM_DELETE_WINDOW", lambda: self.close(name))
+            reset = build(window)
+            dialog = PooledDialog(window, reset, time.perf_counter() - started)
+            self.dialogs[name] = dialog
+        return dialog
+
+    def open(self, name):
+        """Показать диалог; время открытия считается до отрисовки окна"""
+        started = time.perf_counter()
+        dialog = self.build(name)
+        window = dialog.window
+        window.deiconify()
+        window.lift()
+        if dialog.reset is not None:
+            dialog.reset()
+        window.update_idletasks()
+        dialog.latencies.append(time.perf_counter() - started)
+        if self.specs[name][3]:
+            self.grab(window)
+        return window
+
+    def grab(self, window):
+        # Только что показанное окно может быть еще не отображено
+        try:
+            window.grab_set()
+        except tk.TclError:
+            if window.state() != "withdrawn":
+                window.after(20, self.grab, window)
+
+    def close(self, name):
+        dialog = self.dialogs.get(name)
+        if dialog is None:
+            return
+        dialog.window.grab_release()
+        dialog.window.withdraw()
+        self.root.focus_set()
+
+    def warm_up(self, names):
+        """Построить диалоги заранее, по одному за раз в простое"""
+        names = [name for name in names if name in self.specs]
+
+        def step():
+            while names and names[0] in self.dialogs:
+                names.pop(0)
+            if names:
+                self.build(names.pop(0))
+                self.root.after(WARM_UP_INTERVAL, lambda: self.root.after_idle(step))
+
+        self.root.after_idle(step)
+
+    def stats(self):
+        """Замеры по диалогам в миллисекундах"""
+        result = {}
+        for name, dialog in self.dialogs.items():
+            latencies = [seconds * 1000 for seconds in dialog.latencies]
+            result[name] = {
+                "build": dialog.build_seconds * 1000,
+                "opens": len(latencies),
+                "last": latencies[-1] if latencies else None,
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+                "max": max(latencies) if latencies else None,
+            }
+        return result
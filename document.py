@@ -0,0 +1,408 @@
+"""
+Модуль модели документа - piece table, зеркалирующая текстовую область
+Снимки документа неизменяемы и читаются из любого потока без обращения к Tcl
+"""
+
+from bisect import bisect_right
+import re
+import sys
+
+
+def compute_line_starts(text):
+    """Смещения начал всех строк текста"""
+    starts = [0]
+    starts.extend(match.end() for match in re.finditer("\n", text))
+    return starts
+
+
+class DocumentSnapshot:
+    """Неизменяемый снимок содержимого документа"""
+
+    def __init__(self, pieces, length, version):
+        self.pieces = pieces
+        self.length = length
+        self.version = version
+        self._text = None
+        self._line_starts = None
+
+    def __len__(self):
+        return self.length
+
+    def text(self):
+        """Полный текст снимка (склеивается один раз и кэшируется)"""
+        if self._text is None:
+            self._text = "".join(buf[start:start + size] for buf, start, size in self.pieces)
+        return self._text
+
+    def line_starts(self):
+        """Смещения начал строк (считаются один раз на снимок)"""
+        if self._line_starts is None:
+            self._line_starts = compute_line_starts(self.text())
+        return self._line_starts
+
+    def offset_to_index(self, offset):
+        """Смещение -> индекс Tk вида 'строка.столбец'"""
+        starts = self.line_starts()
+        line = bisect_right(starts, offset) - 1
+        return f"{line + 1}.{offset - starts[line]}"
+
+    def index_to_offset(self, index):
+        """Индекс Tk вида 'строка.столбец' -> смещение"""
+        line, column = str(index).split(".")
+        starts = self.line_starts()
+        line = min(int(line), len(starts)) - 1
+        return min(starts[line] + int(column), self.length)
+
+    def iter_chunks(self, chunk_size=1 << 20, start=0):
+        """Итерировать текст начиная со смещения start кусками не длиннее chunk_size"""
+        if self._text is not None:
+            for pos in range(start, self.length, chunk_size):
+                yield self._text[pos:pos + chunk_size]
+            return
+        parts = []
+        collected = 0
+        pos = 0
+        for buf, piece_start, size in self.pieces:
+            if pos + size <= start:
+                pos += size
+                continue
+            skip = max(0, start - pos)
+            pos += size
+            piece_start += skip
+            size -= skip
+            while size:
+                take = min(size, chunk_size - collected)
+                parts.append(buf[piece_start:piece_start + take])
+                collected += take
+                piece_start += take
+                size -= take
+                if collected == chunk_size:
+                    yield "".join(parts)
+                    parts = []
+                    collected = 0
+        if parts:
+            yield "".join(parts)
+
+    def slice(self, start, end):
+        """Текст в диапазоне смещений [start, end)"""
+        start = max(0, start)
+        end = min(self.length, end)
+        if start >= end:
+            return ""
+        if self._text is not None:
+            return self._text[start:end]
+        parts = []
+        pos = 0
+        for buf, piece_start, size in self.pieces:
+            piece_end = pos + size
+            if piece_end > start:
+                lo = max(start, pos) - pos
+                hi = min(end, piece_end) - pos
+                parts.append(buf[piece_start + lo:piece_start + hi])
+            if piece_end >= end:
+                break
+            pos = piece_end
+        return "".join(parts)
+
+
+class Document:
+    """Piece table: исходный буфер плюс куски вставленного текста"""
+
+    # Максимальная длина куска, который дописывается при наборе подряд
+    COALESCE_LIMIT = 4096
+
+    def __init__(self, text=""):
+        self.listeners = []
+        self.reset(text)
+
+    def reset(self, text=""):
+        """Заменить всё содержимое (без уведомления слушателей о правках)"""
+        self._pieces = [(text, 0, len(text))] if text else []
+        self._starts = [0] if text else []
+        self._valid = len(self._pieces)
+        self._length = len(text)
+        self._last_insert = None
+        self._snapshot = None
+        self.version = getattr(self, "version", 0) + 1
+        for listener in list(self.listeners):
+            listener("reset", 0, text)
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def piece_count(self):
+        return len(self._pieces)
+
+    def buffer_stats(self):
+        """Память буферов: общие буферы кусков считаются один раз"""
+        buffers = {id(buf): buf for buf, start, size in self._pieces}
+        snapshot = self._snapshot
+        return {
+            "length": self._length,
+            "pieces": len(self._pieces),
+            "buffers": len(buffers),
+            "buffer_bytes": sum(sys.getsizeof(buf) for buf in buffers.values()),
+            # Склеенный текст и начала строк последнего снимка, если они уже посчитаны
+            "snapshot_text_bytes": sys.getsizeof(snapshot._text) if snapshot and snapshot._text else 0,
+            "snapshot_lines": len(snapshot._line_starts) if snapshot and snapshot._line_starts else 0,
+        }
+
+    def add_listener(self, callback):
+        """Подписаться на правки: callback(kind, offset, text)"""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    # === ПОИСК КУСКОВ ===
+
+    def _ensure_starts(self, upto):
+        """Досчитать префиксные смещения кусков до индекса upto включительно"""
+        starts = self._starts
+        pieces = self._pieces
+        valid = self._valid
+        pos = starts[valid - 1] + pieces[valid - 1][2] if valid else 0
+        # Устаревший хвост не удаляется, а перезаписывается: после правки
+        # в начале документа это не стоит прохода по всем кускам
+        upto = min(upto, len(pieces) - 1)
+        kept = min(len(starts), upto + 1)
+        while valid < kept:
+            starts[valid] = pos
+            pos += pieces[valid][2]
+            valid += 1
+        while valid <= upto:
+            starts.append(pos)
+            pos += pieces[valid][2]
+            valid += 1
+        self._valid = valid
+
+    def _locate(self, offset):
+        """Индекс куска, содержащего offset, и смещение его начала"""
+        pieces = self._pieces
+        if not pieces:
+            return 0, 0
+        valid = self._valid
+        if valid and offset < self._starts[valid - 1] + pieces[valid - 1][2]:
+            index = bisect_right(self._starts, offset, 0, valid) - 1
+            return index, self._starts[index]
+        # Шаг досчета растет с каждым проходом: рядом с правкой хватает
+        # нескольких кусков, при проходе по всему тексту число шагов - логарифм
+        step = 8
+        while True:
+            self._ensure_starts(min(len(pieces) - 1, self._valid + step))
+            last = self._valid - 1
+            if offset < self._starts[last] + pieces[last][2] or self._valid == len(pieces):
+                break
+            step *= 2
+        index = bisect_right(self._starts, offset, 0, self._valid) - 1
+        return index, self._starts[index]
+
+    def _invalidate(self, index):
+        self._valid = min(self._valid, index)
+        self._snapshot = None
+        self.version += 1
+
+    # === ПРАВКИ ===
+
+    def insert(self, offset, text):
+        """Вставить текст по смещению"""
+        if not text:
+            return
+        offset = max(0, min(offset, self._length))
+        pieces = self._pieces
+        last = self._last_insert
+        if last is not None and last[0] == offset:
+            # Набор подряд: дописываем последний вставленный кусок
+            index = last[1]
+            buf, start, size = pieces[index]
+            if size + len(text) <= self.COALESCE_LIMIT and start + size == len(buf):
+                pieces[index] = (buf + text, start, size + len(text))
+                self._finish_insert(index, offset, text)
+                return
+        if offset == self._length:
+            index = len(pieces)
+            pieces.append((text, 0, len(text)))
+        else:
+            index, piece_pos = self._locate(offset)
+            buf, start, size = pieces[index]
+            split = offset - piece_pos
+            if split == 0:
+                pieces.insert(index, (text, 0, len(text)))
+            else:
+                pieces[index:index + 1] = [
+                    (buf, start, split),
+                    (text, 0, len(text)),
+                    (buf, start + split, size - split),
+                ]
+                index += 1
+        self._finish_insert(index, offset, text)
+
+    def _finish_insert(self, index, offset, text):
+        self._length += len(text)
+        self._invalidate(index)
+        self._last_insert = (offset + len(text), index)
+        self._notify("insert", offset, text)
+
+    def delete(self, start, end):
+        """Удалить диапазон [start, end), вернуть удалённый текст"""
+        start = max(0, start)
+        end = min(end, self._length)
+        if start >= end:
+            return ""
+        pieces = self._pieces
+        first, pos = self._locate(start)
+        removed = []
+        replacement = []
+        index = first
+        while index < len(pieces) and pos < end:
+            buf, piece_start, size = pieces[index]
+            lo = max(start, pos) - pos
+            hi = min(end, pos + size) - pos
+            removed.append(buf[piece_start + lo:piece_start + hi])
+            if lo > 0:
+                replacement.append((buf, piece_start, lo))
+            if hi < size:
+                replacement.append((buf, piece_start + hi, size - hi))
+            pos += size
+            index += 1
+        pieces[first:index] = replacement
+        text = "".join(removed)
+        self._length -= len(text)
+        self._last_insert = None
+        self._invalidate(first)
+        self._notify("delete", start, text)
+        return text
+
+    def replace(self, start, end, text):
+        """Заменить диапазон текстом"""
+        removed = self.delete(start, end)
+        self.insert(start, text)
+        return removed
+
+    def _notify(self, kind, offset, text):
+        for listener in self.listeners:
+            listener(kind, offset, text)
+
+    # === ЧТЕНИЕ ===
+
+    def snapshot(self):
+        """Неизменяемый снимок текущего состояния (кэшируется до следующей правки)"""
+        if self._snapshot is None:
+            self._snapshot = DocumentSnapshot(tuple(self._pieces), self._length, self.version)
+        return self._snapshot
+
+    def get(self, start=0, end=None):
+        """Текст в диапазоне [start, end)"""
+        if end is None:
+            end = self._length
+        start = max(0, start)
+        end = min(end, self._length)
+        if start >= end:
+            return ""
+        index, pos = self._locate(start)
+        parts = []
+        pieces = self._pieces
+        while index < len(pieces) and pos < end:
+            buf, piece_start, size = pieces[index]
+            lo = max(start, pos) - pos
+            hi = min(end, pos + size) - pos
+            parts.append(buf[piece_start + lo:piece_start + hi])
+            pos += size
+            index += 1
+        return "".join(parts)
+
+    def compact(self):
+        """Склеить все куски в один буфер"""
+        if len(self._pieces) > 1:
+            text = self.snapshot().text()
+            self._pieces = [(text, 0, len(text))]
+            self._starts = [0]
+            self._valid = 1
+            self._last_insert = None
+            self._snapshot = None
+
+
+class TextStats:
+    """Счётчики слов, символов и строк, обновляемые по правкам документа"""
+
+    # Начальный размер окна при поиске границы слова
+    SCAN_WINDOW = 64
+
+    def __init__(self, document):
+        self.document = document
+        self.recount()
+        document.add_listener(self.on_edit)
+
+    def recount(self):
+        """Полный пересчёт (только при сбросе документа)"""
+        text = self.document.snapshot().text()
+        self.chars = len(text)
+        self.lines = text.count("\n") + 1
+        self.words = len(text.split())
+
+    def on_edit(self, kind, offset, text):
+        """Обновить счётчики по одной правке"""
+        if kind == "reset":
+            self.recount()
+            return
+        if kind == "insert":
+            left = self.word_before(offset)
+            right = self.word_after(offset + len(text))
+            self.words += len((left + text + right).split()) - len((left + right).split())
+            self.chars += len(text)
+            self.lines += text.count("\n")
+        elif kind == "delete":
+            left = self.word_before(offset)
+            right = self.word_after(offset)
+            self.words += len((left + right).split()) - len((left + text + right).split())
+            self.chars -= len(text)
+            self.lines -= text.count("\n")
+
+    def word_before(self, offset):
+        """Непробельные символы, непосредственно предшествующие offset"""
+        window = self.SCAN_WINDOW
+        while True:
+            start = max(0, offset - window)
+            chunk = self.document.get(start, offset)
+            for pos in range(len(chunk) - 1, -1, -1):
+                if chunk[pos].isspace():
+                    return chunk[pos + 1:]
+            if start == 0:
+                return chunk
+            window *= 2
+
+    def word_after(self, offset):
+        """Непробельные символы, непосредственно следующие за offset"""
+        window = self.SCAN_WINDOW
+        length = len(self.document)
+        while True:
+            end = min(length, offset + window)
+            chunk = self.document.get(offset, end)
+            for pos, char in enumerate(chunk):
+                if char.isspace():
+                    return chunk[:pos]
+            if end == length:
+                return chunk
+            window *= 2
+
+
+class EditTracker:
+    """Наименьшее смещение, затронутое правками с момента последней отметки"""
+
+    def __init__(self, document):
+        self.min_offset = float("inf")
+        document.add_listener(self.on_edit)
+
+    def on_edit(self, kind, offset, text):
+        self.min_offset = min(self.min_offset, offset)
+
+    def mark(self):
+        """Начать отсчет заново, вернуть предыдущее значение"""
+        previous, self.min_offset = self.min_offset, float("inf")
+        return previous
+
+    def restore(self, previous):
+        """Вернуть отметку после неудачного сохранения"""
+        self.min_offset = min(self.min_offset, previous)
@@ -0,0 +1,227 @@
+"""
+Модуль файлового ввода-вывода - потоковая загрузка и атомарное сохранение больших файлов
+"""
+
+import hashlib
+import os
+import queue
+import shutil
+import tempfile
+import threading
+
+
+def current_umask():
+    """Маска прав новых файлов (os.umask только подменяет ее, поэтому она ставится обратно)"""
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+# Маска читается при импорте, до рабочих потоков: подмена в os.umask не атомарна
+UMASK = current_umask()
+
+
+class ChunkedLoader:
+    """Фоновое чтение и декодирование текстового файла кусками фиксированного размера"""
+
+    CHUNK_CHARS = 1 << 16
+
+    def __init__(self, file_path, encoding="utf-8", chunk_chars=CHUNK_CHARS, max_pending=32):
+        self.file_path = file_path
+        self.encoding = encoding
+        self.chunk_chars = chunk_chars
+        self.queue = queue.Queue(max_pending)
+        self.cancelled = threading.Event()
+        self.total_bytes = os.path.getsize(file_path)
+        self.bytes_read = 0
+        self.state = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        """Рабочий поток: читать куски и складывать их в очередь"""
+        try:
+            hasher = new_hasher()
+            length = 0
+            with open(self.file_path, "r", encoding=self.encoding) as file:
+                while not self.cancelled.is_set():
+                    chunk = file.read(self.chunk_chars)
+                    if not chunk:
+                        break
+                    hasher.update(chunk.encode("utf-8"))
+                    length += len(chunk)
+                    self.bytes_read = file.buffer.tell()
+                    self.put(("chunk", chunk))
+                newlines = file.newlines
+            self.bytes_read = self.total_bytes
+            # Дописывать можно, только если переводы строк в файле совпадают с нашими
+            self.state = SavedState(self.file_path, length, hasher, os.stat(self.file_path),
+                                    appendable=newlines in (None, os.linesep))
+            self.put(("done", None))
+        except Exception as e:
+            self.put(("error", e))
+
+    def put(self, item):
+        """Положить элемент в очередь, не зависая после отмены"""
+        while not self.cancelled.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def get(self):
+        """Следующий элемент очереди или None, если пока пусто"""
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def cancel(self):
+        """Остановить чтение и освободить очередь"""
+        self.cancelled.set()
+        while self.get() is not None:
+            pass
+
+    def progress(self):
+        """Доля прочитанного файла от 0 до 1"""
+        if not self.total_bytes:
+            return 1.0
+        return min(1.0, self.bytes_read / self.total_bytes)
+
+
+class SavedState:
+    """Что известно о файле после последнего чтения или сохранения"""
+
+    def __init__(self, file_path, length, hasher, stat, appendable=True):
+        self.file_path = file_path
+        self.length = length
+        self.hasher = hasher
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.appendable = appendable
+
+    def matches_disk(self):
+        """Файл на диске не менялся со времени сохранения"""
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+
+def new_hasher():
+    return hashlib.blake2b(digest_size=16)
+
+
+class AtomicSaver:
+    """Фоновое сохранение снимка документа
+
+    Без изменений - запись пропускается, при правках только в конце - файл
+    дописывается, иначе - временный файл, fsync и атомарное переименование.
+    """
+
+    def __init__(self, file_path, snapshot, previous=None, append_from=None, encoding="utf-8",
+                 prefix="", newline=None):
+        self.file_path = file_path
+        self.snapshot = snapshot
+        self.previous = previous
+        self.append_from = append_from
+        self.encoding = encoding
+        # prefix - служебное начало файла перед текстом (формат .wcd)
+        self.prefix = prefix
+        self.newline = newline
+        self.error = None
+        self.state = None
+        self.skipped = False
+        self.appended = False
+        self.done = threading.Event()
+        # Не фоновый поток: выход из программы дождется окончания записи
+        self.thread = threading.Thread(target=self.run)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            previous = self.previous
+            if previous is not None and previous.length == len(self.snapshot):
+                hasher = new_hasher()
+                for chunk in self.snapshot.iter_chunks():
+                    hasher.update(chunk.encode("utf-8"))
+                if hasher.digest() == previous.hasher.digest() and previous.matches_disk():
+                    self.skipped = True
+                    self.state = previous
+                    return
+            if (self.append_from is not None and previous is not None
+                    and previous.appendable and previous.matches_disk()):
+                self.append()
+            else:
+                self.rewrite()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+    def append(self):
+        """Дописать в конец файла текст после append_from"""
+        hasher = self.previous.hasher.copy()
+        with open(self.file_path, "a", encoding=self.encoding) as file:
+            for chunk in self.snapshot.iter_chunks(start=self.append_from):
+                hasher.update(chunk.encode("utf-8"))
+                file.write(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+        self.appended = True
+        self.state = SavedState(self.file_path, len(self.snapshot), hasher, os.stat(self.file_path))
+
+    def rewrite(self):
+        """Записать весь снимок во временный файл и атомарно подменить им исходный"""
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        temp_path = None
+        hasher = new_hasher()
+        try:
+            with tempfile.NamedTemporaryFile(
+                    "w", encoding=self.encoding, newline=self.newline, dir=directory, delete=False,
+                    prefix="." + os.path.basename(self.file_path) + ".", suffix=".tmp") as file:
+                temp_path = file.name
+                file.write(self.prefix)
+                for chunk in self.snapshot.iter_chunks():
+                    hasher.update(chunk.encode("utf-8"))
+                    file.write(chunk)
+                file.flush()
+                os.fsync(file.fileno())
+            if os.path.exists(self.file_path):
+                shutil.copymode(self.file_path, temp_path)
+            else:
+                # Временный файл создан с правами 0600; новый файл получает обычные
+                os.chmod(temp_path, 0o666 & ~UMASK)
+            os.replace(temp_path, self.file_path)
+            temp_path = None
+            fsync_directory(directory)
+        finally:
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+        self.state = SavedState(self.file_path, len(self.snapshot), hasher, os.stat(self.file_path),
+                                appendable=not self.prefix)
+
+
+def fsync_directory(directory):
+    """Зафиксировать переименование на диске (где это поддерживается)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
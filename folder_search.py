@@ -0,0 +1,329 @@
+"""
+Модуль поиска в папке - параллельный поиск по файлам каталога
+
+Поток обхода собирает файлы по шаблонам имен и размеру и отдает их пачками
+процессам пула; найденное складывается в очередь, которую окно разбирает
+опросом через after. Первые пачки маленькие, чтобы первые совпадения
+появлялись сразу, дальше пачки растут и накладные расходы на обмен с
+процессами падают. Список результатов виртуальный: в текстовом виджете
+только видимые строки, поэтому сотни тысяч совпадений его не замедляют.
+"""
+
+import fnmatch
+import functools
+import os
+import queue
+import re
+import threading
+import tkinter.font as tkfont
+
+from richformat import is_rich_path, read_rich
+
+
+# Файлов в пачке: первая из одного файла, дальше вдвое больше до предела
+FIRST_BATCH = 1
+MAX_BATCH = 64
+# Пачек в очереди пула на один процесс
+PENDING_PER_WORKER = 4
+MAX_FILE_SIZE = 16 << 20
+MAX_FILE_HITS = 1000
+MAX_HITS = 200_000
+# Столько символов строки с совпадением попадает в список
+CONTEXT_CHARS = 240
+# Признак двоичного файла - нулевой символ в начале
+BINARY_PROBE = 8192
+
+
+def make_executor(workers=None):
+    """Пул процессов поиска; модули пула импортируются здесь, а не при запуске окна"""
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+    # forkserver не копирует в процессы пула окно и потоки редактора
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                               mp_context=multiprocessing.get_context(method))
+
+
+def warm_up(executor, workers=None):
+    """Запустить процессы пула в фоне: первый поиск не ждет их старта"""
+    def run():
+        for _ in range(workers or os.cpu_count() or 1):
+            executor.submit(os.getpid)
+    threading.Thread(target=run, daemon=True).start()
+
+
+def split_patterns(text):
+    """Шаблоны имен через ; или запятую; пустая строка - все файлы"""
+    patterns = [pattern.strip() for pattern in re.split(r"[;,]", text) if pattern.strip()]
+    return tuple(patterns) or ("*",)
+
+
+def walk_files(root, patterns=("*",), max_size=MAX_FILE_SIZE, cancelled=None):
+    """Файлы каталога по шаблонам имен и размеру; скрытые каталоги пропускаются"""
+    pending = [root]
+    while pending:
+        if cancelled is not None and cancelled.is_set():
+            return
+        directory = pending.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirectories = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith("."):
+                        subdirectories.append(entry.path)
+                elif (entry.is_file() and any(fnmatch.fnmatch(entry.name, pattern) for pattern in patterns)
+                        and entry.stat().st_size <= max_size):
+                    yield entry.path
+            except OSError:
+                continue
+        pending.extend(reversed(subdirectories))
+
+
+@functools.lru_cache(maxsize=8)
+def compile_pattern(source, flags):
+    return re.compile(source, flags)
+
+
+def search_text(text, pattern, max_hits=MAX_FILE_HITS):
+    """Совпадения в тексте: [(строка, столбец, длина, текст строки)], обрезано ли"""
+    hits = []
+    line = 1
+    line_start = 0
+    position = 0
+    for match in pattern.finditer(text):
+        start = match.start()
+        if match.end() == start:
+            continue
+        if len(hits) >= max_hits:
+            return hits, True
+        # Номер строки считается от предыдущего совпадения, а не от начала
+        newlines = text.count("\n", position, start)
+        if newlines:
+            line += newlines
+            line_start = text.rfind("\n", position, start) + 1
+        position = start
+        line_end = text.find("\n", start)
+        if line_end < 0:
+            line_end = len(text)
+        hits.append((line, start - line_start, match.end() - start,
+                     text[line_start:min(line_end, line_start + CONTEXT_CHARS)]))
+    return hits, False
+
+
+def search_files(paths, source, flags, max_hits=MAX_FILE_HITS):
+    """Задание процесса пула: [(путь, совпадения, обрезано, ошибка)] по пачке файлов"""
+    pattern = compile_pattern(source, flags)
+    results = []
+    for path in paths:
+        try:
+            if is_rich_path(path):
+                header, text = read_rich(path)
+            else:
+                with open(path, "r", encoding="utf-8", errors="replace") as file:
+                    text = file.read()
+            if "\0" in text[:BINARY_PROBE]:
+                continue
+            hits, truncated = search_text(text, pattern, max_hits)
+            if hits:
+                results.append((path, hits, truncated, None))
+        except Exception as e:
+            results.append((path, [], False, str(e)))
+    return results
+
+
+class FolderSearch:
+    """Один запуск поиска в папке; результаты - в очереди results
+
+    Элементы очереди: ("hits", путь, совпадения, обрезано), ("error", путь,
+    текст), ("done", None). Поиск останавливается cancel() или по MAX_HITS.
+    """
+
+    def __init__(self, executor, root, query, patterns=("*",), max_size=MAX_FILE_SIZE, workers=None):
+        self.executor = executor
+        self.root = root
+        self.source = query.pattern.pattern
+        self.flags = query.pattern.flags
+        self.patterns = patterns
+        self.max_size = max_size
+        self.limit = (workers or os.cpu_count() or 1) * PENDING_PER_WORKER
+        self.results = queue.Queue()
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+        self.slots = threading.Semaphore(self.limit)
+        self.futures = set()
+        self.walked = False
+        self.finished = False
+        self.files = 0          # файлов отдано на поиск
+        self.searched = 0       # файлов просмотрено
+        self.hits = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        """Поток обхода: отдавать файлы пачками, не больше limit пачек сразу"""
+        batch = []
+        size = FIRST_BATCH
+        try:
+            for path in walk_files(self.root, self.patterns, self.max_size, self.cancelled):
+                batch.append(path)
+                if len(batch) >= size:
+                    if not self.submit(batch):
+                        break
+                    batch = []
+                    size = min(size * 2, MAX_BATCH)
+            else:
+                if batch:
+                    self.submit(batch)
+        except Exception as e:
+            self.results.put(("error", self.root, str(e)))
+        with self.lock:
+            self.walked = True
+            self.check_done()
+
+    def submit(self, batch):
+        while not self.slots.acquire(timeout=0.1):
+            if self.cancelled.is_set():
+                return False
+        if self.cancelled.is_set():
+            self.slots.release()
+            return False
+        with self.lock:
+            self.files += len(batch)
+            try:
+                future = self.executor.submit(search_files, batch, self.source, self.flags)
+            except RuntimeError:
+                # Пул закрыт: окно закрывается
+                self.slots.release()
+                self.cancelled.set()
+                return False
+            self.futures.add(future)
+        future.add_done_callback(functools.partial(self.on_batch, len(batch)))
+        return True
+
+    def on_batch(self, count, future):
+        """Пачка обработана (вызывается в служебном потоке пула)"""
+        self.slots.release()
+        results = None
+        if not future.cancelled() and not self.cancelled.is_set():
+            try:
+                results = future.result()
+            except Exception as e:
+                self.results.put(("error", None, str(e)))
+        with self.lock:
+            self.futures.discard(future)
+            self.searched += count
+            for path, hits, truncated, error in results or ():
+                if self.hits >= MAX_HITS:
+                    self.cancelled.set()
+                    break
+                if error is not None:
+                    self.results.put(("error", path, error))
+                    continue
+                hits = hits[:MAX_HITS - self.hits]
+                self.hits += len(hits)
+                self.results.put(("hits", path, hits, truncated))
+            self.check_done()
+
+    def check_done(self):
+        # Вызывается под lock
+        if self.walked and not self.futures and not self.finished:
+            self.finished = True
+            self.results.put(("done", None))
+
+    def cancel(self):
+        self.cancelled.set()
+        with self.lock:
+            futures = list(self.futures)
+        for future in futures:
+            future.cancel()
+
+    def drain(self, limit=1000):
+        """Забрать из очереди не больше limit элементов"""
+        items = []
+        while len(items) < limit:
+            try:
+                items.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+
+class VirtualList:
+    """Список строк в текстовом виджете: рисуются только видимые строки
+
+    rows - список кортежей, первый элемент - текст строки; строки можно
+    дописывать в конец, затем вызвать refresh. На щелчок вызывается
+    on_click(номер строки).
+    """
+
+    def __init__(self, text, scrollbar, on_click, style=None):
+        self.text = text
+        self.scrollbar = scrollbar
+        self.on_click = on_click
+        self.style = style or (lambda row: ())
+        self.rows = []
+        self.first = 0
+        self.visible = 1
+        self.drawn = None
+        self.linespace = tkfont.Font(font=text.cget("font")).metrics("linespace") or 1
+        scrollbar.configure(command=self.on_scrollbar)
+        text.configure(state="disabled", cursor="hand2")
+        text.bind("<Configure>", lambda event: self.refresh(force=True))
+        text.bind("<MouseWheel>", lambda event: self.scroll(-3 if event.delta > 0 else 3))
+        text.bind("<Button-4>", lambda event: self.scroll(-3))
+        text.bind("<Button-5>", lambda event: self.scroll(3))
+        text.bind("<Button-1>", self.on_press)
+
+    def clear(self):
+        self.rows = []
+        self.first = 0
+        self.refresh(force=True)
+
+    def extend(self, rows):
+        self.rows.extend(rows)
+
+    def scroll(self, lines):
+        self.first = max(0, min(self.first + lines, len(self.rows) - self.visible))
+        self.refresh()
+        return "break"
+
+    def on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * len(self.rows))
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.first += int(args[1]) * step
+        self.first = max(0, min(self.first, len(self.rows) - self.visible))
+        self.refresh()
+
+    def on_press(self, event):
+        line = int(self.text.index(f"@{event.x},{event.y}").split(".")[0])
+        # Под последней нарисованной строкой пустая строка, а не следующий результат
+        if self.drawn is not None and line <= self.drawn[1]:
+            self.on_click(self.first + line - 1)
+        return "break"
+
+    def refresh(self, force=False):
+        """Перерисовать видимое окно, если оно изменилось"""
+        self.visible = max(1, self.text.winfo_height() // self.linespace)
+        self.first = max(0, min(self.first, len(self.rows) - self.visible))
+        rows = self.rows[self.first:self.first + self.visible]
+        window = (self.first, len(rows))
+        total = max(1, len(self.rows))
+        self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible) / total))
+        if window == self.drawn and not force:
+            return
+        self.drawn = window
+        text = self.text
+        text.configure(state="normal")
+        text.delete("1.0", "end")
+        for row in rows:
+            text.insert("end", row[0] + "\n", self.style(row))
+        text.configure(state="disabled")
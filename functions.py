@@ -3,15 +3,415 @@
 Все операции с текстом, файлами и форматированием
 """
 
-from tkinter import colorchooser, filedialog, messagebox
+import tkinter as tk
 import customtkinter as ctk
+import importlib
+import json
 import os
+import re
+import time
+from richformat import (RICH_EXTENSION, TRANSIENT_TAGS, apply_header, build_header,
+                        header_prefix, is_rich_path, read_rich, tag_options)
+from styles import Style, StyleRegistry
+from undo import UNDO_OPTIONS, UNDO_SUBCOMMANDS, UndoManager
+from dialogs import DialogManager
+from profiling import CommandProfiler, bucket_labels
+from document import Document, EditTracker, TextStats
+from compactor import TagCompactor
+from search import (SearchEngine, SearchHighlighter, SearchQuery, apply_replacements, find_replacements,
+                    match_at, replacement_for)
+
+
+class LazyModule:
+    """Модуль, который импортируется при первом обращении к атрибуту"""
+    
+    def __init__(self, name):
+        self.name = name
+        self.module = None
+    
+    def __getattr__(self, attribute):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module, attribute)
+
+
+# Стандартные диалоги нужны не при запуске, а по первому действию пользователя
+colorchooser = LazyModule("tkinter.colorchooser")
+filedialog = LazyModule("tkinter.filedialog")
+messagebox = LazyModule("tkinter.messagebox")
+# Модули файлов, журнала, истории, поиска в папке, сторожа и диагностики не нужны
+# до первого кадра
+diagnostics = LazyModule("diagnostics")
+fileio = LazyModule("fileio")
+folder_search = LazyModule("folder_search")
+history = LazyModule("history")
+journal = LazyModule("journal")
+largefile = LazyModule("largefile")
+search_index = LazyModule("search_index")
+stallwatch = LazyModule("stallwatch")
+
 
 class EditorFunctions:
     """Класс с функциональностью редактора"""
     
+    # Бюджет времени на вставку кусков файла за один кадр (секунды)
+    LOAD_FRAME_BUDGET = 0.012
+    LOAD_FRAME_INTERVAL = 16
+    SAVE_POLL_INTERVAL = 50
+    AUTOSAVE_INTERVAL = 2000
+    SEARCH_TYPING_DELAY = 150
+    SEARCH_INDEX_MIN_CHARS = 1 << 20
+    SEARCH_INDEX_POLL_INTERVAL = 250
+    FOLDER_SEARCH_POLL_INTERVAL = 30
+    # Сколько элементов очереди поиска в папке разбирать за один опрос
+    FOLDER_SEARCH_DRAIN = 500
+    TAG_COMPACT_INTERVAL = 30000
+    UNDO_MEMORY_BUDGET = 64 << 20
+    HISTORY_PREVIEW_CHARS = 100_000
+    TAG_COMPACT_BUDGET = 0.008
+    DIALOG_WARM_UP_DELAY = 1500
+    # Диалоги, которые строятся заранее после запуска
+    WARM_DIALOGS = ("find", "replace", "file_menu", "insert_menu", "view_menu")
+    # Замеры команд включает profiling.enable при запуске с --profile-commands
+    profile_commands = False
+    # Отладочный режим (--debug): замеры команд и счетчик зависаний в строке состояния
+    debug_mode = False
+    WATCHDOG_POLL_INTERVAL = 1000
+    # Стандартные диалоги; редактор без окна подставляет свои (headless.HeadlessDialogs)
+    messagebox = messagebox
+    filedialog = filedialog
+    colorchooser = colorchooser
+    # Служебные методы без замеров: вызываются на каждую операцию с текстом, по таймеру
+    # или событию виджета, и вне команды каждый вызов считался бы отдельной командой
+    UNPROFILED_METHODS = (
+        "attach_text_area", "install_document_proxy", "text_proxy", "offset_index", "text_offset",
+        "undo_subcommand", "undo_option", "take_undo_options", "tag_operation_change",
+        "tag_spans", "undo_config", "deleted_tags", "apply_undo_op", "undo_tag",
+        "get_current_font", "base_style", "on_text_yscroll", "on_scrollbar", "register_dialogs",
+        "dialog_summary", "stale_search_tags", "running_command",
+        "update_status", "refresh_status", "update_title", "show_status_notice", "clear_status_notice",
+        "pump_loader", "finish_loading", "poll_save", "rebase_journal", "autosave_tick",
+        "schedule_tag_compaction", "compact_tags_slice", "poll_search_index", "poll_watchdog",
+        "poll_viewer_index", "get_memory_tracer",
+    )
+    
     def __init__(self):
-        pass
+        # Состояние редактора
+        self.current_file = None
+        self.zoom_level = 100
+        self.current_font_family = "Arial"
+        self.current_font_size = 12
+        self.is_bold = False
+        self.is_italic = False
+        self.is_underline = False
+        self.show_ruler = False
+        self.show_symbols_visible = False
+        self.document = Document()
+        self.text_stats = TextStats(self.document)
+        self.edit_tracker = EditTracker(self.document)
+        self.undo_manager = UndoManager(self.UNDO_MEMORY_BUDGET)
+        self.document.add_listener(self.undo_manager.on_edit)
+        self.saved_state = None
+        self.save_mark = None
+        self.journal = None
+        self.journal_mark = None
+        self.journal_enabled = True
+        self.status_pending = None
+        self.loader = None
+        self.notice_job = None
+        self.viewer = None
+        self.saver = None
+        self.pending_save = None
+        self.search_engine = SearchEngine()
+        self.search_index = None
+        self.search_index_enabled = True
+        self.quiet_tags = False
+        self.tag_changes = 0
+        self.tag_compact_signature = None
+        self.history = None
+        self.history_store = None   # хранилище, открытое в диалоге истории
+        self.history_enabled = True
+        self.watchdog = None
+        self.folder_executor = None
+        self.folder_search = None
+        self.memory_tracer = None
+        self.command_profiler = CommandProfiler(lambda: len(self.document)) if self.profile_commands else None
+
+    # === МОДЕЛЬ ДОКУМЕНТА ===
+
+    def attach_text_area(self):
+        """Подключить созданную текстовую область к документу, стилям и поиску"""
+        self.install_document_proxy()
+        self.text_area.bind("<<Modified>>", self.update_title)
+        self.text_area.tag_configure("search", background="#ffff00", foreground="#000000")
+        self.search_highlighter = SearchHighlighter(self.text_area, self.document)
+        self.style_registry = StyleRegistry(self.text_area)
+        self.tag_compactor = TagCompactor(self.text_area, self.style_registry, self.stale_search_tags,
+                                          lambda: (self.document.version, self.tag_changes))
+
+    def install_document_proxy(self):
+        """Перехватывать команды текстовой области и зеркалировать правки в документ"""
+        widget = self.text_area._w
+        self.text_area_orig = widget + "_orig"
+        self.tk.call("rename", widget, self.text_area_orig)
+        self.tk.createcommand(widget, self.text_proxy)
+        # Опорная точка (индекс, смещение) рядом с последней правкой
+        self.offset_anchor = ("1.0", 0)
+
+    def text_proxy(self, *args):
+        """Обработчик Tcl-команды текстовой области"""
+        call = self.tk.call
+        orig = self.text_area_orig
+        operation = args[0] if args else ""
+        # Отмену ведет UndoManager, встроенный стек Tk выключен
+        if operation == "edit" and len(args) > 1 and args[1] in UNDO_SUBCOMMANDS:
+            return self.undo_subcommand(args[1])
+        if operation == "cget" and len(args) == 2 and args[1] in UNDO_OPTIONS:
+            return self.undo_option(args[1])
+        if operation == "configure" and len(args) > 2:
+            args = self.take_undo_options(args)
+            if len(args) == 1:
+                return ""
+        if (operation == "tag" and len(args) > 2 and args[1] in ("add", "remove")
+                and args[2] not in TRANSIENT_TAGS and self.viewer is None):
+            # Форматирование тоже изменение документа (сохраняется в .wcd), но только
+            # если операция что-то меняет; служебные проходы идут с quiet_tags
+            if self.quiet_tags:
+                return call((orig,) + args)
+            change = self.tag_operation_change(args)
+            result = call((orig,) + args)
+            if change is not None:
+                self.undo_manager.record_tag(*change)
+                self.tag_changes += 1
+                call(orig, "edit", "modified", 1)
+            return result
+        if operation not in ("insert", "delete", "replace") or len(args) < 2:
+            return call((orig,) + args)
+        if self.viewer is not None or call(orig, "cget", "-state") == "disabled":
+            return call((orig,) + args)
+
+        if operation == "insert":
+            index = str(call(orig, "index", args[1]))
+            if call(orig, "compare", index, "==", "end"):
+                # Вставка в "end" идет перед последним переводом строки, а индекс
+                # за концом после дозаписи стал бы другой позицией
+                index = str(call(orig, "index", "end-1c"))
+            offset = self.text_offset(index)
+            result = call((orig,) + args)
+            self.document.insert(offset, "".join(args[2::2]))
+            self.offset_anchor = (index, offset)
+            return result
+
+        if operation == "replace":
+            ranges = [(args[1], args[2])]
+        else:
+            indices = list(args[1:])
+            if len(indices) % 2:
+                indices.append(indices[-1] + "+1c")
+            ranges = list(zip(indices[::2], indices[1::2]))
+        spans = []
+        recording = self.undo_manager.recording()
+        for first, last in ranges:
+            first = str(call(orig, "index", first))
+            last = str(call(orig, "index", last))
+            start = self.text_offset(first)
+            end = self.text_offset(last)
+            if end > start:
+                # Форматирование удаляемого текста нужно, чтобы отмена вернула его целиком
+                tags = self.deleted_tags(first, last, start) if recording else []
+                spans.append((start, end, first, tags))
+        result = call((orig,) + args)
+        for start, end, first, tags in sorted(spans, key=lambda span: span[0], reverse=True):
+            self.undo_manager.deleted_tags = tags
+            self.document.delete(start, end)
+            self.offset_anchor = (first, start)
+        if operation == "replace":
+            first = str(call(orig, "index", args[1]))
+            offset = self.text_offset(first)
+            self.document.insert(offset, "".join(args[3::2]))
+            self.offset_anchor = (first, offset)
+        return result
+
+    def offset_index(self, offset):
+        """Индекс Tk для смещения в документе (обратное к text_offset)"""
+        anchor_index, anchor_offset = self.offset_anchor
+        points = ((0, "1.0"), (anchor_offset, anchor_index), (len(self.document), "end-1c"))
+        base_offset, base_index = min(points, key=lambda point: abs(point[0] - offset))
+        delta = offset - base_offset
+        sign = "+" if delta >= 0 else "-"
+        return str(self.tk.call(self.text_area_orig, "index", f"{base_index} {sign} {abs(delta)} chars"))
+    
+    def text_offset(self, index):
+        """Смещение символа в документе для индекса вида 'строка.столбец'"""
+        call = self.tk.call
+        orig = self.text_area_orig
+        line = int(str(index).split(".")[0])
+        anchor_index, anchor_offset = self.offset_anchor
+        anchor_line = int(anchor_index.split(".")[0])
+        last_line = int(str(call(orig, "index", "end-1c")).split(".")[0])
+        # Считаем символы от ближайшей известной точки: начала, опоры или конца
+        distances = (line - 1, abs(line - anchor_line), last_line - line)
+        nearest = distances.index(min(distances))
+        if nearest == 0:
+            offset = int(call(orig, "count", "-chars", "1.0", index) or 0)
+        elif nearest == 1:
+            offset = anchor_offset + int(call(orig, "count", "-chars", anchor_index, index) or 0)
+        else:
+            offset = len(self.document) - int(call(orig, "count", "-chars", index, "end-1c") or 0)
+        return max(0, min(offset, len(self.document)))
+
+    # === ОТМЕНА ===
+    
+    def undo_subcommand(self, name):
+        """edit undo/redo/separator/reset/canundo/canredo"""
+        manager = self.undo_manager
+        if name == "undo":
+            manager.undo(self.apply_undo_op)
+        elif name == "redo":
+            manager.redo(self.apply_undo_op)
+        elif name == "separator":
+            manager.separator()
+        elif name == "reset":
+            manager.reset()
+        elif name == "canundo":
+            return int(manager.can_undo())
+        elif name == "canredo":
+            return int(manager.can_redo())
+        return ""
+    
+    def undo_option(self, option):
+        manager = self.undo_manager
+        if option == "-undo":
+            return int(manager.enabled)
+        if option == "-autoseparators":
+            return int(manager.autoseparators)
+        return -1
+    
+    def take_undo_options(self, args):
+        """Забрать -undo/-autoseparators/-maxundo из configure, остальное - виджету"""
+        rest = [args[0]]
+        for option, value in zip(args[1::2], args[2::2]):
+            if option == "-undo":
+                self.undo_manager.enabled = self.tk.getboolean(value)
+            elif option == "-autoseparators":
+                self.undo_manager.autoseparators = self.tk.getboolean(value)
+                self.undo_manager.separator()
+            elif option != "-maxundo":
+                rest += [option, value]
+        return tuple(rest)
+    
+    def tag_operation_change(self, args):
+        """Запись отмены для tag add/remove: отрезки и отрезки тега в них до операции
+
+        None - операция ничего не меняет (тег уже стоит или его нет).
+        """
+        call = self.tk.call
+        orig = self.text_area_orig
+        tag = args[2]
+        indices = list(args[3:])
+        if len(indices) % 2:
+            indices.append(f"{indices[-1]}+1c")
+        spans = []
+        before = []
+        for first, last in zip(indices[::2], indices[1::2]):
+            first = str(call(orig, "index", first))
+            last = str(call(orig, "index", last))
+            if not call(orig, "compare", first, "<", last):
+                continue
+            spans.append([self.text_offset(first), self.text_offset(last)])
+            before += self.tag_spans(tag, first, last)
+        added = args[1] == "add"
+        if not spans or (before == spans if added else not before):
+            return None
+        return tag, added, spans, before, self.undo_config(tag)
+    
+    def tag_spans(self, tag, first, last):
+        """Отрезки тега внутри [first, last) в смещениях документа"""
+        call = self.tk.call
+        orig = self.text_area_orig
+        found = []
+        covering = self.tk.splitlist(call(orig, "tag", "prevrange", tag, first))
+        if covering and call(orig, "compare", covering[1], ">", first):
+            found.append((first, covering[1]))
+        position = first
+        while True:
+            tag_range = self.tk.splitlist(call(orig, "tag", "nextrange", tag, position, last))
+            if not tag_range:
+                break
+            found.append(tag_range)
+            position = tag_range[1]
+        spans = []
+        for start, end in found:
+            if call(orig, "compare", end, ">", last):
+                end = last
+            spans.append([self.text_offset(str(start)), self.text_offset(str(end))])
+        return spans
+    
+    def undo_config(self, tag):
+        """Настройки тега для записи отмены: поля Style или параметры tag configure"""
+        style = self.style_registry.styles.get(tag)
+        return list(style) if style is not None else tag_options(self.text_area, tag)
+    
+    def deleted_tags(self, first, last, offset):
+        """Теги удаляемого отрезка для записи отмены: [тег, начало, конец, настройки] от offset"""
+        call = self.tk.call
+        orig = self.text_area_orig
+        tags = set(self.tk.splitlist(call(orig, "tag", "names", first)))
+        dump = self.tk.splitlist(call(orig, "dump", "-tag", first, last))
+        tags.update(value for key, value in zip(dump[::3], dump[1::3]) if key == "tagon")
+        found = []
+        for tag in sorted(tags.difference(TRANSIENT_TAGS)):
+            config = self.undo_config(tag)
+            for start, end in self.tag_spans(tag, first, last):
+                found.append([tag, start - offset, end - offset, config])
+        return found
+    
+    def apply_undo_op(self, op, reverse):
+        """Выполнить операцию записи отмены (reverse - обратную ей)"""
+        text_area = self.text_area
+        if op[0] == "t":
+            tag, added, spans, before, config = op[1:]
+            tag = self.undo_tag(tag, config)
+            indices = tuple(self.offset_index(offset) for span in spans for offset in span)
+            # Text.tag_remove принимает один отрезок, команда виджета - несколько
+            remove = (text_area._w, "tag", "remove", tag) + indices
+            if reverse:
+                self.tk.call(remove)
+                if before:
+                    text_area.tag_add(tag, *[self.offset_index(offset) for span in before for offset in span])
+            elif added:
+                text_area.tag_add(tag, *indices)
+            else:
+                self.tk.call(remove)
+            return
+        kind, offset, text = op[:3]
+        index = self.offset_index(offset)
+        if kind == "i" and not reverse:
+            text_area.insert(index, text)
+            text_area.mark_set("insert", self.offset_index(offset + len(text)))
+        elif kind == "d" and reverse:
+            # Удаленный текст возвращается без тегов соседей, со своими
+            text_area.insert(index, text, ())
+            ranges = {}
+            for tag, start, end, config in (op[3] if len(op) > 3 else ()):
+                indices = ranges.setdefault(self.undo_tag(tag, config), [])
+                indices += [self.offset_index(offset + start), self.offset_index(offset + end)]
+            for tag, indices in ranges.items():
+                text_area.tag_add(tag, *indices)
+            text_area.mark_set("insert", self.offset_index(offset + len(text)))
+        else:
+            text_area.delete(index, self.offset_index(offset + len(text)))
+            text_area.mark_set("insert", index)
+        text_area.see("insert")
+    
+    def undo_tag(self, tag, config):
+        """Тег для операции отмены; удаленный уборкой тег создается заново"""
+        if isinstance(config, list):
+            # Тег стиля мог смениться: стиль интернируется под текущим именем
+            return self.style_registry.tag_for(Style(*config))
+        if config and tag not in self.text_area.tag_names():
+            self.text_area.tag_configure(tag, **config)
+        return tag
     
     # === ФУНКЦИИ БУФЕРА ОБМЕНА ===
     
@@ -56,7 +456,7 @@ class EditorFunctions:
             if self.text_area.tag_ranges("sel"):
                 tags = self.text_area.tag_names("sel.first")
                 self.copied_format = [tag for tag in tags if tag not in ("sel",)]
-                messagebox.showinfo("Формат по образцу", 
+                self.messagebox.showinfo("Формат по образцу", 
                     "Формат скопирован! Выделите текст для применения.")
         except:
             pass
@@ -77,15 +477,28 @@ class EditorFunctions:
         font_style = self.get_current_font()
         self.text_area.configure(font=(self.current_font_family, self.current_font_size, font_style))
     
+    def base_style(self):
+        """Стиль текста без тега стиля"""
+        return Style.default(self.current_font_family, self.current_font_size)
+    
+    def apply_char_style(self, base=None, **changes):
+        """Изменить стиль выделенного текста; False - выделения нет
+
+        base - стиль текста без тега, если он уже сменился (шрифт и размер).
+        """
+        if not self.text_area.tag_ranges("sel"):
+            return False
+        with self.undo_manager.group():
+            self.style_registry.apply("sel.first", "sel.last", base or self.base_style(), **changes)
+        return True
+    
     def change_font_family(self, choice):
         """Изменить семейство шрифта"""
+        # Выделенный текст сравнивается со старым обычным стилем, иначе новый шрифт совпал бы с ним
+        base = self.base_style()
         self.current_font_family = choice
         try:
-            if self.text_area.tag_ranges("sel"):
-                tag_name = f"font_{choice}"
-                self.text_area.tag_add(tag_name, "sel.first", "sel.last")
-                self.text_area.tag_configure(tag_name, font=(choice, self.current_font_size))
-            else:
+            if not self.apply_char_style(base, family=choice):
                 self.update_text_font()
         except:
             self.update_text_font()
@@ -94,12 +507,9 @@ class EditorFunctions:
         """Изменить размер шрифта"""
         try:
             size = int(choice)
+            base = self.base_style()
             self.current_font_size = size
-            if self.text_area.tag_ranges("sel"):
-                tag_name = f"size_{size}"
-                self.text_area.tag_add(tag_name, "sel.first", "sel.last")
-                self.text_area.tag_configure(tag_name, font=(self.current_font_family, size))
-            else:
+            if not self.apply_char_style(base, size=size):
                 self.update_text_font()
         except:
             pass
@@ -130,13 +540,7 @@ class EditorFunctions:
         self.bold_btn.configure(fg_color="#0078d4" if self.is_bold else "transparent")
         
         try:
-            if self.text_area.tag_ranges("sel"):
-                if self.is_bold:
-                    self.text_area.tag_add("bold", "sel.first", "sel.last")
-                    self.text_area.tag_configure("bold", font=(self.current_font_family, self.current_font_size, "bold"))
-                else:
-                    self.text_area.tag_remove("bold", "sel.first", "sel.last")
-            else:
+            if not self.apply_char_style(weight="bold" if self.is_bold else "normal"):
                 self.update_text_font()
         except:
             self.update_text_font()
@@ -147,13 +551,7 @@ class EditorFunctions:
         self.italic_btn.configure(fg_color="#0078d4" if self.is_italic else "transparent")
         
         try:
-            if self.text_area.tag_ranges("sel"):
-                if self.is_italic:
-                    self.text_area.tag_add("italic", "sel.first", "sel.last")
-                    self.text_area.tag_configure("italic", font=(self.current_font_family, self.current_font_size, "italic"))
-                else:
-                    self.text_area.tag_remove("italic", "sel.first", "sel.last")
-            else:
+            if not self.apply_char_style(slant="italic" if self.is_italic else "roman"):
                 self.update_text_font()
         except:
             self.update_text_font()
@@ -164,12 +562,7 @@ class EditorFunctions:
         self.underline_btn.configure(fg_color="#0078d4" if self.is_underline else "transparent")
         
         try:
-            if self.text_area.tag_ranges("sel"):
-                if self.is_underline:
-                    self.text_area.tag_add("underline", "sel.first", "sel.last")
-                    self.text_area.tag_configure("underline", underline=True)
-                else:
-                    self.text_area.tag_remove("underline", "sel.first", "sel.last")
+            self.apply_char_style(underline=self.is_underline)
         except:
             pass
             
@@ -177,53 +570,41 @@ class EditorFunctions:
         """Переключить зачеркивание"""
         try:
             if self.text_area.tag_ranges("sel"):
-                current_tags = self.text_area.tag_names("sel.first")
-                if "strikethrough" in current_tags:
-                    self.text_area.tag_remove("strikethrough", "sel.first", "sel.last")
-                else:
-                    self.text_area.tag_add("strikethrough", "sel.first", "sel.last")
-                    self.text_area.tag_configure("strikethrough", overstrike=True)
+                style = self.style_registry.style_at("sel.first", self.base_style())
+                self.apply_char_style(overstrike=not style.overstrike)
         except:
             pass
     
     def insert_subscript(self):
         """Вставить подстрочный индекс"""
         try:
-            if self.text_area.tag_ranges("sel"):
-                self.text_area.tag_add("subscript", "sel.first", "sel.last")
-                self.text_area.tag_configure("subscript", offset=-4)
+            self.apply_char_style(offset=-4)
         except:
-            messagebox.showinfo("Подстрочный индекс", "Выделите текст для применения")
+            self.messagebox.showinfo("Подстрочный индекс", "Выделите текст для применения")
     
     def insert_superscript(self):
         """Вставить надстрочный индекс"""
         try:
-            if self.text_area.tag_ranges("sel"):
-                self.text_area.tag_add("superscript", "sel.first", "sel.last")
-                self.text_area.tag_configure("superscript", offset=4)
+            self.apply_char_style(offset=4)
         except:
-            messagebox.showinfo("Надстрочный индекс", "Выделите текст для применения")
+            self.messagebox.showinfo("Надстрочный индекс", "Выделите текст для применения")
             
     def change_text_color(self):
         """Изменить цвет текста"""
-        color = colorchooser.askcolor(title="Выберите цвет текста")
+        color = self.colorchooser.askcolor(title="Выберите цвет текста")
         if color[1]:
             try:
-                if self.text_area.tag_ranges("sel"):
-                    self.text_area.tag_add("color", "sel.first", "sel.last")
-                    self.text_area.tag_configure("color", foreground=color[1])
+                if self.apply_char_style(foreground=color[1]):
                     self.text_color_btn.configure(fg_color=color[1])
             except:
                 pass
                 
     def change_bg_color(self):
         """Изменить цвет выделения"""
-        color = colorchooser.askcolor(title="Выберите цвет выделения")
+        color = self.colorchooser.askcolor(title="Выберите цвет выделения")
         if color[1]:
             try:
-                if self.text_area.tag_ranges("sel"):
-                    self.text_area.tag_add("bgcolor", "sel.first", "sel.last")
-                    self.text_area.tag_configure("bgcolor", background=color[1])
+                self.apply_char_style(background=color[1])
             except:
                 pass
     
@@ -234,7 +615,7 @@ class EditorFunctions:
                 for tag in self.text_area.tag_names("sel.first"):
                     if tag != "sel":
                         self.text_area.tag_remove(tag, "sel.first", "sel.last")
-                messagebox.showinfo("Формат", "Форматирование очищено")
+                self.messagebox.showinfo("Формат", "Форматирование очищено")
         except:
             pass
     
@@ -249,11 +630,25 @@ class EditorFunctions:
                     new_text = text.title()
                 else:
                     new_text = text.upper()
-                self.text_area.delete("sel.first", "sel.last")
-                self.text_area.insert("sel.first", new_text)
+                self.replace_selection(new_text)
         except:
             pass
     
+    def replace_selection(self, new_text):
+        """Заменить выделенный текст, оставив выделенным новый"""
+        text_area = self.text_area
+        # После удаления у "sel" нет отрезков, поэтому начало запоминается заранее
+        first = text_area.index("sel.first")
+        autoseparators = text_area.cget("autoseparators")
+        text_area.configure(autoseparators=False)
+        text_area.edit_separator()
+        try:
+            text_area.replace(first, "sel.last", new_text)
+        finally:
+            text_area.edit_separator()
+            text_area.configure(autoseparators=autoseparators)
+        text_area.tag_add("sel", first, f"{first}+{len(new_text)}c")
+    
     # === ФУНКЦИИ АБЗАЦА ===
                 
     def align_text(self, alignment):
@@ -282,19 +677,16 @@ class EditorFunctions:
     
     def insert_multilevel(self):
         """Многоуровневый список"""
-        window = ctk.CTkToplevel(self)
-        window.title("Многоуровневый список")
-        window.geometry("300x250")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("multilevel")
+    
+    def build_multilevel_dialog(self, window):
         ctk.CTkLabel(window, text="Выберите уровень списка:", 
                     font=("Segoe UI", 12, "bold")).pack(pady=15)
         
         def insert_level(level, symbol):
             indent = "    " * (level - 1)
             self.text_area.insert("insert", f"{indent}{symbol} ")
-            window.destroy()
+            self.dialogs.close("multilevel")
         
         ctk.CTkButton(window, text="Уровень 1: • Элемент", width=250,
                      command=lambda: insert_level(1, "•")).pack(pady=5)
@@ -303,7 +695,7 @@ class EditorFunctions:
         ctk.CTkButton(window, text="Уровень 3:         ▪ Элемент", width=250,
                      command=lambda: insert_level(3, "▪")).pack(pady=5)
         ctk.CTkButton(window, text="Отмена", width=250,
-                     command=window.destroy, fg_color="gray").pack(pady=10)
+                     command=lambda: self.dialogs.close("multilevel"), fg_color="gray").pack(pady=10)
     
     def increase_indent(self):
         """Увеличить отступ"""
@@ -329,62 +721,54 @@ class EditorFunctions:
         self.symbols_btn.configure(fg_color="#0078d4" if self.show_symbols_visible else "transparent")
         
         if self.show_symbols_visible:
-            messagebox.showinfo("Непечатаемые символы", 
+            self.messagebox.showinfo("Непечатаемые символы", 
                 "Режим отображения непечатаемых символов включен\n(¶ - конец абзаца, · - пробелы)")
         else:
-            messagebox.showinfo("Непечатаемые символы", 
+            self.messagebox.showinfo("Непечатаемые символы", 
                 "Режим отображения непечатаемых символов выключен")
     
     def sort_text(self):
         """Сортировать текст"""
-        try:
+        if self.text_area.tag_ranges("sel"):
+            self.dialogs.open("sort")
+        else:
+            self.messagebox.showinfo("Сортировка", "Выделите текст для сортировки")
+    
+    def build_sort_dialog(self, window):
+        ctk.CTkLabel(window, text="Выберите тип сортировки:",
+                   font=("Segoe UI", 12, "bold")).pack(pady=15)
+        
+        def do_sort(reverse=False):
+            self.dialogs.close("sort")
             if self.text_area.tag_ranges("sel"):
-                text = self.text_area.get("sel.first", "sel.last")
-                lines = text.split("\n")
-                
-                window = ctk.CTkToplevel(self)
-                window.title("Сортировка")
-                window.geometry("300x200")
-                window.transient(self)
-                window.grab_set()
-                
-                ctk.CTkLabel(window, text="Выберите тип сортировки:",
-                           font=("Segoe UI", 12, "bold")).pack(pady=15)
-                
-                def do_sort(reverse=False):
-                    sorted_lines = sorted(lines, reverse=reverse)
-                    self.text_area.delete("sel.first", "sel.last")
-                    self.text_area.insert("sel.first", "\n".join(sorted_lines))
-                    window.destroy()
-                
-                ctk.CTkButton(window, text="От А до Я", width=200,
-                             command=lambda: do_sort(False),
-                             fg_color="#0078d4").pack(pady=5)
-                ctk.CTkButton(window, text="От Я до А", width=200,
-                             command=lambda: do_sort(True),
-                             fg_color="#0078d4").pack(pady=5)
-                ctk.CTkButton(window, text="Отмена", width=200,
-                             command=window.destroy).pack(pady=10)
-            else:
-                messagebox.showinfo("Сортировка", "Выделите текст для сортировки")
-        except:
-            pass
+                self.sort_selection(reverse)
+        
+        ctk.CTkButton(window, text="От А до Я", width=200,
+                     command=lambda: do_sort(False),
+                     fg_color="#0078d4").pack(pady=5)
+        ctk.CTkButton(window, text="От Я до А", width=200,
+                     command=lambda: do_sort(True),
+                     fg_color="#0078d4").pack(pady=5)
+        ctk.CTkButton(window, text="Отмена", width=200,
+                     command=lambda: self.dialogs.close("sort")).pack(pady=10)
+    
+    def sort_selection(self, reverse=False):
+        """Отсортировать строки выделенного текста"""
+        lines = self.text_area.get("sel.first", "sel.last").split("\n")
+        self.replace_selection("\n".join(sorted(lines, reverse=reverse)))
     
     def change_line_spacing(self):
         """Изменить междустрочный интервал"""
-        window = ctk.CTkToplevel(self)
-        window.title("Междустрочный интервал")
-        window.geometry("300x250")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("line_spacing")
+    
+    def build_line_spacing_dialog(self, window):
         ctk.CTkLabel(window, text="Выберите интервал:", 
                     font=("Segoe UI", 12, "bold")).pack(pady=15)
         
         def set_spacing(value):
             self.text_area.configure(spacing1=value, spacing3=value)
-            messagebox.showinfo("Интервал", f"Междустрочный интервал изменен")
-            window.destroy()
+            self.messagebox.showinfo("Интервал", f"Междустрочный интервал изменен")
+            self.dialogs.close("line_spacing")
         
         ctk.CTkButton(window, text="1.0 (одинарный)", width=200,
                      command=lambda: set_spacing(0)).pack(pady=5)
@@ -397,7 +781,7 @@ class EditorFunctions:
     
     def change_paragraph_fill(self):
         """Изменить заливку абзаца"""
-        color = colorchooser.askcolor(title="Выберите цвет заливки абзаца")
+        color = self.colorchooser.askcolor(title="Выберите цвет заливки абзаца")
         if color[1]:
             try:
                 current_line = self.text_area.index("insert linestart")
@@ -409,12 +793,9 @@ class EditorFunctions:
     
     def add_borders(self):
         """Добавить границы"""
-        window = ctk.CTkToplevel(self)
-        window.title("Границы и заливка")
-        window.geometry("350x300")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("borders")
+    
+    def build_borders_dialog(self, window):
         ctk.CTkLabel(window, text="Границы и заливка",
                     font=("Segoe UI", 14, "bold")).pack(pady=15)
         
@@ -422,8 +803,8 @@ class EditorFunctions:
                     font=("Segoe UI", 11)).pack(pady=10)
         
         def apply_border(border_type):
-            messagebox.showinfo("Границы", f"Применен тип границы: {border_type}")
-            window.destroy()
+            self.messagebox.showinfo("Границы", f"Применен тип границы: {border_type}")
+            self.dialogs.close("borders")
         
         ctk.CTkButton(window, text="Все границы", width=250,
                      command=lambda: apply_border("все")).pack(pady=5)
@@ -434,7 +815,7 @@ class EditorFunctions:
         ctk.CTkButton(window, text="Без границ", width=250,
                      command=lambda: apply_border("нет")).pack(pady=5)
         ctk.CTkButton(window, text="Закрыть", width=250,
-                     command=window.destroy, fg_color="gray").pack(pady=10)
+                     command=lambda: self.dialogs.close("borders"), fg_color="gray").pack(pady=10)
     
     # === ФУНКЦИИ СТИЛЕЙ ===
         
@@ -447,15 +828,15 @@ class EditorFunctions:
             if style == "normal":
                 self.text_area.tag_add("normal", start, end)
                 self.text_area.tag_configure("normal", font=("Arial", 12), spacing1=3, spacing3=3)
-                messagebox.showinfo("Стиль", "Применен стиль: Обычный")
+                self.messagebox.showinfo("Стиль", "Применен стиль: Обычный")
             elif style == "no_spacing":
                 self.text_area.tag_add("no_spacing", start, end)
                 self.text_area.tag_configure("no_spacing", font=("Arial", 12), spacing1=0, spacing3=0)
-                messagebox.showinfo("Стиль", "Применен стиль: Без интервала")
+                self.messagebox.showinfo("Стиль", "Применен стиль: Без интервала")
             elif style == "heading":
                 self.text_area.tag_add("heading", start, end)
                 self.text_area.tag_configure("heading", font=("Arial", 18, "bold"), spacing1=5, spacing3=5)
-                messagebox.showinfo("Стиль", "Применен стиль: Заголовок")
+                self.messagebox.showinfo("Стиль", "Применен стиль: Заголовок")
         except:
             pass
     
@@ -463,17 +844,23 @@ class EditorFunctions:
     
     def find_text(self):
         """Диалог поиска"""
-        window = ctk.CTkToplevel(self)
-        window.title("Найти")
-        window.geometry("450x180")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("find")
+    
+    def build_find_dialog(self, window):
         ctk.CTkLabel(window, text="Найти:", font=("Segoe UI", 12)).pack(pady=(15, 5), padx=15, anchor="w")
         
         search_entry = ctk.CTkEntry(window, width=410, height=35, font=("Segoe UI", 11))
         search_entry.pack(pady=5, padx=15)
-        search_entry.focus()
+        
+        options_frame = ctk.CTkFrame(window, fg_color="transparent")
+        options_frame.pack(pady=5, padx=15, anchor="w")
+        case_var = ctk.BooleanVar(value=False)
+        word_var = ctk.BooleanVar(value=False)
+        regex_var = ctk.BooleanVar(value=False)
+        for text, variable in (("Учитывать регистр", case_var), ("Слово целиком", word_var),
+                               ("Регулярное выражение", regex_var)):
+            ctk.CTkCheckBox(options_frame, text=text, variable=variable, font=("Segoe UI", 10),
+                            command=lambda: do_search()).pack(side="left", padx=(0, 10))
         
         result_label = ctk.CTkLabel(window, text="", font=("Segoe UI", 10), text_color="#909090")
         result_label.pack(pady=5)
@@ -481,41 +868,84 @@ class EditorFunctions:
         button_frame = ctk.CTkFrame(window, fg_color="transparent")
         button_frame.pack(pady=10)
         
+        pending = {"job": None}
+        
         def do_search():
+            pending["job"] = None
             query = search_entry.get()
-            if query:
-                self.text_area.tag_remove("search", "1.0", "end")
-                start_pos = "1.0"
-                count = 0
-                while True:
-                    start_pos = self.text_area.search(query, start_pos, stopindex="end", nocase=True)
-                    if not start_pos:
-                        break
-                    end_pos = f"{start_pos}+{len(query)}c"
-                    self.text_area.tag_add("search", start_pos, end_pos)
-                    count += 1
-                    start_pos = end_pos
-                self.text_area.tag_configure("search", background="#ffff00", foreground="#000000")
-                result_label.configure(text=f"Найдено совпадений: {count}")
+            if not query:
+                self.search_engine.clear()
+                self.search_highlighter.clear()
+                result_label.configure(text="")
+                return
+            try:
+                search_query = SearchQuery(query, case_var.get(), word_var.get(), regex_var.get())
+            except re.error as e:
+                result_label.configure(text=f"Ошибка в выражении: {e}")
+                return
+            snapshot = self.document.snapshot()
+            count = self.search_engine.search(snapshot, search_query, self.search_index)
+            self.search_highlighter.show(snapshot, self.search_engine.starts, self.search_engine.ends)
+            result_label.configure(text=f"Найдено совпадений: {count}")
+        
+        def schedule_search(event=None):
+            # Поиск по мере ввода: повторный запуск после паузы в наборе
+            if pending["job"] is not None:
+                window.after_cancel(pending["job"])
+            pending["job"] = window.after(self.SEARCH_TYPING_DELAY, do_search)
+        
+        def go_to(forward):
+            engine = self.search_engine
+            snapshot = self.document.snapshot()
+            if engine.version != snapshot.version or engine.query is None:
+                do_search()
+            offset = snapshot.index_to_offset(self.text_area.index("insert"))
+            number = engine.next_hit(offset) if forward else engine.previous_hit(offset - 1)
+            if number is None:
+                return
+            start = snapshot.offset_to_index(engine.starts[number])
+            end = snapshot.offset_to_index(engine.ends[number])
+            self.text_area.tag_remove("sel", "1.0", "end")
+            self.text_area.tag_add("sel", start, end)
+            self.text_area.mark_set("insert", end if forward else start)
+            self.text_area.see(start)
+            result_label.configure(text=f"Совпадение {number + 1} из {len(engine)}")
+        
+        search_entry.bind("<KeyRelease>", schedule_search)
+        search_entry.bind("<Return>", lambda e: go_to(True))
+        search_entry.bind("<Shift-Return>", lambda e: go_to(False))
+        
+        ctk.CTkButton(
+            button_frame, text="◀ Назад", width=90,
+            command=lambda: go_to(False)
+        ).pack(side="left", padx=5)
         
         ctk.CTkButton(
             button_frame, text="Найти далее", width=130,
-            command=do_search, fg_color="#0078d4", hover_color="#1084d8"
+            command=lambda: go_to(True), fg_color="#0078d4", hover_color="#1084d8"
         ).pack(side="left", padx=5)
         
         ctk.CTkButton(
             button_frame, text="Закрыть", width=130,
-            command=window.destroy
+            command=lambda: self.dialogs.close("find")
         ).pack(side="left", padx=5)
+        
+        def reset():
+            # Прошлый запрос остается выделенным: его можно сразу заменить набором
+            if pending["job"] is not None:
+                window.after_cancel(pending["job"])
+                pending["job"] = None
+            result_label.configure(text="")
+            search_entry.select_range(0, "end")
+            search_entry.focus()
+        
+        return reset
     
     def replace_text(self):
         """Диалог замены"""
-        window = ctk.CTkToplevel(self)
-        window.title("Заменить")
-        window.geometry("450x280")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("replace")
+    
+    def build_replace_dialog(self, window):
         ctk.CTkLabel(window, text="Найти:", font=("Segoe UI", 12)).pack(pady=(15, 5), padx=15, anchor="w")
         find_entry = ctk.CTkEntry(window, width=410, height=35, font=("Segoe UI", 11))
         find_entry.pack(pady=5, padx=15)
@@ -524,22 +954,91 @@ class EditorFunctions:
         replace_entry = ctk.CTkEntry(window, width=410, height=35, font=("Segoe UI", 11))
         replace_entry.pack(pady=5, padx=15)
         
+        options_frame = ctk.CTkFrame(window, fg_color="transparent")
+        options_frame.pack(pady=5, padx=15, anchor="w")
+        case_var = ctk.BooleanVar(value=False)
+        word_var = ctk.BooleanVar(value=False)
+        regex_var = ctk.BooleanVar(value=False)
+        for text, variable in (("Учитывать регистр", case_var), ("Слово целиком", word_var),
+                               ("Регулярное выражение", regex_var)):
+            ctk.CTkCheckBox(options_frame, text=text, variable=variable,
+                            font=("Segoe UI", 10)).pack(side="left", padx=(0, 10))
+        
         result_label = ctk.CTkLabel(window, text="", font=("Segoe UI", 10), text_color="#909090")
         result_label.pack(pady=5)
         
         button_frame = ctk.CTkFrame(window, fg_color="transparent")
-        button_frame.pack(pady=15)
+        button_frame.pack(pady=10)
+        
+        def make_query():
+            if not find_entry.get():
+                return None
+            try:
+                return SearchQuery(find_entry.get(), case_var.get(), word_var.get(), regex_var.get())
+            except re.error as e:
+                result_label.configure(text=f"Ошибка в выражении: {e}")
+                return None
+        
+        def do_replace_next():
+            # Выделенное совпадение заменяется, затем выделяется следующее
+            query = make_query()
+            if query is None:
+                return
+            snapshot = self.document.snapshot()
+            offset = snapshot.index_to_offset(self.text_area.index("insert"))
+            selection = self.text_area.tag_ranges("sel")
+            try:
+                if selection:
+                    start = snapshot.index_to_offset(str(selection[0]))
+                    end = snapshot.index_to_offset(str(selection[1]))
+                    match = match_at(snapshot, query, start, end)
+                    if match is not None:
+                        replacement = replacement_for(query, match, replace_entry.get())
+                        self.text_area.replace(str(selection[0]), str(selection[1]), replacement)
+                        snapshot = self.document.snapshot()
+                        offset = start + len(replacement)
+            except re.error as e:
+                result_label.configure(text=f"Ошибка в замене: {e}")
+                return
+            text = snapshot.text()
+            match = None
+            for candidate in query.pattern.finditer(text, offset):
+                if candidate.end() > candidate.start():
+                    match = candidate
+                    break
+            if match is None:
+                for candidate in query.pattern.finditer(text, 0, offset):
+                    if candidate.end() > candidate.start():
+                        match = candidate
+                        break
+            self.text_area.tag_remove("sel", "1.0", "end")
+            if match is None:
+                result_label.configure(text="Совпадений нет")
+                return
+            start = snapshot.offset_to_index(match.start())
+            end = snapshot.offset_to_index(match.end())
+            self.text_area.tag_add("sel", start, end)
+            self.text_area.mark_set("insert", start)
+            self.text_area.see(start)
+            result_label.configure(text="")
         
         def do_replace_all():
-            find_text = find_entry.get()
-            replace_text = replace_entry.get()
-            if find_text:
-                content = self.text_area.get("1.0", "end-1c")
-                count = content.count(find_text)
-                new_content = content.replace(find_text, replace_text)
-                self.text_area.delete("1.0", "end")
-                self.text_area.insert("1.0", new_content)
-                result_label.configure(text=f"Выполнено замен: {count}")
+            query = make_query()
+            if query is None:
+                return
+            snapshot = self.document.snapshot()
+            try:
+                edits = find_replacements(snapshot, query, replace_entry.get())
+            except re.error as e:
+                result_label.configure(text=f"Ошибка в замене: {e}")
+                return
+            count = apply_replacements(self.text_area, snapshot, edits)
+            result_label.configure(text=f"Выполнено замен: {count}")
+        
+        ctk.CTkButton(
+            button_frame, text="Заменить", width=130,
+            command=do_replace_next
+        ).pack(side="left", padx=5)
         
         ctk.CTkButton(
             button_frame, text="Заменить все", width=130,
@@ -548,8 +1047,197 @@ class EditorFunctions:
         
         ctk.CTkButton(
             button_frame, text="Закрыть", width=130,
-            command=window.destroy
+            command=lambda: self.dialogs.close("replace")
         ).pack(side="left", padx=5)
+        
+        def reset():
+            result_label.configure(text="")
+            find_entry.select_range(0, "end")
+            find_entry.focus()
+        
+        return reset
+    
+    # === ПОИСК В ПАПКЕ ===
+    
+    def find_in_folder(self):
+        """Диалог поиска по файлам каталога"""
+        self.dialogs.open("find_in_folder")
+    
+    def build_find_in_folder_dialog(self, window):
+        form = ctk.CTkFrame(window, fg_color="transparent")
+        form.pack(fill="x", padx=15, pady=(15, 5))
+        form.grid_columnconfigure(1, weight=1)
+        
+        ctk.CTkLabel(form, text="Найти:", font=("Segoe UI", 12)).grid(row=0, column=0, sticky="w", pady=3)
+        search_entry = ctk.CTkEntry(form, height=32, font=("Segoe UI", 11))
+        search_entry.grid(row=0, column=1, columnspan=2, sticky="ew", padx=(10, 0), pady=3)
+        
+        ctk.CTkLabel(form, text="Папка:", font=("Segoe UI", 12)).grid(row=1, column=0, sticky="w", pady=3)
+        folder_entry = ctk.CTkEntry(form, height=32, font=("Segoe UI", 11))
+        folder_entry.grid(row=1, column=1, sticky="ew", padx=(10, 5), pady=3)
+        
+        def browse():
+            folder = self.filedialog.askdirectory(parent=window, initialdir=folder_entry.get() or None)
+            if folder:
+                folder_entry.delete(0, "end")
+                folder_entry.insert(0, folder)
+        
+        ctk.CTkButton(form, text="Обзор...", width=90, command=browse).grid(row=1, column=2, pady=3)
+        
+        ctk.CTkLabel(form, text="Файлы:", font=("Segoe UI", 12)).grid(row=2, column=0, sticky="w", pady=3)
+        filters = ctk.CTkFrame(form, fg_color="transparent")
+        filters.grid(row=2, column=1, columnspan=2, sticky="ew", padx=(10, 0), pady=3)
+        glob_entry = ctk.CTkEntry(filters, width=300, height=32, font=("Segoe UI", 11))
+        glob_entry.insert(0, "*.txt; *.md; *.wcd")
+        glob_entry.pack(side="left")
+        ctk.CTkLabel(filters, text="не больше, МБ:", font=("Segoe UI", 11)).pack(side="left", padx=(15, 5))
+        size_entry = ctk.CTkEntry(filters, width=60, height=32, font=("Segoe UI", 11))
+        size_entry.insert(0, str(folder_search.MAX_FILE_SIZE >> 20))
+        size_entry.pack(side="left")
+        
+        options_frame = ctk.CTkFrame(window, fg_color="transparent")
+        options_frame.pack(pady=5, padx=15, anchor="w")
+        case_var = ctk.BooleanVar(value=False)
+        word_var = ctk.BooleanVar(value=False)
+        regex_var = ctk.BooleanVar(value=False)
+        for text, variable in (("Учитывать регистр", case_var), ("Слово целиком", word_var),
+                               ("Регулярное выражение", regex_var)):
+            ctk.CTkCheckBox(options_frame, text=text, variable=variable,
+                            font=("Segoe UI", 10)).pack(side="left", padx=(0, 10))
+        
+        button_frame = ctk.CTkFrame(window, fg_color="transparent")
+        button_frame.pack(fill="x", padx=15, pady=5)
+        result_label = ctk.CTkLabel(window, text="", font=("Segoe UI", 10), text_color="#909090")
+        
+        list_frame = ctk.CTkFrame(window, fg_color="transparent")
+        results_text = tk.Text(list_frame, wrap="none", font=("Courier New", 10), bg="#1e1e1e", fg="#ffffff",
+                               relief="flat", padx=8, pady=4, height=1)
+        scrollbar = ctk.CTkScrollbar(list_frame)
+        scrollbar.pack(side="right", fill="y")
+        results_text.pack(side="left", fill="both", expand=True)
+        results_text.tag_configure("file", foreground="#4fc3f7", font=("Courier New", 10, "bold"))
+        results_text.tag_configure("error", foreground="#f48771")
+        
+        state = {"search": None, "root": "", "started": 0.0}
+        
+        def open_row(number):
+            row = results.rows[number]
+            if row[1] != "error":
+                self.open_at(*row[2:])
+        
+        results = folder_search.VirtualList(results_text, scrollbar, open_row, style=lambda row: (row[1],))
+        
+        def show_progress(search, final=None):
+            elapsed = time.perf_counter() - state["started"]
+            text = (f"Совпадений: {search.hits} в просмотренных файлах: {search.searched} "
+                    f"из {search.files}    {elapsed:.2f} с")
+            result_label.configure(text=f"{final}. {text}" if final else text)
+        
+        def poll(search):
+            if search is not state["search"]:
+                return
+            rows = []
+            done = False
+            for item in search.drain(self.FOLDER_SEARCH_DRAIN):
+                if item[0] == "hits":
+                    path, hits, truncated = item[1:]
+                    name = os.path.relpath(path, state["root"])
+                    more = "+" if truncated else ""
+                    line, column, length, context = hits[0]
+                    rows.append((f"{name} ({len(hits)}{more})", "file", path, line, column, length))
+                    rows.extend((f"  {line:>6}: {context}", "hit", path, line, column, length)
+                                for line, column, length, context in hits)
+                elif item[0] == "error":
+                    rows.append((f"{item[1] or state['root']}: {item[2]}", "error"))
+                else:
+                    done = True
+            if rows:
+                results.extend(rows)
+                results.refresh()
+            if done:
+                state["search"] = None
+                stop_button.configure(state="disabled")
+                show_progress(search, "Остановлено" if search.cancelled.is_set() else "Готово")
+                return
+            show_progress(search)
+            window.after(self.FOLDER_SEARCH_POLL_INTERVAL, poll, search)
+        
+        def stop():
+            search = state["search"]
+            if search is not None:
+                search.cancel()
+        
+        def start(event=None):
+            stop()
+            folder = folder_entry.get().strip()
+            if not search_entry.get():
+                return
+            if not os.path.isdir(folder):
+                result_label.configure(text="Папка не найдена")
+                return
+            try:
+                query = SearchQuery(search_entry.get(), case_var.get(), word_var.get(), regex_var.get())
+                max_size = int(float(size_entry.get()) * (1 << 20))
+            except re.error as e:
+                result_label.configure(text=f"Ошибка в выражении: {e}")
+                return
+            except ValueError:
+                result_label.configure(text="Размер файла - число мегабайт")
+                return
+            results.clear()
+            state["root"] = folder
+            state["started"] = time.perf_counter()
+            search = folder_search.FolderSearch(self.folder_executor, folder, query,
+                                                folder_search.split_patterns(glob_entry.get()), max_size)
+            state["search"] = search.start()
+            self.folder_search = search
+            stop_button.configure(state="normal")
+            poll(search)
+        
+        ctk.CTkButton(button_frame, text="Найти", width=110, command=start,
+                     fg_color="#0078d4", hover_color="#1084d8").pack(side="left", padx=(0, 5))
+        stop_button = ctk.CTkButton(button_frame, text="Остановить", width=110, command=stop, state="disabled")
+        stop_button.pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Закрыть", width=110,
+                     command=lambda: self.dialogs.close("find_in_folder")).pack(side="right")
+        result_label.pack(padx=15, anchor="w")
+        list_frame.pack(fill="both", expand=True, padx=15, pady=(5, 15))
+        search_entry.bind("<Return>", start)
+        
+        def reset():
+            if self.folder_executor is None:
+                self.folder_executor = folder_search.make_executor()
+                folder_search.warm_up(self.folder_executor)
+            # Результаты прошлого поиска остаются: к ним можно вернуться
+            if not folder_entry.get():
+                folder_entry.insert(0, os.path.dirname(os.path.abspath(self.current_file))
+                                    if self.current_file else os.getcwd())
+            search_entry.select_range(0, "end")
+            search_entry.focus()
+        
+        return reset
+    
+    def open_at(self, file_path, line, column=0, length=0):
+        """Открыть файл (если он еще не открыт) и выделить совпадение в строке line"""
+        if (self.current_file is None or self.loader is not None
+                or os.path.abspath(self.current_file) != os.path.abspath(file_path)):
+            self.load_file(file_path)
+        self.go_to_hit(file_path, line, column, length)
+    
+    def go_to_hit(self, file_path, line, column, length):
+        if self.loader is not None:
+            # Файл еще загружается: строка может быть в непрочитанной части
+            self.after(self.SAVE_POLL_INTERVAL, self.go_to_hit, file_path, line, column, length)
+            return
+        if self.current_file is None or os.path.abspath(self.current_file) != os.path.abspath(file_path):
+            return
+        start = f"{line}.{column}"
+        end = f"{start}+{length}c"
+        self.text_area.tag_remove("sel", "1.0", "end")
+        self.text_area.tag_add("sel", start, end)
+        self.text_area.mark_set("insert", start)
+        self.text_area.see(start)
+        self.text_area.focus_set()
     
     def select_all(self):
         """Выделить весь текст"""
@@ -587,104 +1275,587 @@ class EditorFunctions:
         self.zoom_level = 100
         self.zoom_slider.set(100)
         self.update_zoom()
-        messagebox.showinfo("Масштаб", "Масштаб установлен на 100%")
+        self.messagebox.showinfo("Масштаб", "Масштаб установлен на 100%")
     
     def reading_mode(self):
         """Режим чтения"""
-        messagebox.showinfo("Режим чтения", 
+        self.messagebox.showinfo("Режим чтения", 
             "Режим чтения оптимизирован для комфортного чтения документов")
     
     def print_layout_mode(self):
         """Режим разметки страницы"""
-        messagebox.showinfo("Режим разметки", 
+        self.messagebox.showinfo("Режим разметки", 
             "Текущий режим: Разметка страницы (активен)")
     
     def web_layout_mode(self):
         """Режим веб-документа"""
-        messagebox.showinfo("Режим веб-документа", 
+        self.messagebox.showinfo("Режим веб-документа", 
             "Режим веб-документа оптимизирован для просмотра в браузере")
     
     # === ФУНКЦИИ СТАТУСА ===
             
     def update_status(self, event=None):
-        """Обновить строку состояния"""
-        content = self.text_area.get(1.0, "end-1c")
-        words = len(content.split()) if content.strip() else 0
-        chars = len(content)
-        lines = content.count("\n") + 1
-        self.page_label.configure(text=f"Страница 1 из 1    Число слов: {words}    Русский")
+        """Обновить строку состояния (не чаще одного раза за кадр)"""
+        if self.viewer is not None:
+            return
+        if self.status_pending is None:
+            self.status_pending = self.after_idle(self.refresh_status)
+    
+    def refresh_status(self):
+        """Перерисовать строку состояния по счётчикам документа"""
+        self.status_pending = None
+        stats = self.text_stats
+        selected = 0
+        if self.text_area.tag_ranges("sel"):
+            selected = (self.text_area.count("sel.first", "sel.last", "chars") or (0,))[0]
+        text = (f"Страница 1 из 1    Число слов: {stats.words}    "
+                f"Символов: {stats.chars}    Строк: {stats.lines}    ")
+        if selected:
+            text += f"Выделено: {selected}    "
+        text += "Русский"
+        if text != self.page_label.cget("text"):
+            self.page_label.configure(text=text)
     
     # === ФУНКЦИИ РАБОТЫ С ФАЙЛАМИ ===
         
     def new_file(self):
         """Создать новый документ"""
-        if messagebox.askyesno("Новый документ", 
+        if self.messagebox.askyesno("Новый документ", 
             "Создать новый документ? Несохраненные изменения будут потеряны."):
+            self.close_viewer()
+            self.cancel_loading()
+            self.stop_search_index()
             self.text_area.delete(1.0, "end")
             self.current_file = None
-            self.doc_title.configure(text="Документ1")
+            self.saved_state = None
+            self.edit_tracker.mark()
+            self.text_area.edit_modified(False)
+            self.update_title()
             self.update_status()
+            self.start_journal()
+            self.start_history()
         
     def open_file(self):
         """Открыть файл"""
-        file_path = filedialog.askopenfilename(
+        file_path = self.filedialog.askopenfilename(
             defaultextension=".txt",
             filetypes=[
                 ("Текстовые файлы", "*.txt"),
+                ("Документы редактора", f"*{RICH_EXTENSION}"),
                 ("Все файлы", "*.*")
             ]
         )
         if file_path:
-            try:
-                with open(file_path, "r", encoding="utf-8") as file:
-                    self.text_area.delete(1.0, "end")
-                    self.text_area.insert(1.0, file.read())
-                self.current_file = file_path
-                self.doc_title.configure(text=os.path.basename(file_path))
-                self.update_status()
-                messagebox.showinfo("Успешно", f"Файл открыт:\n{os.path.basename(file_path)}")
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось открыть файл:\n{str(e)}")
+            self.load_file(file_path)
+    
+    def load_file(self, file_path):
+        """Начать потоковую загрузку файла в текстовую область"""
+        self.close_viewer()
+        self.cancel_loading()
+        self.stop_search_index()
+        self.stop_history()
+        if is_rich_path(file_path):
+            self.load_rich_file(file_path)
+            return
+        try:
+            self.loader = fileio.ChunkedLoader(file_path).start()
+        except Exception as e:
+            self.loader = None
+            self.messagebox.showerror("Ошибка", f"Не удалось открыть файл:\n{str(e)}")
+            return
+        self.stop_journal()
+        self.text_area.configure(undo=False)
+        self.text_area.delete(1.0, "end")
+        # Файл станет целью сохранения только после загрузки целиком
+        self.current_file = None
+        self.saved_state = None
+        self.update_title()
+        self.progress_bar.set(0)
+        self.progress_bar.pack(side="left", padx=5, pady=2)
+        self.show_status_notice("Загрузка... (Esc - отмена)", duration=None)
+        self.after(0, self.pump_loader)
+    
+    def load_rich_file(self, file_path):
+        """Открыть документ .wcd: текст и все теги форматирования"""
+        try:
+            header, text = read_rich(file_path)
+        except Exception as e:
+            self.messagebox.showerror("Ошибка", f"Не удалось открыть файл:\n{str(e)}")
+            return
+        self.stop_journal()
+        self.text_area.configure(undo=False)
+        self.text_area.delete(1.0, "end")
+        self.text_area.insert(1.0, text)
+        # Теги загруженного документа - не правка: без записи отмены и отметки изменений
+        self.quiet_tags = True
+        try:
+            apply_header(self.text_area, header, text)
+        finally:
+            self.quiet_tags = False
+        self.style_registry.adopt()
+        self.text_area.configure(undo=True)
+        self.text_area.edit_reset()
+        self.text_area.edit_modified(False)
+        self.current_file = file_path
+        hasher = fileio.new_hasher()
+        hasher.update(text.encode("utf-8"))
+        self.saved_state = fileio.SavedState(file_path, len(text), hasher, os.stat(file_path),
+                                             appendable=False)
+        self.edit_tracker.mark()
+        self.update_title()
+        self.update_status()
+        self.start_journal()
+        self.start_history()
+        self.start_search_index()
+        self.show_status_notice("Файл открыт")
+    
+    def pump_loader(self):
+        """Вставить очередные куски файла в пределах бюджета кадра"""
+        loader = self.loader
+        if loader is None:
+            return
+        deadline = time.perf_counter() + self.LOAD_FRAME_BUDGET
+        while time.perf_counter() < deadline:
+            item = loader.get()
+            if item is None:
+                break
+            kind, value = item
+            if kind == "chunk":
+                self.text_area.insert("end", value)
+            elif kind == "done":
+                self.current_file = loader.file_path
+                self.saved_state = loader.state
+                # Вставки кусков файла - не правки: дописывание отсчитывается от загруженного
+                self.edit_tracker.mark()
+                self.finish_loading()
+                self.start_journal()
+                self.start_history()
+                self.start_search_index()
+                return
+            else:
+                self.finish_loading()
+                self.update_title()
+                self.start_journal()
+                self.start_history()
+                self.messagebox.showerror("Ошибка", f"Не удалось открыть файл:\n{str(value)}")
+                return
+        self.progress_bar.set(loader.progress())
+        self.after(self.LOAD_FRAME_INTERVAL, self.pump_loader)
+    
+    def finish_loading(self, notice="Файл открыт"):
+        """Завершить загрузку и вернуть обычный режим правки"""
+        self.loader = None
+        self.progress_bar.pack_forget()
+        self.text_area.configure(undo=True)
+        self.text_area.edit_reset()
+        self.text_area.edit_modified(False)
+        self.update_status()
+        self.show_status_notice(notice)
+    
+    def cancel_loading(self):
+        """Отменить загрузку (Esc); загруженное начало остается без привязки к файлу"""
+        if self.loader is None:
+            return
+        self.loader.cancel()
+        self.finish_loading("Загрузка отменена")
+        self.text_area.edit_modified(True)
+        self.start_journal(ops=[["r", 0, self.document.snapshot().text()]])
+        self.start_history()
+    
+    def update_title(self, event=None):
+        """Имя документа в заголовке с отметкой о несохраненных изменениях"""
+        file_path = self.loader.file_path if self.loader is not None else self.current_file
+        name = os.path.basename(file_path) if file_path else "Документ1"
+        if self.viewer is not None:
+            name += " (только чтение)"
+        elif self.text_area.edit_modified():
+            name += " •"
+        self.doc_title.configure(text=name)
+    
+    def show_status_notice(self, text, duration=4000):
+        """Показать уведомление в строке состояния"""
+        if self.notice_job is not None:
+            self.after_cancel(self.notice_job)
+            self.notice_job = None
+        self.notice_label.configure(text=text)
+        if duration:
+            self.notice_job = self.after(duration, self.clear_status_notice)
+    
+    def clear_status_notice(self):
+        self.notice_job = None
+        self.notice_label.configure(text="")
             
     def save_file(self):
         """Сохранить файл"""
-        if self.current_file:
-            try:
-                with open(self.current_file, "w", encoding="utf-8") as file:
-                    file.write(self.text_area.get(1.0, "end-1c"))
-                messagebox.showinfo("Сохранено", f"Файл успешно сохранен:\n{os.path.basename(self.current_file)}")
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось сохранить файл:\n{str(e)}")
+        # Во время загрузки start_save откажет сам, без диалога выбора файла
+        if self.current_file or self.loader is not None:
+            self.start_save(self.current_file)
         else:
             self.save_file_as()
             
     def save_file_as(self):
         """Сохранить файл как..."""
-        file_path = filedialog.asksaveasfilename(
+        file_path = self.filedialog.asksaveasfilename(
             defaultextension=".txt",
             filetypes=[
                 ("Текстовые файлы", "*.txt"),
+                ("Документы редактора", f"*{RICH_EXTENSION}"),
                 ("Все файлы", "*.*")
             ]
         )
         if file_path:
+            self.start_save(file_path)
+    
+    def start_save(self, file_path):
+        """Сохранить снимок документа в фоне (атомарная замена файла)"""
+        if self.viewer is not None:
+            self.show_status_notice("Режим только чтения: сохранение недоступно")
+            return
+        if self.loader is not None:
+            # В буфере только прочитанное начало файла
+            self.show_status_notice("Дождитесь окончания загрузки файла")
+            return
+        if self.saver is not None:
+            # Следующее сохранение начнется после текущего
+            self.pending_save = file_path
+            return
+        state = self.saved_state
+        if state is None or state.file_path != file_path:
+            state = None
+        elif not self.text_area.edit_modified():
+            self.show_status_notice("Нет изменений для сохранения")
+            return
+        snapshot = self.document.snapshot()
+        if self.history is not None:
+            self.history.mark()
+        append_from = None
+        if (state is not None and self.edit_tracker.min_offset >= state.length
+                and len(snapshot) > state.length):
+            # Правки только после сохраненного конца: достаточно дописать файл
+            append_from = state.length
+        self.save_mark = self.edit_tracker.mark()
+        self.journal_mark = self.journal.mark() if self.journal is not None else None
+        if is_rich_path(file_path):
+            # Форматирование не учитывается отпечатком текста: всегда полная запись
+            prefix = header_prefix(build_header(self.text_area, snapshot))
+            self.saver = fileio.AtomicSaver(file_path, snapshot, prefix=prefix, newline="\n").start()
+        else:
+            self.saver = fileio.AtomicSaver(file_path, snapshot, previous=state, append_from=append_from).start()
+        self.show_status_notice(f"Сохранение {os.path.basename(file_path)}...", duration=None)
+        self.after(self.SAVE_POLL_INTERVAL, self.poll_save)
+    
+    def poll_save(self):
+        """Дождаться окончания фонового сохранения"""
+        saver = self.saver
+        if not saver.done.is_set():
+            self.after(self.SAVE_POLL_INTERVAL, self.poll_save)
+            return
+        self.saver = None
+        journal_ops = self.journal.release(self.journal_mark) if self.journal is not None else []
+        if saver.error is not None:
+            self.edit_tracker.restore(self.save_mark)
+            self.clear_status_notice()
+            self.messagebox.showerror("Ошибка", f"Не удалось сохранить файл:\n{str(saver.error)}")
+        else:
+            self.current_file = saver.file_path
+            self.saved_state = saver.state
+            # Правки, сделанные во время записи, оставляют документ измененным
+            unchanged = self.document.version == saver.snapshot.version
+            if unchanged:
+                self.text_area.edit_modified(False)
+            self.update_title()
+            self.rebase_journal(journal_ops)
+            # Кэш индекса описывает текущий документ, а не сохраненный снимок
+            if self.search_index is not None and unchanged:
+                self.search_index.store(search_index.index_path_for(saver.file_path),
+                                        saver.state.hasher.hexdigest())
+            if self.history is not None and not saver.skipped:
+                self.history.commit(saver.file_path, saver.snapshot, saver.state.hasher.hexdigest())
+            name = os.path.basename(saver.file_path)
+            if saver.skipped:
+                self.show_status_notice(f"Нет изменений: {name}")
+            elif saver.appended:
+                self.show_status_notice(f"Сохранено (дописано): {name}")
+            else:
+                self.show_status_notice(f"Сохранено: {name}")
+        if self.pending_save is not None:
+            file_path, self.pending_save = self.pending_save, None
+            self.start_save(file_path)
+    
+    # === АВТОСОХРАНЕНИЕ ===
+    
+    def start_journal(self, ops=()):
+        """Начать журнал правок текущего документа"""
+        self.stop_journal()
+        if not self.journal_enabled:
+            return
+        state = self.saved_state
+        try:
+            if state is not None:
+                self.journal = journal.EditJournal(self.document, self.current_file, state.file_path,
+                                                   state.length, state.hasher.hexdigest(), ops)
+            else:
+                self.journal = journal.EditJournal(self.document, self.current_file, ops=ops)
+        except OSError as e:
+            self.journal = None
+            self.show_status_notice(f"Автосохранение недоступно: {e}")
+    
+    def stop_journal(self, discard=True):
+        """Закрыть журнал; discard - документ сохранен или отброшен"""
+        current, self.journal = self.journal, None
+        if current is not None:
             try:
-                with open(file_path, "w", encoding="utf-8") as file:
-                    file.write(self.text_area.get(1.0, "end-1c"))
-                self.current_file = file_path
-                self.doc_title.configure(text=os.path.basename(file_path))
-                messagebox.showinfo("Сохранено", f"Файл успешно сохранен:\n{os.path.basename(file_path)}")
+                current.close(discard)
+            except OSError:
+                pass
+    
+    def rebase_journal(self, ops):
+        """После сохранения журнал начинается от сохраненного файла"""
+        state = self.saved_state
+        if self.journal is not None and self.journal.path == journal.journal_path_for(state.file_path):
+            try:
+                self.journal.rebase(state.file_path, state.length, state.hasher.hexdigest(), ops)
+            except OSError as e:
+                self.show_status_notice(f"Автосохранение недоступно: {e}")
+        else:
+            self.start_journal(ops)
+    
+    def autosave_tick(self):
+        """Периодически сбрасывать накопленные правки в журнал"""
+        if self.journal is not None:
+            try:
+                self.journal.flush()
+            except OSError as e:
+                self.show_status_notice(f"Автосохранение недоступно: {e}")
+                self.stop_journal(discard=False)
+        self.after(self.AUTOSAVE_INTERVAL, self.autosave_tick)
+    
+    def offer_recovery(self):
+        """Предложить восстановить правки из журналов прошлых сеансов"""
+        for path, header in journal.pending_journals():
+            name = os.path.basename(header["document"]) if header.get("document") else "Документ1"
+            if not self.messagebox.askyesno("Восстановление",
+                    f"Найдены несохраненные правки документа «{name}». Восстановить?"):
+                journal.discard_journal(path)
+                continue
+            try:
+                document, header, ops = journal.replay_journal(path)
             except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось сохранить файл:\n{str(e)}")
+                self.messagebox.showerror("Ошибка", f"Не удалось восстановить документ:\n{str(e)}")
+                continue
+            journal.discard_journal(path)
+            text = document.snapshot().text()
+            self.text_area.delete(1.0, "end")
+            self.text_area.insert(1.0, text)
+            self.text_area.edit_reset()
+            self.text_area.edit_modified(True)
+            self.current_file = header.get("document")
+            self.saved_state = None
+            self.edit_tracker.mark()
+            self.update_title()
+            if header["base"] and header["base"] == self.current_file:
+                # Базовый файл не менялся: журнал продолжается от него
+                self.journal = journal.EditJournal(self.document, self.current_file, header["base"],
+                                                   header["length"], header["digest"], ops)
+                self.start_history()
+            else:
+                self.start_journal(ops=[["r", 0, text]])
+                self.start_history()
+            self.show_status_notice(f"Восстановлено: {name}")
+            return
+        self.start_journal()
+        self.start_history()
+    
+    def on_close(self):
+        """Закрытие окна: журнал с несохраненными правками остается для восстановления"""
+        if self.saver is not None:
+            self.saver.thread.join()
+        self.stop_journal(discard=not self.text_area.edit_modified())
+        self.stop_search_index()
+        self.stop_history()
+        if self.folder_search is not None:
+            self.folder_search.cancel()
+        if self.folder_executor is not None:
+            self.folder_executor.shutdown(wait=False, cancel_futures=True)
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        self.destroy()
+    
+    # === УБОРКА ТЕГОВ ===
+    
+    def schedule_tag_compaction(self):
+        self.after(self.TAG_COMPACT_INTERVAL, lambda: self.after_idle(self.compact_tags_slice))
+    
+    def compact_tags_slice(self):
+        """Один ограниченный по времени шаг уборки тегов; проход - только после правок"""
+        compactor = self.tag_compactor
+        if compactor.steps is None:
+            signature = (self.document.version, self.tag_changes)
+            if self.viewer is not None or self.loader is not None or signature == self.tag_compact_signature:
+                self.schedule_tag_compaction()
+                return
+            self.tag_compact_signature = signature
+        # Уборка не меняет вид документа и не делает его измененным
+        self.quiet_tags = True
+        try:
+            finished = compactor.run(self.TAG_COMPACT_BUDGET)
+        finally:
+            self.quiet_tags = False
+        if not finished:
+            self.after_idle(self.compact_tags_slice)
+            return
+        report = compactor.last
+        if report["ranges"] or report["tags"]:
+            self.show_status_notice(
+                f"Уборка тегов: освобождено отрезков {report['ranges']}, тегов {report['tags']}")
+        self.schedule_tag_compaction()
+    
+    def stale_search_tags(self):
+        """Подсветка поиска без активного запроса - мусор"""
+        return ("search",) if self.search_engine.query is None else ()
+    
+    # === ИСТОРИЯ ВЕРСИЙ ===
+    
+    def start_history(self):
+        """Начать учет правок для истории версий текущего документа"""
+        self.stop_history()
+        if not self.history_enabled:
+            return
+        state = self.saved_state
+        self.history = history.DocumentHistory(self.document, self.current_file,
+                                               state.hasher.hexdigest() if state is not None else None)
+    
+    def stop_history(self):
+        current, self.history = self.history, None
+        if current is not None:
+            current.close()
+    
+    def show_history(self):
+        """Диалог истории версий: просмотр и восстановление ревизий"""
+        if self.history is None or self.current_file is None:
+            self.messagebox.showinfo("История версий", "История появится после сохранения документа")
+            return
+        store = self.history.store or history.RevisionStore(self.current_file)
+        store.wait()
+        if not store.revisions:
+            self.messagebox.showinfo("История версий", "У документа еще нет сохраненных версий")
+            return
+        self.history_store = store
+        self.dialogs.open("history")
+    
+    def build_history_dialog(self, window):
+        title_label = ctk.CTkLabel(window, text="", font=("Segoe UI", 14, "bold"))
+        title_label.pack(pady=(15, 5))
+        info_label = ctk.CTkLabel(window, text="", font=("Segoe UI", 10), text_color="#909090")
+        info_label.pack()
+        
+        listbox = tk.Listbox(window, height=10, bg="#2b2b2b", fg="#ffffff", selectbackground="#0078d4",
+                             relief="flat", font=("Segoe UI", 10), activestyle="none")
+        listbox.pack(fill="x", padx=15, pady=10)
+        
+        preview = tk.Text(window, height=12, wrap="word", bg="#1e1e1e", fg="#ffffff",
+                          relief="flat", font=("Arial", 10))
+        preview.pack(fill="both", expand=True, padx=15)
+        state = {"text": None, "revisions": []}
+        
+        def selected_text():
+            selection = listbox.curselection()
+            if not selection:
+                return None
+            position = len(state["revisions"]) - 1 - selection[0]
+            try:
+                return self.history_store.restore(position)
+            except (OSError, ValueError) as e:
+                self.messagebox.showerror("Ошибка", f"Не удалось прочитать версию:\n{str(e)}")
+                return None
+        
+        def set_preview(text):
+            state["text"] = text
+            preview.configure(state="normal")
+            preview.delete("1.0", "end")
+            if text is not None:
+                preview.insert("1.0", text[:self.HISTORY_PREVIEW_CHARS])
+            preview.configure(state="disabled")
+        
+        def show_preview(event=None):
+            set_preview(selected_text())
+        
+        def restore():
+            text = state["text"] if state["text"] is not None else selected_text()
+            if text is None:
+                return
+            self.dialogs.close("history")
+            # Восстановление - одно действие, его можно отменить
+            with self.undo_manager.group():
+                self.text_area.delete("1.0", "end")
+                self.text_area.insert("1.0", text)
+            self.show_status_notice("Версия восстановлена")
+        
+        listbox.bind("<<ListboxSelect>>", show_preview)
+        
+        button_frame = ctk.CTkFrame(window, fg_color="transparent")
+        button_frame.pack(pady=10)
+        ctk.CTkButton(button_frame, text="Восстановить", width=130, command=restore,
+                      fg_color="#0078d4", hover_color="#1084d8").pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Закрыть", width=130,
+                      command=lambda: self.dialogs.close("history")).pack(side="left", padx=5)
+        
+        def reset():
+            # Список версий строится заново: с прошлого открытия могли появиться новые
+            store = self.history_store
+            state["revisions"] = revisions = list(reversed(store.revisions))
+            title_label.configure(text=f"История версий: {os.path.basename(store.file_path)}")
+            info_label.configure(text=f"Версий: {len(revisions)}, на диске {store.storage_size() / (1 << 20):.1f} МБ")
+            listbox.delete(0, "end")
+            for revision in revisions:
+                when = time.strftime("%d.%m.%Y %H:%M:%S", time.localtime(revision["time"]))
+                kind = "полная копия" if revision["kind"] == "checkpoint" else "изменения"
+                listbox.insert("end", f"№ {revision['number']}   {when}   {revision['length']} симв.   ({kind})")
+            set_preview(None)
+        
+        return reset
+    
+    # === ИНДЕКС ПОИСКА ===
+    
+    def start_search_index(self):
+        """Собрать индекс поиска открытого документа в фоне (только для больших)"""
+        self.stop_search_index()
+        if not self.search_index_enabled or len(self.document) < self.SEARCH_INDEX_MIN_CHARS:
+            return
+        cache_path = search_index.index_path_for(self.current_file) if self.current_file else None
+        self.search_index = search_index.SearchIndex(self.document, cache_path).start()
+        self.after(self.SEARCH_INDEX_POLL_INTERVAL, self.poll_search_index)
+    
+    def stop_search_index(self):
+        index, self.search_index = self.search_index, None
+        if index is not None:
+            index.close()
+    
+    def poll_search_index(self):
+        """Принять собранный индекс, затем понемногу переиндексировать правки"""
+        index = self.search_index
+        if index is None:
+            return
+        if not index.ready:
+            if not index.done.is_set():
+                self.after(self.SEARCH_INDEX_POLL_INTERVAL, self.poll_search_index)
+                return
+            if index.error is not None:
+                self.stop_search_index()
+                return
+            index.finish()
+        elif index.stale:
+            self.start_search_index()
+            return
+        else:
+            index.refresh()
+        self.after(self.SEARCH_INDEX_POLL_INTERVAL, self.poll_search_index)
     
     def print_document(self):
         """Печать документа"""
-        window = ctk.CTkToplevel(self)
-        window.title("Печать")
-        window.geometry("400x300")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("print")
+    
+    def build_print_dialog(self, window):
         ctk.CTkLabel(window, text="Параметры печати",
                     font=("Segoe UI", 16, "bold")).pack(pady=20)
         
@@ -699,8 +1870,8 @@ class EditorFunctions:
         copies.pack(pady=5)
         
         def do_print():
-            messagebox.showinfo("Печать", f"Документ отправлен на печать:\n{printer.get()}")
-            window.destroy()
+            self.messagebox.showinfo("Печать", f"Документ отправлен на печать:\n{printer.get()}")
+            self.dialogs.close("print")
         
         button_frame = ctk.CTkFrame(window, fg_color="transparent")
         button_frame.pack(pady=20)
@@ -708,18 +1879,297 @@ class EditorFunctions:
         ctk.CTkButton(button_frame, text="Печать", width=140,
                      command=do_print, fg_color="#0078d4").pack(side="left", padx=5)
         ctk.CTkButton(button_frame, text="Отмена", width=140,
-                     command=window.destroy).pack(side="left", padx=5)
+                     command=lambda: self.dialogs.close("print")).pack(side="left", padx=5)
+    
+    # === ДИАЛОГИ ===
+    
+    def register_dialogs(self):
+        """Диалоги строятся при первом открытии и потом только прячутся"""
+        self.dialogs = DialogManager(self)
+        for name, title, geometry in (
+            ("find", "Найти", "450x250"),
+            ("replace", "Заменить", "450x320"),
+            ("file_menu", "Файл", "350x500"),
+            ("insert_menu", "Вставка", "350x400"),
+            ("view_menu", "Вид", "350x350"),
+            ("help_menu", "Справка", "450x400"),
+            ("edit_mode_menu", "Режим редактирования", "300x200"),
+            ("print", "Печать", "400x300"),
+            ("export", "Экспорт", "350x250"),
+            ("share", "Поделиться", "400x250"),
+            ("multilevel", "Многоуровневый список", "300x250"),
+            ("line_spacing", "Междустрочный интервал", "300x250"),
+            ("borders", "Границы и заливка", "350x300"),
+            ("table", "Вставка таблицы", "300x250"),
+            ("hyperlink", "Вставка гиперссылки", "400x250"),
+            ("symbol", "Вставка символа", "400x350"),
+            ("theme", "Темы", "300x200"),
+            ("sort", "Сортировка", "300x200"),
+            ("history", "История версий", "640x520"),
+            ("performance", "Замеры команд", "900x500"),
+            ("memory", "Память", "760x560"),
+        ):
+            self.dialogs.register(name, title, geometry, getattr(self, f"build_{name}_dialog"))
+        # Из результатов открываются файлы, поэтому окно редактора остается доступным
+        self.dialogs.register("find_in_folder", "Найти в папке", "760x560",
+                              self.build_find_in_folder_dialog, modal=False)
+        self.after(self.DIALOG_WARM_UP_DELAY, lambda: self.dialogs.warm_up(self.WARM_DIALOGS))
+    
+    def dialog_summary(self):
+        """Строка о времени открытия диалогов для настроек"""
+        opened = {name: item for name, item in self.dialogs.stats().items() if item["opens"]}
+        if not opened:
+            return "Диалоги: еще не открывались\n"
+        name, slowest = max(opened.items(), key=lambda pair: pair[1]["max"])
+        mean = sum(item["mean"] * item["opens"] for item in opened.values()) / \
+            sum(item["opens"] for item in opened.values())
+        return (f"Диалоги: открытие в среднем {mean:.0f} мс, "
+                f"дольше всего {name} - {slowest['max']:.0f} мс\n")
+    
+    # === ЗАМЕРЫ КОМАНД ===
+    
+    def show_performance(self):
+        """Скрытая панель замеров команд (Ctrl+Shift+P)"""
+        if self.command_profiler is None:
+            self.messagebox.showinfo("Замеры команд",
+                "Замеры выключены. Запустите редактор с параметром --profile-commands")
+            return
+        self.dialogs.open("performance")
+    
+    def build_performance_dialog(self, window):
+        table = tk.Text(window, wrap="none", font=("Courier New", 10), bg="#1e1e1e", fg="#ffffff",
+                        relief="flat", padx=10, pady=10)
+        table.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        
+        def refresh():
+            lines = [f"{'Команда':<28}{'Вызовов':>8}{'Сумма, мс':>12}{'Среднее':>10}{'Макс':>10}  "
+                     f"Гистограмма, мс (корзины: {' '.join(bucket_labels())})"]
+            for name, item in self.command_profiler.report():
+                histogram = " ".join(f"{label}:{count}" for label, count in item["histogram"].items() if count)
+                sizes = " ".join(f"{label}:{value['mean_ms']:.1f}" for label, value in item["by_size"].items())
+                lines.append(f"{name[:27]:<28}{item['count']:>8}{item['total_ms']:>12.1f}"
+                             f"{item['mean_ms']:>10.2f}{item['max_ms']:>10.1f}  {histogram}  [{sizes}]")
+            table.configure(state="normal")
+            table.delete("1.0", "end")
+            table.insert("1.0", "\n".join(lines))
+            table.configure(state="disabled")
+        
+        def reset():
+            self.command_profiler.reset()
+            refresh()
+        
+        button_frame = ctk.CTkFrame(window, fg_color="transparent")
+        button_frame.pack(pady=10)
+        ctk.CTkButton(button_frame, text="Обновить", width=130,
+                     command=refresh).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Сбросить", width=130,
+                     command=reset).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Экспорт JSON", width=130,
+                     command=self.export_performance, fg_color="#0078d4").pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Закрыть", width=130,
+                     command=lambda: self.dialogs.close("performance")).pack(side="left", padx=5)
+        
+        return refresh
+    
+    def export_performance(self):
+        """Сохранить замеры команд в JSON"""
+        if self.command_profiler is None:
+            return
+        file_path = self.filedialog.asksaveasfilename(
+            defaultextension=".json", initialfile="commands.json",
+            filetypes=[("JSON", "*.json"), ("Все файлы", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            self.command_profiler.export(file_path)
+            self.show_status_notice(f"Замеры сохранены: {os.path.basename(file_path)}")
+        except OSError as e:
+            self.messagebox.showerror("Ошибка", f"Не удалось сохранить замеры:\n{str(e)}")
+    
+    # === ДИАГНОСТИКА ПАМЯТИ ===
+    
+    def memory_report(self):
+        """Сводка памяти сеанса: документ, теги, отмена, поиск, окна Tk"""
+        engine = self.search_engine
+        index = self.search_index
+        report = {
+            "time": time.time(),
+            "document": self.document.buffer_stats(),
+            "tags": diagnostics.tag_stats(self.text_area),
+            "styles": self.style_registry.stats(),
+            "undo": self.undo_manager.stats(),
+            "search": {"hits": len(engine),
+                       "bytes": (len(engine.starts) + len(engine.ends)) * engine.starts.itemsize},
+            "search_index": None if index is None else {
+                "ready": index.ready, "blocks": len(index.order),
+                "trigrams": len(index.trigrams), "words": len(index.words),
+            },
+            "history_pending_ops": len(self.history.ops) if self.history is not None else 0,
+            "windows": diagnostics.window_stats(self),
+            "dialogs_built": len(self.dialogs.dialogs),
+            "tracemalloc": self.get_memory_tracer().stats(),
+        }
+        if self.memory_tracer.last_diff is not None:
+            report["tracemalloc_diff"] = self.memory_tracer.last_diff
+        return report
+    
+    def get_memory_tracer(self):
+        """Снимки tracemalloc; модуль диагностики загружается при первом обращении"""
+        if self.memory_tracer is None:
+            self.memory_tracer = diagnostics.MemoryTracer()
+        return self.memory_tracer
+    
+    def show_memory(self):
+        """Скрытая панель памяти (Ctrl+Shift+M)"""
+        self.dialogs.open("memory")
+    
+    def build_memory_dialog(self, window):
+        view = tk.Text(window, wrap="none", font=("Courier New", 10), bg="#1e1e1e", fg="#ffffff",
+                       relief="flat", padx=10, pady=10)
+        view.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        tracer = self.get_memory_tracer()
+        
+        def megabytes(size):
+            return f"{size / (1 << 20):.1f} МБ"
+        
+        def refresh(diff=None):
+            report = self.memory_report()
+            document = report["document"]
+            tags = report["tags"]
+            undo = report["undo"]
+            windows = report["windows"]
+            lines = [
+                f"Документ: {document['length']} символов, кусков {document['pieces']}, "
+                f"буферы {megabytes(document['buffer_bytes'])}, "
+                f"снимок {megabytes(document['snapshot_text_bytes'])}",
+                f"Теги: {tags['tags']}, отрезков {tags['ranges']}; больше всего: "
+                + ", ".join(f"{tag} - {count}" for tag, count in tags["largest"][:5]),
+                f"Стили: {report['styles']['styles']}",
+                f"Отмена: {megabytes(undo['memory'])} из {megabytes(undo['budget'])}, "
+                f"записей {undo['undo']}, повтор {undo['redo']}, сжато {undo['packed']}, "
+                f"выброшено {undo['dropped']}",
+                f"Поиск: совпадений {report['search']['hits']} ({megabytes(report['search']['bytes'])})",
+            ]
+            if report["search_index"] is not None:
+                index = report["search_index"]
+                lines.append(f"Индекс поиска: блоков {index['blocks']}, триграмм {index['trigrams']}, "
+                             f"слов {index['words']}")
+            lines.append(f"История: правок до сохранения {report['history_pending_ops']}")
+            lines.append(f"Окна: виджетов {windows['widgets']}, Toplevel {windows['toplevels']} "
+                         f"(видимых {windows['visible_toplevels']}, диалогов в пуле {report['dialogs_built']}), "
+                         f"изображения {windows['images'] or 'нет'}, фото {megabytes(windows['photo_bytes'])}")
+            traced = report["tracemalloc"]
+            if traced["tracing"]:
+                lines.append(f"tracemalloc: сейчас {megabytes(traced['current'])}, пик {megabytes(traced['peak'])}, "
+                             f"сам tracemalloc {megabytes(traced['overhead'])}")
+            else:
+                lines.append("tracemalloc: выключен")
+            if diff:
+                lines.append("")
+                lines.append("Рост с отметки:")
+                for item in diff:
+                    lines.append(f"{item['size_diff'] / 1024:>+12.1f} КБ  {item['count_diff']:>+8}  {item['where']}")
+            view.configure(state="normal")
+            view.delete("1.0", "end")
+            view.insert("1.0", "\n".join(lines))
+            view.configure(state="disabled")
+            trace_button.configure(text="Остановить трассировку" if tracer.tracing else "Начать трассировку")
+        
+        def toggle_tracing():
+            if tracer.tracing:
+                tracer.stop()
+            else:
+                tracer.start()
+            refresh()
+        
+        def mark():
+            if tracer.tracing:
+                tracer.mark()
+                self.show_status_notice("Отметка памяти поставлена")
+        
+        def compare():
+            if tracer.tracing:
+                refresh(tracer.diff())
+        
+        def export():
+            file_path = self.filedialog.asksaveasfilename(
+                defaultextension=".json", initialfile="memory.json",
+                filetypes=[("JSON", "*.json"), ("Все файлы", "*.*")]
+            )
+            if not file_path:
+                return
+            try:
+                with open(file_path, "w", encoding="utf-8") as file:
+                    json.dump(self.memory_report(), file, ensure_ascii=False, indent=1)
+                self.show_status_notice(f"Отчет о памяти сохранен: {os.path.basename(file_path)}")
+            except OSError as e:
+                self.messagebox.showerror("Ошибка", f"Не удалось сохранить отчет:\n{str(e)}")
+        
+        button_frame = ctk.CTkFrame(window, fg_color="transparent")
+        button_frame.pack(pady=10)
+        ctk.CTkButton(button_frame, text="Обновить", width=100,
+                     command=refresh).pack(side="left", padx=3)
+        trace_button = ctk.CTkButton(button_frame, text="Начать трассировку", width=170,
+                                     command=toggle_tracing)
+        trace_button.pack(side="left", padx=3)
+        ctk.CTkButton(button_frame, text="Отметка", width=90,
+                     command=mark).pack(side="left", padx=3)
+        ctk.CTkButton(button_frame, text="Сравнить", width=90,
+                     command=compare).pack(side="left", padx=3)
+        ctk.CTkButton(button_frame, text="Экспорт JSON", width=120,
+                     command=export, fg_color="#0078d4").pack(side="left", padx=3)
+        ctk.CTkButton(button_frame, text="Закрыть", width=90,
+                     command=lambda: self.dialogs.close("memory")).pack(side="left", padx=3)
+        
+        return refresh
+    
+    # === СТОРОЖ ЗАВИСАНИЙ ===
+    
+    def start_watchdog(self):
+        """Зависания главного цикла пишутся в ~/.wordclone/stalls.log"""
+        self.watchdog = stallwatch.StallWatchdog(self, os.path.join(journal.RECOVERY_DIR, "stalls.log"),
+                                                 command=self.running_command)
+        try:
+            self.watchdog.start()
+        except OSError as e:
+            # Без каталога для журнала редактор работает, просто без сторожа
+            self.watchdog.stop()
+            if self.debug_mode:
+                self.stall_label.configure(text="Сторож зависаний недоступен")
+                self.show_status_notice(f"Сторож зависаний недоступен: {e}")
+            return
+        if self.debug_mode:
+            self.poll_watchdog()
+    
+    def running_command(self, frame):
+        """Команда, выполняемая на главном потоке (вызывается из потока сторожа)"""
+        if self.command_profiler is not None and self.command_profiler.current:
+            return self.command_profiler.current
+        # Без замеров - самая внешняя функция этого модуля в стеке
+        name = None
+        while frame is not None:
+            if frame.f_code.co_filename == __file__:
+                name = frame.f_code.co_name
+            frame = frame.f_back
+        return name
+    
+    def poll_watchdog(self):
+        stats = self.watchdog.stats()
+        text = f"Зависаний: {stats['stalls']}"
+        if stats["stalls"]:
+            text += f", худшее: {stats['worst']:.1f} с"
+        if text != self.stall_label.cget("text"):
+            self.stall_label.configure(text=text)
+        self.after(self.WATCHDOG_POLL_INTERVAL, self.poll_watchdog)
     
     # === ДОПОЛНИТЕЛЬНЫЕ ФУНКЦИИ МЕНЮ ===
     
     def show_file_menu(self):
         """Показать меню файла"""
-        window = ctk.CTkToplevel(self)
-        window.title("Файл")
-        window.geometry("350x500")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("file_menu")
+    
+    def build_file_menu_dialog(self, window):
         ctk.CTkLabel(window, text="Файл", font=("Segoe UI", 18, "bold")).pack(pady=20)
         
         buttons = [
@@ -727,6 +2177,7 @@ class EditorFunctions:
             ("📂 Открыть", self.open_file),
             ("💾 Сохранить", self.save_file),
             ("💾 Сохранить как...", self.save_file_as),
+            ("🕘 История версий", self.show_history),
             ("🖨 Печать", self.print_document),
             ("📤 Экспорт", self.export_document),
             ("⚙ Параметры", self.show_settings),
@@ -735,21 +2186,18 @@ class EditorFunctions:
         for text, command in buttons:
             ctk.CTkButton(window, text=text, width=280, height=40,
                          font=("Segoe UI", 11),
-                         command=lambda c=command: [c(), window.destroy()],
+                         command=lambda c=command: [self.dialogs.close("file_menu"), c()],
                          fg_color="transparent", hover_color="#3f3f3f",
                          anchor="w").pack(pady=3, padx=30)
         
         ctk.CTkButton(window, text="Закрыть меню", width=280, height=40,
-                     command=window.destroy, fg_color="#d84040").pack(pady=20)
+                     command=lambda: self.dialogs.close("file_menu"), fg_color="#d84040").pack(pady=20)
     
     def show_insert_menu(self):
         """Показать меню вставки"""
-        window = ctk.CTkToplevel(self)
-        window.title("Вставка")
-        window.geometry("350x400")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("insert_menu")
+    
+    def build_insert_menu_dialog(self, window):
         ctk.CTkLabel(window, text="Вставка элементов",
                     font=("Segoe UI", 16, "bold")).pack(pady=20)
         
@@ -764,52 +2212,46 @@ class EditorFunctions:
         
         for text, command in items:
             ctk.CTkButton(window, text=text, width=280, height=35,
-                         command=lambda c=command: [c(), window.destroy()],
+                         command=lambda c=command: [self.dialogs.close("insert_menu"), c()],
                          fg_color="#0078d4").pack(pady=5)
         
         ctk.CTkButton(window, text="Закрыть", width=280,
-                     command=window.destroy, fg_color="gray").pack(pady=15)
+                     command=lambda: self.dialogs.close("insert_menu"), fg_color="gray").pack(pady=15)
     
     def show_view_menu(self):
         """Показать меню вида"""
-        window = ctk.CTkToplevel(self)
-        window.title("Вид")
-        window.geometry("350x350")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("view_menu")
+    
+    def build_view_menu_dialog(self, window):
         ctk.CTkLabel(window, text="Параметры отображения",
                     font=("Segoe UI", 16, "bold")).pack(pady=20)
         
         def toggle_ruler():
             self.show_ruler = not self.show_ruler
             status = "включена" if self.show_ruler else "выключена"
-            messagebox.showinfo("Линейка", f"Линейка {status}")
-            window.destroy()
+            self.messagebox.showinfo("Линейка", f"Линейка {status}")
+            self.dialogs.close("view_menu")
         
         ctk.CTkButton(window, text="📏 Линейка", width=280, height=40,
                      command=toggle_ruler, fg_color="#0078d4").pack(pady=5)
         ctk.CTkButton(window, text="🔍 Масштаб", width=280, height=40,
-                     command=lambda: [self.zoom_settings(), window.destroy()],
+                     command=lambda: [self.dialogs.close("view_menu"), self.zoom_settings()],
                      fg_color="#0078d4").pack(pady=5)
         ctk.CTkButton(window, text="🎨 Темы", width=280, height=40,
-                     command=lambda: [self.change_theme(), window.destroy()],
+                     command=lambda: [self.dialogs.close("view_menu"), self.change_theme()],
                      fg_color="#0078d4").pack(pady=5)
         ctk.CTkButton(window, text="⚡ Режим фокусировки", width=280, height=40,
-                     command=lambda: [self.focus_mode(), window.destroy()],
+                     command=lambda: [self.dialogs.close("view_menu"), self.focus_mode()],
                      fg_color="#0078d4").pack(pady=5)
         
         ctk.CTkButton(window, text="Закрыть", width=280,
-                     command=window.destroy, fg_color="gray").pack(pady=15)
+                     command=lambda: self.dialogs.close("view_menu"), fg_color="gray").pack(pady=15)
     
     def show_help_menu(self):
         """Показать меню справки"""
-        window = ctk.CTkToplevel(self)
-        window.title("Справка")
-        window.geometry("450x400")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("help_menu")
+    
+    def build_help_menu_dialog(self, window):
         ctk.CTkLabel(window, text="Текстовый редактор",
                     font=("Segoe UI", 18, "bold")).pack(pady=15)
         ctk.CTkLabel(window, text="Версия 1.0",
@@ -829,6 +2271,7 @@ class EditorFunctions:
         Ctrl+Y - Повторить
         Ctrl+F - Найти
         Ctrl+H - Заменить
+        Ctrl+Shift+F - Найти в папке
         Ctrl+B - Жирный
         Ctrl+I - Курсив
         Ctrl+U - Подчеркнутый
@@ -840,16 +2283,13 @@ class EditorFunctions:
                     justify="left").pack(pady=10, padx=10)
         
         ctk.CTkButton(window, text="Закрыть", width=200,
-                     command=window.destroy, fg_color="#0078d4").pack(pady=10)
+                     command=lambda: self.dialogs.close("help_menu"), fg_color="#0078d4").pack(pady=10)
     
     def share_document(self):
         """Поделиться документом"""
-        window = ctk.CTkToplevel(self)
-        window.title("Поделиться")
-        window.geometry("400x250")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("share")
+    
+    def build_share_dialog(self, window):
         ctk.CTkLabel(window, text="Поделиться документом", 
                     font=("Segoe UI", 16, "bold")).pack(pady=20)
         
@@ -863,83 +2303,165 @@ class EditorFunctions:
         def send():
             email = email_entry.get()
             if email and "@" in email:
-                messagebox.showinfo("Успешно", f"Документ отправлен на:\n{email}")
-                window.destroy()
+                self.messagebox.showinfo("Успешно", f"Документ отправлен на:\n{email}")
+                self.dialogs.close("share")
             else:
-                messagebox.showerror("Ошибка", "Введите корректный email адрес")
+                self.messagebox.showerror("Ошибка", "Введите корректный email адрес")
         
         ctk.CTkButton(window, text="Отправить", width=180,
                      command=send, fg_color="#0078d4", hover_color="#1084d8").pack(pady=10)
+        
+        def reset():
+            email_entry.delete(0, "end")
+            email_entry.focus()
+        
+        return reset
     
     def show_notes(self):
         """Показать примечания"""
-        messagebox.showinfo("Примечания", 
+        self.messagebox.showinfo("Примечания", 
             "Функция примечаний позволяет добавлять заметки к документу")
     
     def schedule_meeting(self):
         """Запланировать встречу"""
-        messagebox.showinfo("Встреча", 
+        self.messagebox.showinfo("Встреча", 
             "Функция планирования встреч интегрирована с календарем")
     
     def show_edit_mode_menu(self):
         """Показать меню режимов редактирования"""
-        window = ctk.CTkToplevel(self)
-        window.title("Режим редактирования")
-        window.geometry("300x200")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("edit_mode_menu")
+    
+    def build_edit_mode_menu_dialog(self, window):
         ctk.CTkLabel(window, text="Выберите режим:",
                     font=("Segoe UI", 12, "bold")).pack(pady=15)
         
         ctk.CTkButton(window, text="✏ Редактирование", width=250,
-                     command=lambda: [messagebox.showinfo("Режим", "Режим: Редактирование"), window.destroy()]).pack(pady=5)
+                     command=lambda: [self.dialogs.close("edit_mode_menu"), self.leave_read_only_mode()]).pack(pady=5)
         ctk.CTkButton(window, text="👁 Только чтение", width=250,
-                     command=lambda: [messagebox.showinfo("Режим", "Режим: Только чтение"), window.destroy()]).pack(pady=5)
+                     command=lambda: [self.dialogs.close("edit_mode_menu"), self.enter_read_only_mode()]).pack(pady=5)
         ctk.CTkButton(window, text="📝 Рецензирование", width=250,
-                     command=lambda: [messagebox.showinfo("Режим", "Режим: Рецензирование"), window.destroy()]).pack(pady=5)
+                     command=lambda: [self.messagebox.showinfo("Режим", "Режим: Рецензирование"), self.dialogs.close("edit_mode_menu")]).pack(pady=5)
+    
+    # === РЕЖИМ ТОЛЬКО ЧТЕНИЯ ===
+    
+    def enter_read_only_mode(self):
+        """Открыть файл только для чтения: отображение в память и виртуальная прокрутка"""
+        if self.viewer is not None:
+            return
+        file_path = self.current_file or self.filedialog.askopenfilename(
+            filetypes=[("Текстовые файлы", "*.txt *.log"), ("Все файлы", "*.*")]
+        )
+        if not file_path:
+            return
+        if self.text_area.edit_modified() and not self.messagebox.askyesno(
+                "Только чтение", "Несохраненные изменения будут потеряны. Продолжить?"):
+            return
+        self.cancel_loading()
+        try:
+            mapped = largefile.MappedFile(file_path)
+        except Exception as e:
+            self.messagebox.showerror("Ошибка", f"Не удалось открыть файл:\n{str(e)}")
+            return
+        self.stop_journal()
+        self.stop_search_index()
+        self.stop_history()
+        # Без записи отмены: иначе весь текст документа лег бы в стек
+        self.text_area.configure(undo=False, wrap="none")
+        self.text_area.delete(1.0, "end")
+        self.text_area.edit_reset()
+        self.current_file = file_path
+        self.saved_state = None
+        self.viewer = largefile.VirtualViewport(self.text_area, mapped, self.scrollbar)
+        self.update_title()
+        mapped.start_indexing()
+        self.viewer.render(0)
+        self.poll_viewer_index()
+    
+    def poll_viewer_index(self):
+        """Обновлять число строк, пока индекс строится в фоне"""
+        viewer = self.viewer
+        if viewer is None:
+            return
+        mapped = viewer.mapped
+        if mapped.indexed:
+            self.page_label.configure(text=f"Только чтение    Строк: {mapped.line_count}")
+        else:
+            self.page_label.configure(text=f"Только чтение    Индексация... строк: {mapped.line_count}")
+            self.after(200, self.poll_viewer_index)
+        viewer.update_scrollbar()
+    
+    def leave_read_only_mode(self):
+        """Вернуться к редактированию файла, открытого только для чтения"""
+        if self.viewer is not None:
+            self.load_file(self.viewer.mapped.file_path)
+    
+    def close_viewer(self):
+        """Закрыть отображение файла и вернуть текстовой области обычный режим"""
+        viewer = self.viewer
+        if viewer is None:
+            return
+        self.text_area.configure(state="normal")
+        self.text_area.delete(1.0, "end")
+        self.viewer = None
+        viewer.mapped.close()
+        self.offset_anchor = ("1.0", 0)
+        self.text_area.configure(undo=True, wrap="word")
+        self.text_area.edit_reset()
+    
+    def on_text_yscroll(self, first, last):
+        """yscrollcommand текстовой области"""
+        if self.viewer is not None:
+            self.viewer.on_yscroll(first, last)
+        else:
+            self.scrollbar.set(first, last)
+            self.search_highlighter.update()
+    
+    def on_scrollbar(self, *args):
+        """Команда полосы прокрутки"""
+        if self.viewer is not None:
+            self.viewer.yview(*args)
+        else:
+            self.text_area.yview(*args)
     
     def export_document(self):
         """Экспорт документа"""
-        window = ctk.CTkToplevel(self)
-        window.title("Экспорт")
-        window.geometry("350x250")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("export")
+    
+    def build_export_dialog(self, window):
         ctk.CTkLabel(window, text="Экспорт документа",
                     font=("Segoe UI", 14, "bold")).pack(pady=20)
         
         ctk.CTkButton(window, text="📄 Экспорт в PDF", width=280,
-                     command=lambda: [messagebox.showinfo("Экспорт", "Экспорт в PDF"), window.destroy()]).pack(pady=5)
+                     command=lambda: [self.messagebox.showinfo("Экспорт", "Экспорт в PDF"), self.dialogs.close("export")]).pack(pady=5)
         ctk.CTkButton(window, text="📝 Экспорт в HTML", width=280,
-                     command=lambda: [messagebox.showinfo("Экспорт", "Экспорт в HTML"), window.destroy()]).pack(pady=5)
+                     command=lambda: [self.messagebox.showinfo("Экспорт", "Экспорт в HTML"), self.dialogs.close("export")]).pack(pady=5)
         ctk.CTkButton(window, text="📋 Экспорт в RTF", width=280,
-                     command=lambda: [messagebox.showinfo("Экспорт", "Экспорт в RTF"), window.destroy()]).pack(pady=5)
+                     command=lambda: [self.messagebox.showinfo("Экспорт", "Экспорт в RTF"), self.dialogs.close("export")]).pack(pady=5)
         ctk.CTkButton(window, text="Отмена", width=280,
-                     command=window.destroy, fg_color="gray").pack(pady=15)
+                     command=lambda: self.dialogs.close("export"), fg_color="gray").pack(pady=15)
     
     def show_settings(self):
         """Показать настройки"""
-        messagebox.showinfo("Настройки", 
-            "Здесь будут параметры приложения:\n- Автосохранение\n- Язык интерфейса\n- Шрифт по умолчанию")
+        self.messagebox.showinfo("Настройки", 
+            f"Автосохранение: журнал правок, сброс каждые {self.AUTOSAVE_INTERVAL // 1000} с\n"
+            f"Индекс поиска: {'для документов от 1 МБ' if self.search_index_enabled else 'выключен'}\n"
+            f"Отмена: {self.undo_manager.memory / (1 << 20):.1f} из {self.undo_manager.budget >> 20} МБ\n"
+            f"{self.dialog_summary()}"
+            "Здесь будут параметры приложения:\n- Язык интерфейса\n- Шрифт по умолчанию")
     
     def insert_image(self):
         """Вставить изображение"""
-        file_path = filedialog.askopenfilename(
+        file_path = self.filedialog.askopenfilename(
             filetypes=[("Изображения", "*.png *.jpg *.jpeg *.gif"), ("Все файлы", "*.*")]
         )
         if file_path:
-            messagebox.showinfo("Изображение", f"Изображение будет вставлено:\n{os.path.basename(file_path)}")
+            self.messagebox.showinfo("Изображение", f"Изображение будет вставлено:\n{os.path.basename(file_path)}")
     
     def insert_table(self):
         """Вставить таблицу"""
-        window = ctk.CTkToplevel(self)
-        window.title("Вставка таблицы")
-        window.geometry("300x250")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("table")
+    
+    def build_table_dialog(self, window):
         ctk.CTkLabel(window, text="Размер таблицы",
                     font=("Segoe UI", 14, "bold")).pack(pady=15)
         
@@ -958,19 +2480,23 @@ class EditorFunctions:
             for i in range(int(rows.get())):
                 table_text += "| " + " | ".join(["Ячейка"] * int(cols.get())) + " |\n"
             self.text_area.insert("insert", table_text)
-            window.destroy()
+            self.dialogs.close("table")
         
         ctk.CTkButton(window, text="Вставить", width=200,
                      command=insert, fg_color="#0078d4").pack(pady=15)
+        
+        def reset():
+            for entry in (rows, cols):
+                entry.delete(0, "end")
+                entry.insert(0, "3")
+        
+        return reset
     
     def insert_hyperlink(self):
         """Вставить гиперссылку"""
-        window = ctk.CTkToplevel(self)
-        window.title("Вставка гиперссылки")
-        window.geometry("400x250")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("hyperlink")
+    
+    def build_hyperlink_dialog(self, window):
         ctk.CTkLabel(window, text="Текст:", font=("Segoe UI", 11)).pack(pady=(20, 5))
         text_entry = ctk.CTkEntry(window, width=350)
         text_entry.pack(pady=5)
@@ -982,26 +2508,30 @@ class EditorFunctions:
         def insert():
             text = text_entry.get() or url_entry.get()
             self.text_area.insert("insert", text)
-            window.destroy()
+            self.dialogs.close("hyperlink")
         
         ctk.CTkButton(window, text="Вставить", width=200,
                      command=insert, fg_color="#0078d4").pack(pady=20)
+        
+        def reset():
+            text_entry.delete(0, "end")
+            url_entry.delete(0, "end")
+            text_entry.focus()
+        
+        return reset
     
     def insert_datetime(self):
         """Вставить дату и время"""
         from datetime import datetime
         now = datetime.now().strftime("%d.%m.%Y %H:%M")
         self.text_area.insert("insert", now)
-        messagebox.showinfo("Дата и время", f"Вставлено: {now}")
+        self.messagebox.showinfo("Дата и время", f"Вставлено: {now}")
     
     def insert_symbol(self):
         """Вставить символ"""
-        window = ctk.CTkToplevel(self)
-        window.title("Вставка символа")
-        window.geometry("400x350")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("symbol")
+    
+    def build_symbol_dialog(self, window):
         ctk.CTkLabel(window, text="Выберите символ",
                     font=("Segoe UI", 14, "bold")).pack(pady=15)
         
@@ -1020,37 +2550,34 @@ class EditorFunctions:
             
             ctk.CTkButton(row_frame, text=symbol, width=40, height=40,
                          font=("Segoe UI", 16),
-                         command=lambda s=symbol: [self.text_area.insert("insert", s), window.destroy()]
+                         command=lambda s=symbol: [self.text_area.insert("insert", s), self.dialogs.close("symbol")]
                          ).pack(side="left", padx=2)
         
         ctk.CTkButton(window, text="Закрыть", width=200,
-                     command=window.destroy).pack(pady=10)
+                     command=lambda: self.dialogs.close("symbol")).pack(pady=10)
     
     def insert_page_break(self):
         """Вставить разрыв страницы"""
         self.text_area.insert("insert", "\n" + "="*50 + " РАЗРЫВ СТРАНИЦЫ " + "="*50 + "\n")
-        messagebox.showinfo("Разрыв страницы", "Разрыв страницы вставлен")
+        self.messagebox.showinfo("Разрыв страницы", "Разрыв страницы вставлен")
     
     def zoom_settings(self):
         """Настройки масштаба"""
-        messagebox.showinfo("Масштаб", 
+        self.messagebox.showinfo("Масштаб", 
             f"Текущий масштаб: {self.zoom_level}%\nИспользуйте ползунок внизу для изменения")
     
     def change_theme(self):
         """Изменить тему"""
-        window = ctk.CTkToplevel(self)
-        window.title("Темы")
-        window.geometry("300x200")
-        window.transient(self)
-        window.grab_set()
-        
+        self.dialogs.open("theme")
+    
+    def build_theme_dialog(self, window):
         ctk.CTkLabel(window, text="Выберите тему:",
                     font=("Segoe UI", 12, "bold")).pack(pady=15)
         
         def set_theme(theme):
             ctk.set_appearance_mode(theme)
-            messagebox.showinfo("Тема", f"Установлена тема: {theme}")
-            window.destroy()
+            self.messagebox.showinfo("Тема", f"Установлена тема: {theme}")
+            self.dialogs.close("theme")
         
         ctk.CTkButton(window, text="🌙 Темная", width=250,
                      command=lambda: set_theme("dark")).pack(pady=5)
@@ -1061,5 +2588,5 @@ class EditorFunctions:
     
     def focus_mode(self):
         """Режим фокусировки"""
-        messagebox.showinfo("Режим фокусировки", 
+        self.messagebox.showinfo("Режим фокусировки", 
             "Режим фокусировки скрывает все панели для концентрации на тексте")
\ No newline at end of file
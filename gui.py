@@ -4,34 +4,36 @@ GUI модуль - интерфейс текстового редактора
 
 import customtkinter as ctk
 import tkinter as tk
+import time
 from functions import EditorFunctions
 
 class WordClone(ctk.CTk, EditorFunctions):
     def __init__(self):
+        started = time.perf_counter()
         ctk.CTk.__init__(self)
         EditorFunctions.__init__(self)
+        # Моменты запуска от начала построения окна, секунды
+        self.startup_started = started
+        self.startup_times = {}
         
         self.title("Текстовый редактор")
         self.geometry("1400x850")
         ctk.set_appearance_mode("dark")
         
-        # Состояние приложения
-        self.current_file = None
-        self.zoom_level = 100
-        self.current_font_family = "Arial"
-        self.current_font_size = 12
-        self.is_bold = False
-        self.is_italic = False
-        self.is_underline = False
-        self.show_ruler = False
-        self.show_symbols_visible = False
-        
-        # Создание интерфейса
+        # Создание интерфейса: группы ленты достраиваются после первого кадра
         self.create_title_bar()
         self.create_menu_bar()
         self.create_ribbon()
         self.create_text_area()
         self.create_status_bar()
+        self.register_dialogs()
+        self.text_area.bind("<Expose>", self.on_first_expose)
+        
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after(100, self.offer_recovery)
+        self.after(self.AUTOSAVE_INTERVAL, self.autosave_tick)
+        self.schedule_tag_compaction()
+        self.startup_times["construct"] = time.perf_counter() - started
         
     def create_title_bar(self):
         """Строка заголовка с панелью быстрого доступа"""
@@ -154,18 +156,40 @@ class WordClone(ctk.CTk, EditorFunctions):
         self.ribbon_frame.pack(fill="x")
         self.ribbon_frame.pack_propagate(False)
         
-        main_container = ctk.CTkFrame(self.ribbon_frame, fg_color="transparent")
-        main_container.pack(fill="both", expand=True, padx=6, pady=5)
-        
-        self.create_clipboard_group(main_container)
-        self.add_separator(main_container)
-        self.create_font_group(main_container)
-        self.add_separator(main_container)
-        self.create_paragraph_group(main_container)
-        self.add_separator(main_container)
-        self.create_styles_group(main_container)
-        self.add_separator(main_container)
-        self.create_editing_group(main_container)
+        # Высота ленты задана сразу, поэтому текст не сдвигается, когда появляются группы
+        self.ribbon_container = ctk.CTkFrame(self.ribbon_frame, fg_color="transparent")
+        self.ribbon_container.pack(fill="both", expand=True, padx=6, pady=5)
+        self.ribbon_pending = [
+            self.create_clipboard_group,
+            self.create_font_group,
+            self.create_paragraph_group,
+            self.create_styles_group,
+            self.create_editing_group,
+        ]
+    
+    def on_first_expose(self, event=None):
+        """Текстовая область впервые показана: кадр рисуется в ближайшем простое"""
+        self.text_area.unbind("<Expose>")
+        self.after_idle(self.on_first_paint)
+    
+    def on_first_paint(self):
+        self.startup_times["first_paint"] = time.perf_counter() - self.startup_started
+        # Пульс сторожа идет из главного цикла, поэтому сторож включается с первым кадром
+        self.start_watchdog()
+        self.after_idle(self.fill_ribbon)
+    
+    def fill_ribbon(self):
+        """Построить следующую группу ленты; между группами обрабатывается ввод"""
+        create_group = self.ribbon_pending.pop(0)
+        if self.ribbon_container.winfo_children():
+            self.add_separator(self.ribbon_container)
+        create_group(self.ribbon_container)
+        if self.ribbon_pending:
+            self.after_idle(self.fill_ribbon)
+            return
+        # Горячие клавиши переключают кнопки ленты, поэтому включаются после нее
+        self.bind_shortcuts()
+        self.startup_times["ribbon"] = time.perf_counter() - self.startup_started
         
     def add_separator(self, parent):
         """Добавить разделитель"""
@@ -526,15 +550,14 @@ class WordClone(ctk.CTk, EditorFunctions):
             selectbackground="#0078d4",
             selectforeground="#ffffff",
             relief="flat", padx=80, pady=30,
-            spacing1=3, spacing3=3, undo=True, maxundo=-1
+            spacing1=3, spacing3=3, undo=False
         )
         self.text_area.pack(side="left", fill="both", expand=True)
         
-        scrollbar = ctk.CTkScrollbar(text_container, command=self.text_area.yview)
-        scrollbar.pack(side="right", fill="y", padx=(0, 1))
-        self.text_area.configure(yscrollcommand=scrollbar.set)
-        
-        self.bind_shortcuts()
+        self.scrollbar = ctk.CTkScrollbar(text_container, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 1))
+        self.text_area.configure(yscrollcommand=self.on_text_yscroll)
+        self.attach_text_area()
         
     def create_status_bar(self):
         """Строка состояния"""
@@ -551,6 +574,20 @@ class WordClone(ctk.CTk, EditorFunctions):
         )
         self.page_label.pack(side="left", padx=10, pady=2)
         
+        self.notice_label = ctk.CTkLabel(
+            left_status, text="", font=("Segoe UI", 9), text_color="#909090"
+        )
+        self.notice_label.pack(side="left", padx=5, pady=2)
+        
+        if self.debug_mode:
+            self.stall_label = ctk.CTkLabel(
+                left_status, text="", font=("Segoe UI", 9), text_color="#d89040"
+            )
+            self.stall_label.pack(side="left", padx=5, pady=2)
+        
+        # Индикатор загрузки показывается только во время чтения файла
+        self.progress_bar = ctk.CTkProgressBar(left_status, width=120, height=8)
+        
         right_status = ctk.CTkFrame(self.status_frame, fg_color="transparent")
         right_status.pack(side="right", fill="y", padx=5)
         
@@ -609,19 +646,39 @@ class WordClone(ctk.CTk, EditorFunctions):
             command=self.fit_to_width
         ).pack(side="left", padx=2)
         
+        if self.command_profiler is not None:
+            ctk.CTkButton(
+                right_status, text="⏱", width=24, height=20,
+                fg_color="transparent", hover_color="#3f3f3f",
+                font=("Segoe UI", 10), corner_radius=2,
+                command=self.export_performance
+            ).pack(side="left", padx=(2, 0))
+        
         self.text_area.bind("<KeyRelease>", self.update_status)
+        self.text_area.bind("<<Selection>>", self.update_status)
+        self.document.add_listener(lambda kind, offset, text: self.update_status())
         
     def bind_shortcuts(self):
         """Привязка горячих клавиш"""
-        self.bind("<Control-b>", lambda e: self.toggle_bold())
-        self.bind("<Control-i>", lambda e: self.toggle_italic())
-        self.bind("<Control-u>", lambda e: self.toggle_underline())
-        self.bind("<Control-s>", lambda e: self.save_file())
-        self.bind("<Control-o>", lambda e: self.open_file())
-        self.bind("<Control-n>", lambda e: self.new_file())
-        self.bind("<Control-f>", lambda e: self.find_text())
-        self.bind("<Control-h>", lambda e: self.replace_text())
-        self.bind("<Control-z>", lambda e: self.undo())
-        self.bind("<Control-y>", lambda e: self.redo())
-        self.bind("<Control-a>", lambda e: self.select_all())
-        self.bind("<Control-p>", lambda e: self.print_document())
\ No newline at end of file
+        self.bind_shortcut("<Control-b>", lambda e: self.toggle_bold())
+        self.bind_shortcut("<Control-i>", lambda e: self.toggle_italic())
+        self.bind_shortcut("<Control-u>", lambda e: self.toggle_underline())
+        self.bind_shortcut("<Control-s>", lambda e: self.save_file())
+        self.bind_shortcut("<Control-o>", lambda e: self.open_file())
+        self.bind_shortcut("<Control-n>", lambda e: self.new_file())
+        self.bind_shortcut("<Control-f>", lambda e: self.find_text())
+        self.bind_shortcut("<Control-h>", lambda e: self.replace_text())
+        self.bind_shortcut("<Control-F>", lambda e: self.find_in_folder())
+        self.bind_shortcut("<Control-z>", lambda e: self.undo())
+        self.bind_shortcut("<Control-y>", lambda e: self.redo())
+        self.bind_shortcut("<Control-a>", lambda e: self.select_all())
+        self.bind_shortcut("<Control-p>", lambda e: self.print_document())
+        self.bind_shortcut("<Escape>", lambda e: self.cancel_loading())
+        self.bind_shortcut("<Control-P>", lambda e: self.show_performance())
+        self.bind_shortcut("<Control-M>", lambda e: self.show_memory())
+    
+    def bind_shortcut(self, sequence, handler):
+        """Привязать клавишу; при замерах нажатие считается командой с именем клавиши"""
+        if self.command_profiler is not None:
+            handler = self.command_profiler.wrap(sequence, handler)
+        self.bind(sequence, handler)
@@ -0,0 +1,1382 @@
+"""
+Модуль работы без окна - редактор для тестов, замеров и пакетной обработки
+
+HeadlessText повторяет нужную редактору часть tk.Text поверх Document:
+индексы с модификаторами, теги, метки, поиск и dump. Методы, как и в
+tkinter, вызывают команду виджета через интерпретатор HeadlessTcl, поэтому
+прокси документа (rename + createcommand) ставится так же, как на настоящий
+виджет, и отмена, зеркало документа и журнал работают без изменений.
+HeadlessEditor - EditorFunctions без окна: очередь after вместо mainloop,
+заглушки виджетов строки состояния и стандартные диалоги с готовыми ответами.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import deque
+import heapq
+import operator
+import re
+import time
+import tkinter as tk
+from types import SimpleNamespace
+
+from document import Document
+from functions import EditorFunctions
+
+
+# Порция текста при досчете начал строк
+LINE_SCAN_CHUNK = 1 << 16
+# Начиная с этого числа отрезков в одном tag add/remove - слияние вместо вставок по одному
+TAG_BATCH = 16
+
+TAG_OPTIONS = (
+    "background", "bgstipple", "borderwidth", "elide", "fgstipple", "font", "foreground",
+    "justify", "lmargin1", "lmargin2", "lmargincolor", "offset", "overstrike", "overstrikefg",
+    "relief", "rmargin", "rmargincolor", "selectbackground", "selectforeground",
+    "spacing1", "spacing2", "spacing3", "tabs", "tabstyle", "underline", "underlinefg", "wrap",
+)
+TEXT_DEFAULTS = {
+    "autoseparators": 1, "font": "TkFixedFont", "height": 24, "maxundo": 0, "spacing1": 0,
+    "spacing2": 0, "spacing3": 0, "state": "normal", "undo": 0, "width": 80, "wrap": "char",
+}
+
+LINE_COLUMN = re.compile(r"(\d+)\.(\d+)")
+INDEX_BASE = re.compile(
+    r"\s*(?:(-?\d+)\.(\d+|end)|(end)(?![^\s+\-])|@(-?\d+),(-?\d+)"
+    r"|([^\s+\-]+)\.(first|last)(?![^\s+\-])|([^\s+\-]+))")
+INDEX_MODIFIER = re.compile(
+    r"\s*(?:([+\-])\s*(\d+)\s*(?:(?:display|any)\s+)?([a-z]*)|(?:display\s+)?(linestart|lineend|wordstart|wordend))")
+NEWLINE = re.compile("\n")
+COMPARISONS = {"<": operator.lt, "<=": operator.le, "==": operator.eq,
+               ">=": operator.ge, ">": operator.gt, "!=": operator.ne}
+
+
+def split_list(value):
+    """Разобрать список Tcl: слова через пробел, {...} и "..." группируют"""
+    if isinstance(value, (tuple, list)):
+        return tuple(value)
+    value = str(value)
+    if not any(char in value for char in '{}"'):
+        return tuple(value.split())
+    items = []
+    pos = 0
+    size = len(value)
+    while True:
+        while pos < size and value[pos].isspace():
+            pos += 1
+        if pos >= size:
+            return tuple(items)
+        if value[pos] == "{":
+            depth = 1
+            end = pos + 1
+            while end < size and depth:
+                if value[end] == "{":
+                    depth += 1
+                elif value[end] == "}":
+                    depth -= 1
+                end += 1
+            items.append(value[pos + 1:end - 1])
+        elif value[pos] == '"':
+            end = value.find('"', pos + 1)
+            end = size if end < 0 else end + 1
+            items.append(value[pos + 1:end - 1])
+        else:
+            end = pos
+            while end < size and not value[end].isspace():
+                end += 1
+            items.append(value[pos:end])
+        pos = end
+
+
+def to_tcl(value):
+    """Значение аргумента в виде строки Tcl"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (tuple, list)):
+        words = (to_tcl(item) for item in value)
+        return " ".join(word if word and not any(char.isspace() or char in '{}"' for char in word)
+                        else "{" + word + "}" for word in words)
+    return str(value)
+
+
+class HeadlessTcl:
+    """Интерпретатор-заглушка: таблица команд, переменные и буфер обмена"""
+
+    def __init__(self):
+        self.commands = {}
+        self.variables = {}
+        self.clipboard = ""
+
+    def call(self, *args):
+        if len(args) == 1 and isinstance(args[0], tuple):
+            args = args[0]
+        # Как в _tkinter: None обрывает список аргументов
+        if None in args:
+            args = args[:args.index(None)]
+        name = str(args[0])
+        if name == "rename":
+            command = self.commands.pop(str(args[1]))
+            if len(args) > 2 and args[2]:
+                self.commands[str(args[2])] = command
+            return ""
+        command = self.commands.get(name)
+        if command is None:
+            raise tk.TclError(f'invalid command name "{name}"')
+        return command(*[to_tcl(arg) for arg in args[1:]])
+
+    def createcommand(self, name, function):
+        self.commands[name] = function
+
+    def deletecommand(self, name):
+        self.commands.pop(name, None)
+
+    def splitlist(self, value):
+        return split_list(value)
+
+    def getboolean(self, value):
+        if isinstance(value, (bool, int)):
+            return bool(value)
+        value = str(value).lower()
+        if value in ("1", "true", "yes", "on"):
+            return True
+        if value in ("0", "false", "no", "off"):
+            return False
+        raise tk.TclError(f'expected boolean value but got "{value}"')
+
+    def getint(self, value):
+        return int(value)
+
+    def getdouble(self, value):
+        return float(value)
+
+    def setvar(self, name, value):
+        self.variables[name] = value
+
+    def getvar(self, name):
+        return self.variables[name]
+
+
+class LineIndex:
+    """Начала строк буфера: досчитываются лениво, правка сбрасывает их только после себя
+
+    Число переводов строк и начало последней строки ведутся на каждой
+    правке, поэтому индексы в конце текста ("end", "end-1c") не требуют
+    пересчета даже после правки в начале большого документа.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.starts = [0]
+        self.scanned = 0            # все переводы строк до этого смещения учтены в starts
+        self.newlines = 0
+        self.last = 0               # начало последней строки; None - найти заново
+
+    def inserted(self, offset, text):
+        self.truncate(offset)
+        count = text.count("\n")
+        if count:
+            self.newlines += count
+            if self.last is not None and offset >= self.last:
+                self.last = offset + text.rfind("\n") + 1
+            elif self.last is not None:
+                self.last += len(text)
+        elif self.last is not None and offset < self.last:
+            self.last += len(text)
+
+    def deleted(self, offset, text):
+        self.truncate(offset)
+        self.newlines -= text.count("\n")
+        last = self.last
+        if last is None or offset >= last:
+            return
+        if offset + len(text) < last:
+            self.last = last - len(text)
+        else:
+            # Удален перевод строки перед последней строкой
+            self.last = None
+
+    def truncate(self, offset):
+        if offset < self.scanned:
+            del self.starts[bisect_right(self.starts, offset):]
+            self.scanned = offset
+
+    def scan(self, enough):
+        """Досчитывать начала строк, пока enough() ложно и текст не кончился
+
+        Порции растут от короткой: после правки обычно нужна лишь следующая строка.
+        """
+        size = 256
+        while not enough():
+            base = self.scanned
+            chunk = self.buffer.get(base, base + size)
+            if not chunk:
+                return
+            self.starts.extend(base + match.end() for match in NEWLINE.finditer(chunk))
+            self.scanned = base + len(chunk)
+            size = min(size * 2, LINE_SCAN_CHUNK)
+
+    def last_start(self):
+        if self.last is None:
+            pos = len(self.buffer)
+            while pos > 0:
+                chunk = self.buffer.get(max(0, pos - LINE_SCAN_CHUNK), pos)
+                found = chunk.rfind("\n")
+                if found >= 0:
+                    pos = pos - len(chunk) + found + 1
+                    break
+                pos -= len(chunk)
+            self.last = pos
+        return self.last
+
+    def line_start(self, line):
+        """Начало строки line (с 1; не дальше последней)"""
+        if line > self.newlines:
+            return self.last_start()
+        starts = self.starts
+        if len(starts) < line:
+            self.scan(lambda: len(starts) >= line)
+        return starts[line - 1]
+
+    def line_end(self, line):
+        if line > self.newlines:
+            return len(self.buffer)
+        return self.line_start(line + 1) - 1
+
+    def position(self, offset):
+        """Смещение -> (строка, столбец); смещение за текстом - строка "end" """
+        size = len(self.buffer)
+        if offset > size:
+            return self.newlines + 2, 0
+        last = self.last_start()
+        if offset >= last:
+            return self.newlines + 1, offset - last
+        if self.scanned <= offset:
+            self.scan(lambda: self.scanned > offset)
+        line = bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1]
+
+    def offset(self, line, column):
+        """(строка, столбец) -> смещение; столбец None - конец строки"""
+        if line < 1:
+            return 0
+        if line > self.newlines + 1:
+            return len(self.buffer) + 1
+        end = self.line_end(line)
+        if column is None:
+            return end
+        return min(self.line_start(line) + column, end)
+
+
+class TagRanges:
+    """Отрезки одного тега: отсортированные границы начало, конец, начало, ..."""
+
+    __slots__ = ("bounds", "options")
+
+    def __init__(self):
+        self.bounds = []
+        self.options = {}
+
+    def pairs(self):
+        bounds = self.bounds
+        return list(zip(bounds[::2], bounds[1::2]))
+
+    def contains(self, offset):
+        return bisect_right(self.bounds, offset) % 2 == 1
+
+    def add(self, start, end):
+        bounds = self.bounds
+        first = bisect_left(bounds, start)
+        last = bisect_right(bounds, end)
+        bounds[first:last] = ([start] if first % 2 == 0 else []) + ([end] if last % 2 == 0 else [])
+
+    def remove(self, start, end):
+        bounds = self.bounds
+        first = bisect_left(bounds, start)
+        last = bisect_right(bounds, end)
+        bounds[first:last] = ([start] if first % 2 else []) + ([end] if last % 2 else [])
+
+    def add_many(self, spans):
+        self.bounds = flatten(merge(self.pairs() + spans))
+
+    def remove_many(self, spans):
+        result = []
+        removed = merge(spans)
+        number = 0
+        for start, end in self.pairs():
+            while number < len(removed) and removed[number][1] <= start:
+                number += 1
+            position = start
+            probe = number
+            while probe < len(removed) and removed[probe][0] < end:
+                if removed[probe][0] > position:
+                    result.append((position, removed[probe][0]))
+                position = max(position, removed[probe][1])
+                probe += 1
+            if position < end:
+                result.append((position, end))
+        self.bounds = flatten(result)
+
+    def nextrange(self, start, end):
+        """Первый отрезок, который начинается в [start, end)"""
+        bounds = self.bounds
+        number = bisect_left(bounds, start)
+        number += number % 2
+        if number < len(bounds) and bounds[number] < end:
+            return bounds[number], bounds[number + 1]
+        return None
+
+    def prevrange(self, start, end):
+        """Последний отрезок, который начинается в [end, start)"""
+        bounds = self.bounds
+        number = bisect_left(bounds, start) - 1
+        number -= number % 2
+        if number >= 0 and bounds[number] >= end:
+            return bounds[number], bounds[number + 1]
+        return None
+
+    def inserted(self, offset, size):
+        """Сдвиг после вставки: отрезок, внутри которого вставка, растягивается"""
+        bounds = self.bounds
+        if not bounds or bounds[-1] < offset:
+            return
+        number = bisect_left(bounds, offset)
+        if number % 2 and bounds[number] == offset:
+            number += 1
+        bounds[number:] = [bound + size for bound in bounds[number:]]
+
+    def deleted(self, start, end):
+        """Сдвиг после удаления [start, end): границы внутри сходятся в start"""
+        bounds = self.bounds
+        if not bounds or bounds[-1] < start:
+            return
+        first = bisect_left(bounds, start)
+        last = bisect_right(bounds, end)
+        size = end - start
+        # Четное число совпавших границ - пустые отрезки и стыки, они взаимно уничтожаются
+        bounds[first:] = ([start] if (last - first) % 2 else []) + [bound - size for bound in bounds[last:]]
+
+
+def merge(spans):
+    """Объединение отрезков; соприкасающиеся склеиваются"""
+    result = []
+    for start, end in sorted(spans):
+        if result and start <= result[-1][1]:
+            if end > result[-1][1]:
+                result[-1] = (result[-1][0], end)
+        else:
+            result.append((start, end))
+    return result
+
+
+def flatten(spans):
+    return [bound for span in spans for bound in span]
+
+
+def is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+class HeadlessText:
+    """Текстовая область без окна с интерфейсом tk.Text"""
+
+    def __init__(self, tcl=None, name=".text", **options):
+        self.tk = tcl if tcl is not None else HeadlessTcl()
+        self._w = name
+        self.buffer = Document()
+        self.lines = LineIndex(self.buffer)
+        self.tags = {"sel": TagRanges()}
+        self.tag_order = ["sel"]            # приоритет: от низшего к высшему
+        self.marks = {"insert": [0, "right"], "current": [0, "right"]}
+        self.options = dict(TEXT_DEFAULTS)
+        self.modified = False
+        self.bindings = {}
+        # Смещения уже разобранных индексов; сбрасываются любым изменением текста, меток и тегов
+        self.offsets = {}
+        self.tk.createcommand(name, self.command)
+        if options:
+            self.configure(**options)
+
+    # === КОМАНДА ВИДЖЕТА ===
+
+    def command(self, *args):
+        """Обработчик Tcl-команды виджета: аргументы - строки, как от Tcl"""
+        if not args:
+            raise tk.TclError(f'wrong # args: should be "{self._w} option ?arg ...?"')
+        handler = getattr(self, "cmd_" + args[0], None)
+        if handler is None:
+            raise tk.TclError(f'bad option "{args[0]}"')
+        return handler(*args[1:])
+
+    def cmd_index(self, index):
+        return self.index_of(self.offset(index))
+
+    def cmd_get(self, *indices):
+        if len(indices) == 1:
+            indices += (indices[0] + "+1c",)
+        parts = []
+        for first, last in zip(indices[::2], indices[1::2]):
+            start = self.offset(first)
+            end = self.offset(last)
+            if end > start:
+                parts.append(self.buffer.get(start, end))
+                if end > len(self.buffer):
+                    # Завершающий перевод строки, который есть в каждом tk.Text
+                    parts.append("\n")
+        return "".join(parts)
+
+    def cmd_insert(self, index, *args):
+        if self.options["state"] == "disabled" or not args:
+            return ""
+        offset = min(self.offset(index), len(self.buffer))
+        for number in range(0, len(args), 2):
+            text = args[number]
+            tags = split_list(args[number + 1]) if number + 1 < len(args) else None
+            self.insert_text(offset, text, tags)
+            offset += len(text)
+        return ""
+
+    def cmd_delete(self, *indices):
+        if self.options["state"] == "disabled" or not indices:
+            return ""
+        indices = list(indices)
+        if len(indices) % 2:
+            indices.append(indices[-1] + "+1c")
+        spans = []
+        for first, last in zip(indices[::2], indices[1::2]):
+            start = self.offset(first)
+            end = min(self.offset(last), len(self.buffer))
+            if end > start:
+                spans.append((start, end))
+        for start, end in sorted(merge(spans), reverse=True):
+            self.delete_text(start, end)
+        return ""
+
+    def cmd_replace(self, first, last, *args):
+        if self.options["state"] == "disabled":
+            return ""
+        start = self.offset(first)
+        end = min(self.offset(last), len(self.buffer))
+        if end > start:
+            self.delete_text(start, end)
+        start = min(start, len(self.buffer))
+        for number in range(0, len(args), 2):
+            text = args[number]
+            tags = split_list(args[number + 1]) if number + 1 < len(args) else None
+            self.insert_text(start, text, tags)
+            start += len(text)
+        return ""
+
+    def cmd_compare(self, first, operator, last):
+        compare = COMPARISONS.get(operator)
+        if compare is None:
+            raise tk.TclError(f'bad comparison operator "{operator}"')
+        return int(compare(self.offset(first), self.offset(last)))
+
+    def cmd_count(self, *args):
+        options = [arg for arg in args if arg.startswith("-")] or ["-indices"]
+        first, last = (self.offset(index) for index in args[-2:])
+        results = []
+        for option in options:
+            if option in ("-chars", "-indices", "-displaychars", "-displayindices"):
+                results.append(last - first)
+            elif option in ("-lines", "-displaylines"):
+                results.append(self.lines.position(last)[0] - self.lines.position(first)[0])
+            elif option != "-update":
+                raise tk.TclError(f'bad option "{option}"')
+        return results[0] if len(results) == 1 else tuple(results)
+
+    def cmd_see(self, index):
+        self.offset(index)
+        return ""
+
+    def cmd_yview(self, *args):
+        return (0.0, 1.0) if not args else ""
+
+    cmd_xview = cmd_yview
+
+    def cmd_cget(self, option):
+        name = option.lstrip("-")
+        if name not in self.options:
+            raise tk.TclError(f'unknown option "{option}"')
+        return self.options[name]
+
+    def cmd_configure(self, *args):
+        if not args:
+            return tuple((f"-{name}", name, name, TEXT_DEFAULTS.get(name, ""), value)
+                         for name, value in self.options.items())
+        if len(args) == 1:
+            name = args[0].lstrip("-")
+            return (args[0], name, name, TEXT_DEFAULTS.get(name, ""), self.options.get(name, ""))
+        for option, value in zip(args[::2], args[1::2]):
+            self.options[option.lstrip("-")] = value
+        return ""
+
+    cmd_config = cmd_configure
+
+    def cmd_edit(self, subcommand, *args):
+        if subcommand == "modified":
+            if args:
+                self.set_modified(self.tk.getboolean(args[0]))
+                return ""
+            return int(self.modified)
+        # Встроенного стека отмены нет: отмену ведет редактор через прокси
+        if subcommand in ("canundo", "canredo"):
+            return 0
+        if subcommand in ("undo", "redo", "separator", "reset"):
+            return ""
+        raise tk.TclError(f'bad edit option "{subcommand}"')
+
+    def cmd_mark(self, subcommand, *args):
+        self.offsets.clear()
+        if subcommand == "set":
+            name, index = args
+            gravity = self.marks[name][1] if name in self.marks else "right"
+            self.marks[name] = [min(self.offset(index), len(self.buffer)), gravity]
+            return ""
+        if subcommand == "unset":
+            for name in args:
+                if name not in ("insert", "current"):
+                    self.marks.pop(name, None)
+            return ""
+        if subcommand == "names":
+            return tuple(self.marks)
+        if subcommand == "gravity":
+            mark = self.marks.get(args[0])
+            if mark is None:
+                raise tk.TclError(f'there is no mark named "{args[0]}"')
+            if len(args) > 1:
+                mark[1] = args[1]
+                return ""
+            return mark[1]
+        raise tk.TclError(f'bad mark option "{subcommand}"')
+
+    def cmd_tag(self, subcommand, *args):
+        handler = getattr(self, "tag_" + subcommand + "_command", None)
+        if handler is None:
+            raise tk.TclError(f'bad tag option "{subcommand}"')
+        return handler(*args)
+
+    def tag_add_command(self, tag, *indices):
+        self.change_tag(tag, indices, True)
+        return ""
+
+    def tag_remove_command(self, tag, *indices):
+        self.change_tag(tag, indices, False)
+        return ""
+
+    def tag_ranges_command(self, tag):
+        ranges = self.tags.get(tag)
+        if ranges is None:
+            return ()
+        return tuple(self.index_of(bound) for bound in ranges.bounds)
+
+    def tag_names_command(self, index=None):
+        if index is None:
+            return tuple(self.tag_order)
+        offset = self.offset(index)
+        return tuple(tag for tag in self.tag_order if self.tags[tag].contains(offset))
+
+    def tag_nextrange_command(self, tag, first, last="end"):
+        ranges = self.tags.get(tag)
+        found = ranges and ranges.nextrange(self.offset(first), self.offset(last))
+        return tuple(self.index_of(bound) for bound in found) if found else ""
+
+    def tag_prevrange_command(self, tag, first, last="1.0"):
+        ranges = self.tags.get(tag)
+        found = ranges and ranges.prevrange(self.offset(first), self.offset(last))
+        return tuple(self.index_of(bound) for bound in found) if found else ""
+
+    def tag_configure_command(self, tag, *args):
+        ranges = self.tag(tag)
+        if not args:
+            return tuple((f"-{name}", "", "", "", ranges.options.get(name, "")) for name in TAG_OPTIONS)
+        if len(args) == 1:
+            name = self.tag_option(args[0])
+            return (args[0], "", "", "", ranges.options.get(name, ""))
+        for option, value in zip(args[::2], args[1::2]):
+            name = self.tag_option(option)
+            if value == "":
+                ranges.options.pop(name, None)
+            else:
+                ranges.options[name] = value
+        return ""
+
+    tag_config_command = tag_configure_command
+
+    def tag_cget_command(self, tag, option):
+        if tag not in self.tags:
+            raise tk.TclError(f'tag "{tag}" isn\'t defined in text widget')
+        return self.tags[tag].options.get(self.tag_option(option), "")
+
+    def tag_delete_command(self, *tags):
+        self.offsets.clear()
+        for tag in tags:
+            if tag == "sel":
+                self.tags["sel"].bounds = []
+            elif tag in self.tags:
+                del self.tags[tag]
+                self.tag_order.remove(tag)
+        return ""
+
+    def tag_raise_command(self, tag, above=None):
+        self.tag(tag)
+        self.tag_order.remove(tag)
+        if above is None:
+            self.tag_order.append(tag)
+        else:
+            self.tag_order.insert(self.tag_order.index(above) + 1, tag)
+        return ""
+
+    def tag_lower_command(self, tag, below=None):
+        self.tag(tag)
+        self.tag_order.remove(tag)
+        self.tag_order.insert(0 if below is None else self.tag_order.index(below), tag)
+        return ""
+
+    def tag_bind_command(self, *args):
+        return ""
+
+    def cmd_search(self, *args):
+        switches = set()
+        count_variable = None
+        args = list(args)
+        while args and args[0].startswith("-"):
+            switch = args.pop(0)
+            if switch == "--":
+                break
+            if switch == "-count":
+                count_variable = args.pop(0)
+            else:
+                switches.add(switch)
+        pattern, index = args[0], args[1]
+        stop = args[2] if len(args) > 2 else None
+        matches = self.find(pattern, self.offset(index), None if stop is None else self.offset(stop),
+                            "-backwards" in switches, "-regexp" in switches, "-nocase" in switches,
+                            "-all" in switches)
+        if count_variable is not None:
+            lengths = [end - start for start, end in matches]
+            self.tk.setvar(count_variable, tuple(lengths) if "-all" in switches else (lengths or [0])[0])
+        if "-all" in switches:
+            return tuple(self.index_of(start) for start, end in matches)
+        return self.index_of(matches[0][0]) if matches else ""
+
+    def cmd_dump(self, *args):
+        switches = set()
+        args = list(args)
+        while args and args[0].startswith("-"):
+            switch = args.pop(0)
+            if switch == "-command":
+                raise tk.TclError("dump -command is not supported without a display")
+            switches.add(switch)
+        if not switches or "-all" in switches:
+            switches = {"-tag", "-mark", "-text"}
+        start = self.offset(args[0])
+        end = self.offset(args[1]) if len(args) > 1 else start + 1
+        size = len(self.buffer)
+        events = []
+        if "-tag" in switches:
+            for priority, tag in enumerate(self.tag_order):
+                bounds = self.tags[tag].bounds
+                for number in range(bisect_left(bounds, start), bisect_left(bounds, end)):
+                    # На одной позиции сначала закрытия, потом открытия
+                    events.append((bounds[number], 1 + (number % 2 == 0), priority, "tagoff" if number % 2 else "tagon", tag))
+        if "-mark" in switches:
+            for name, (offset, gravity) in self.marks.items():
+                if start <= offset < end:
+                    events.append((offset, 0, 0, "mark", name))
+        events.sort()
+        result = []
+        position = start
+        for offset, order, priority, key, value in events:
+            if "-text" in switches:
+                self.dump_text(result, position, offset)
+                position = offset
+            result += [key, value, self.index_of(offset)]
+        if "-text" in switches:
+            self.dump_text(result, position, min(end, size + 1))
+        return tuple(result)
+
+    def dump_text(self, result, start, end):
+        """Текст [start, end) кусками до конца строки"""
+        if start >= end:
+            return
+        text = self.buffer.get(start, end) + ("\n" if end > len(self.buffer) else "")
+        for line in text.splitlines(keepends=True):
+            result += ["text", line, self.index_of(start)]
+            start += len(line)
+
+    # === ПРАВКИ ===
+
+    def insert_text(self, offset, text, tags=None):
+        """Вставить текст; tags - точный список его тегов, None - общие теги соседей"""
+        if not text:
+            return
+        self.offsets.clear()
+        self.buffer.insert(offset, text)
+        self.lines.inserted(offset, text)
+        size = len(text)
+        for ranges in self.tags.values():
+            ranges.inserted(offset, size)
+        if tags is not None:
+            for tag in tags:
+                self.tag(tag)
+            for tag, ranges in self.tags.items():
+                if tag in tags:
+                    ranges.add(offset, offset + size)
+                elif ranges.contains(offset):
+                    ranges.remove(offset, offset + size)
+        for mark in self.marks.values():
+            if mark[0] > offset or (mark[0] == offset and mark[1] == "right"):
+                mark[0] += size
+        self.set_modified(True)
+
+    def delete_text(self, start, end):
+        self.offsets.clear()
+        removed = self.buffer.delete(start, end)
+        self.lines.deleted(start, removed)
+        for ranges in self.tags.values():
+            ranges.deleted(start, end)
+        for mark in self.marks.values():
+            if mark[0] > end:
+                mark[0] -= end - start
+            elif mark[0] > start:
+                mark[0] = start
+        self.set_modified(True)
+
+    def change_tag(self, tag, indices, add):
+        ranges = self.tag(tag) if add else self.tags.get(tag)
+        if ranges is None:
+            return
+        indices = list(indices)
+        if len(indices) % 2:
+            indices.append(indices[-1] + "+1c")
+        spans = []
+        for first, last in zip(indices[::2], indices[1::2]):
+            start = self.offset(first)
+            end = self.offset(last)
+            if end > start:
+                spans.append((start, end))
+        self.offsets.clear()
+        if len(spans) >= TAG_BATCH:
+            if add:
+                ranges.add_many(spans)
+            else:
+                ranges.remove_many(spans)
+            return
+        for start, end in spans:
+            if add:
+                ranges.add(start, end)
+            else:
+                ranges.remove(start, end)
+
+    def tag(self, name):
+        """Тег по имени; новый тег получает высший приоритет"""
+        ranges = self.tags.get(name)
+        if ranges is None:
+            ranges = self.tags[name] = TagRanges()
+            self.tag_order.append(name)
+        return ranges
+
+    def tag_option(self, option):
+        name = option.lstrip("-")
+        if name not in TAG_OPTIONS:
+            raise tk.TclError(f'unknown option "{option}"')
+        return name
+
+    def set_modified(self, value):
+        if value != self.modified:
+            self.modified = value
+            self.fire("<<Modified>>")
+
+    # === ИНДЕКСЫ ===
+
+    def index_of(self, offset):
+        line, column = self.lines.position(offset)
+        return f"{line}.{column}"
+
+    def offset(self, index):
+        """Индекс Tk с модификаторами -> смещение; len(buffer) + 1 - это "end" """
+        offset = self.offsets.get(index)
+        if offset is None:
+            offset = self.offsets[index] = self.parse_index(str(index))
+        return offset
+
+    def parse_index(self, index):
+        match = LINE_COLUMN.fullmatch(index)
+        if match:
+            return self.lines.offset(int(match[1]), int(match[2]))
+        match = INDEX_BASE.match(index)
+        if match is None:
+            raise tk.TclError(f'bad text index "{index}"')
+        line, column, end, x, y, tag, edge, mark = match.groups()
+        size = len(self.buffer)
+        if line is not None:
+            offset = self.lines.offset(int(line), None if column == "end" else int(column))
+        elif end is not None:
+            offset = size + 1
+        elif x is not None:
+            # Окна нет: виден весь текст с первой строки
+            offset = 0
+        elif tag is not None:
+            bounds = self.tags[tag].bounds if tag in self.tags else ()
+            if not bounds:
+                raise tk.TclError(f'text doesn\'t contain any characters tagged with "{tag}"')
+            offset = bounds[0] if edge == "first" else bounds[-1]
+        elif mark in self.marks:
+            offset = self.marks[mark][0]
+        else:
+            raise tk.TclError(f'bad text index "{index}"')
+        pos = match.end()
+        while pos < len(index):
+            match = INDEX_MODIFIER.match(index, pos)
+            if match is None or match.end() == pos:
+                if index[pos:].isspace():
+                    break
+                raise tk.TclError(f'bad text index "{index}"')
+            pos = match.end()
+            sign, amount, unit, word = match.groups()
+            if word is not None:
+                offset = self.adjust(offset, word)
+            elif unit.startswith("l"):
+                line, column = self.lines.position(offset)
+                line += int(amount) if sign == "+" else -int(amount)
+                offset = self.lines.offset(max(1, line), column)
+            elif unit == "" or unit.startswith(("c", "i")):
+                offset += int(amount) if sign == "+" else -int(amount)
+                offset = max(0, min(offset, size + 1))
+            else:
+                raise tk.TclError(f'bad text index "{index}"')
+        return offset
+
+    def adjust(self, offset, word):
+        """linestart / lineend / wordstart / wordend"""
+        size = len(self.buffer)
+        if offset > size:
+            return offset
+        line, column = self.lines.position(offset)
+        if word == "linestart":
+            return offset - column
+        if word == "lineend":
+            return self.lines.line_end(line)
+        if offset == size or not is_word_char(self.buffer.get(offset, offset + 1)):
+            return offset if word == "wordstart" else offset + 1
+        if word == "wordstart":
+            while offset > 0:
+                chunk = self.buffer.get(max(0, offset - 64), offset)
+                for char in reversed(chunk):
+                    if not is_word_char(char):
+                        return offset
+                    offset -= 1
+            return offset
+        while offset < size:
+            chunk = self.buffer.get(offset, offset + 64)
+            for char in chunk:
+                if not is_word_char(char):
+                    return offset
+                offset += 1
+        return offset
+
+    # === ПОИСК ===
+
+    def find(self, pattern, start, stop, backwards, regexp, nocase, every):
+        """Совпадения (начало, конец); без stop поиск идет по кругу"""
+        text = self.buffer.snapshot().text()
+        size = len(text)
+        start = min(start, size)
+        if regexp or nocase:
+            regex = re.compile(pattern if regexp else re.escape(pattern),
+                               re.MULTILINE | (re.IGNORECASE if nocase else 0))
+        else:
+            regex = None
+        if every:
+            lo, hi = (start, size) if not backwards else (0, start)
+            if stop is not None:
+                lo, hi = (start, stop) if not backwards else (stop, start)
+            return self.matches(text, regex, pattern, lo, hi)
+        if backwards:
+            areas = [(stop if stop is not None else 0, start)]
+            if stop is None:
+                areas.append((start, size))
+        else:
+            areas = [(start, stop if stop is not None else size)]
+            if stop is None:
+                areas.append((0, start))
+        for lo, hi in areas:
+            if lo >= hi:
+                continue
+            if backwards:
+                found = self.matches(text, regex, pattern, lo, hi)
+                if found:
+                    return [found[-1]]
+            elif regex is None:
+                found = text.find(pattern, lo, hi - 1 + len(pattern))
+                if found >= 0:
+                    return [(found, found + len(pattern))]
+            else:
+                match = regex.search(text, lo)
+                if match and match.start() < hi:
+                    return [match.span()]
+        return []
+
+    def matches(self, text, regex, pattern, lo, hi):
+        """Все совпадения, начинающиеся в [lo, hi)"""
+        if regex is None:
+            regex = re.compile(re.escape(pattern))
+        found = []
+        for match in regex.finditer(text, lo):
+            if match.start() >= hi:
+                break
+            if match.end() > match.start():
+                found.append(match.span())
+        return found
+
+    # === СОБЫТИЯ ===
+
+    def fire(self, sequence):
+        event = SimpleNamespace(widget=self, type=sequence)
+        for function in list(self.bindings.get(sequence, ())):
+            function(event)
+
+    # === ИНТЕРФЕЙС tk.Text ===
+
+    def get(self, index1, index2=None):
+        return self.tk.call(self._w, "get", index1, index2)
+
+    def insert(self, index, chars, *args):
+        self.tk.call((self._w, "insert", index, chars) + args)
+
+    def delete(self, index1, index2=None):
+        self.tk.call(self._w, "delete", index1, index2)
+
+    def replace(self, index1, index2, chars, *args):
+        self.tk.call(self._w, "replace", index1, index2, chars, *args)
+
+    def index(self, index):
+        return str(self.tk.call(self._w, "index", index))
+
+    def compare(self, index1, op, index2):
+        return self.tk.getboolean(self.tk.call(self._w, "compare", index1, op, index2))
+
+    def count(self, index1, index2, *args):
+        args = [f"-{arg}" for arg in args] + [index1, index2]
+        result = self.tk.call(self._w, "count", *args) or None
+        if result is not None and len(args) <= 3:
+            return (result,)
+        return result
+
+    def search(self, pattern, index, stopindex=None, forwards=None, backwards=None, exact=None,
+               regexp=None, nocase=None, count=None, elide=None):
+        args = [self._w, "search"]
+        for name, value in (("forwards", forwards), ("backwards", backwards), ("exact", exact),
+                            ("regexp", regexp), ("nocase", nocase), ("elide", elide)):
+            if value:
+                args.append(f"-{name}")
+        if count is not None:
+            args += ["-count", "::headless_count"]
+        if pattern and pattern[0] == "-":
+            args.append("--")
+        args += [pattern, index]
+        if stopindex:
+            args.append(stopindex)
+        result = str(self.tk.call(tuple(args)))
+        if count is not None:
+            count.set(self.tk.variables.pop("::headless_count"))
+        return result
+
+    def see(self, index):
+        self.tk.call(self._w, "see", index)
+
+    def yview(self, *args):
+        return self.tk.call(self._w, "yview", *args)
+
+    def xview(self, *args):
+        return self.tk.call(self._w, "xview", *args)
+
+    def mark_set(self, markName, index):
+        self.tk.call(self._w, "mark", "set", markName, index)
+
+    def mark_unset(self, *markNames):
+        self.tk.call(self._w, "mark", "unset", *markNames)
+
+    def mark_names(self):
+        return self.tk.splitlist(self.tk.call(self._w, "mark", "names"))
+
+    def mark_gravity(self, markName, direction=None):
+        return self.tk.call(self._w, "mark", "gravity", markName, direction)
+
+    def tag_add(self, tagName, index1, *args):
+        self.tk.call(self._w, "tag", "add", tagName, index1, *args)
+
+    def tag_remove(self, tagName, index1, index2=None):
+        self.tk.call(self._w, "tag", "remove", tagName, index1, index2)
+
+    def tag_ranges(self, tagName):
+        return self.tk.splitlist(self.tk.call(self._w, "tag", "ranges", tagName))
+
+    def tag_names(self, index=None):
+        return self.tk.splitlist(self.tk.call(self._w, "tag", "names", index))
+
+    def tag_nextrange(self, tagName, index1, index2=None):
+        return self.tk.splitlist(self.tk.call(self._w, "tag", "nextrange", tagName, index1, index2))
+
+    def tag_prevrange(self, tagName, index1, index2=None):
+        return self.tk.splitlist(self.tk.call(self._w, "tag", "prevrange", tagName, index1, index2))
+
+    def tag_configure(self, tagName, cnf=None, **kw):
+        return self.configure_command(("tag", "configure", tagName), cnf, kw)
+
+    tag_config = tag_configure
+
+    def tag_cget(self, tagName, option):
+        return self.tk.call(self._w, "tag", "cget", tagName, f"-{option}")
+
+    def tag_delete(self, *tagNames):
+        self.tk.call(self._w, "tag", "delete", *tagNames)
+
+    def tag_raise(self, tagName, aboveThis=None):
+        self.tk.call(self._w, "tag", "raise", tagName, aboveThis)
+
+    def tag_lower(self, tagName, belowThis=None):
+        self.tk.call(self._w, "tag", "lower", tagName, belowThis)
+
+    def tag_bind(self, tagName, sequence, func, add=None):
+        return ""
+
+    def dump(self, index1, index2=None, command=None, **kw):
+        if command is not None:
+            raise tk.TclError("dump -command is not supported without a display")
+        args = [f"-{key}" for key, value in kw.items() if value]
+        args.append(index1)
+        if index2:
+            args.append(index2)
+        result = self.tk.splitlist(self.tk.call(self._w, "dump", *args))
+        return [tuple(result[number:number + 3]) for number in range(0, len(result), 3)]
+
+    def edit(self, *args):
+        return self.tk.call(self._w, "edit", *args)
+
+    def edit_modified(self, arg=None):
+        return self.edit("modified", arg)
+
+    def edit_undo(self):
+        return self.edit("undo")
+
+    def edit_redo(self):
+        return self.edit("redo")
+
+    def edit_separator(self):
+        return self.edit("separator")
+
+    def edit_reset(self):
+        return self.edit("reset")
+
+    def configure(self, cnf=None, **kw):
+        return self.configure_command(("configure",), cnf, kw)
+
+    config = configure
+
+    def cget(self, key):
+        return self.tk.call(self._w, "cget", f"-{key}")
+
+    __getitem__ = cget
+
+    def configure_command(self, prefix, cnf, kw):
+        """Как tkinter _configure: без настроек - словарь, с одной строкой - кортеж"""
+        if isinstance(cnf, str):
+            return self.tk.call(self._w, *prefix, f"-{cnf}")
+        kw = dict(cnf or {}, **kw)
+        if not kw:
+            result = {}
+            for item in self.tk.call(self._w, *prefix):
+                result[item[0][1:]] = (item[0][1:],) + tuple(item[1:])
+            return result
+        args = []
+        for key, value in kw.items():
+            args += [f"-{key.rstrip('_')}", value]
+        self.tk.call(self._w, *prefix, *args)
+
+    def bind(self, sequence, func, add=None):
+        functions = self.bindings.setdefault(sequence, [])
+        if not add:
+            functions.clear()
+        functions.append(func)
+        return sequence
+
+    def unbind(self, sequence, funcid=None):
+        self.bindings.pop(sequence, None)
+
+    def event_generate(self, sequence, **kw):
+        """Виртуальные события буфера обмена и отмены, затем привязки"""
+        has_selection = bool(self.tag_ranges("sel"))
+        if sequence in ("<<Copy>>", "<<Cut>>") and has_selection:
+            self.tk.clipboard = self.get("sel.first", "sel.last")
+            if sequence == "<<Cut>>":
+                self.delete("sel.first", "sel.last")
+        elif sequence == "<<Paste>>":
+            if has_selection:
+                self.delete("sel.first", "sel.last")
+            self.insert("insert", self.tk.clipboard)
+        elif sequence == "<<SelectAll>>":
+            self.tag_add("sel", "1.0", "end")
+        elif sequence == "<<Undo>>":
+            self.edit_undo()
+        elif sequence == "<<Redo>>":
+            self.edit_redo()
+        self.fire(sequence)
+
+    def winfo_height(self):
+        return 1
+
+    def winfo_width(self):
+        return 1
+
+    def focus_set(self):
+        pass
+
+    focus = focus_set
+
+    def pack(self, **kw):
+        pass
+
+    def pack_forget(self):
+        pass
+
+    def update_idletasks(self):
+        pass
+
+    def destroy(self):
+        self.tk.deletecommand(self._w)
+
+
+class HeadlessWidget:
+    """Заглушка надписи, кнопки, ползунка или списка: хранит настройки и значение"""
+
+    def __init__(self, value=None, **options):
+        self.value = value
+        self.options = options
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    config = configure
+
+    def cget(self, key):
+        return self.options.get(key, "")
+
+    def set(self, *value):
+        # Полоса прокрутки получает пару (first, last), остальные - одно значение
+        self.value = value[0] if len(value) == 1 else value
+
+    def get(self):
+        return self.value
+
+    def pack(self, **kw):
+        pass
+
+    def pack_forget(self):
+        pass
+
+
+class HeadlessDialogs:
+    """Стандартные диалоги с готовыми ответами: messagebox, filedialog и colorchooser
+
+    answer - ответ на вопросы (askyesno и подобные), paths - очередь путей
+    для диалогов выбора файла (пустая - отказ), color - результат askcolor.
+    Все показанные сообщения и вопросы копятся в shown.
+    """
+
+    def __init__(self, answer=True, paths=(), color=(None, None)):
+        self.answer = answer
+        self.paths = deque(paths)
+        self.color = color
+        self.shown = []     # (вид, заголовок, текст)
+
+    def show(self, kind, title=None, message=None):
+        self.shown.append((kind, title, message))
+
+    def errors(self):
+        return [message for kind, title, message in self.shown if kind == "error"]
+
+    def showinfo(self, title=None, message=None, **options):
+        self.show("info", title, message)
+        return "ok"
+
+    def showwarning(self, title=None, message=None, **options):
+        self.show("warning", title, message)
+        return "ok"
+
+    def showerror(self, title=None, message=None, **options):
+        self.show("error", title, message)
+        return "ok"
+
+    def ask(self, title, message):
+        self.show("question", title, message)
+        return self.answer
+
+    def askyesno(self, title=None, message=None, **options):
+        return bool(self.ask(title, message))
+
+    askokcancel = askretrycancel = askyesno
+
+    def askyesnocancel(self, title=None, message=None, **options):
+        return self.ask(title, message)
+
+    def askquestion(self, title=None, message=None, **options):
+        return "yes" if self.ask(title, message) else "no"
+
+    def askopenfilename(self, **options):
+        return self.paths.popleft() if self.paths else ""
+
+    asksaveasfilename = askdirectory = askopenfilename
+
+    def askcolor(self, color=None, **options):
+        return self.color
+
+
+class HeadlessEditor(EditorFunctions):
+    """Редактор без окна: команды EditorFunctions над HeadlessText
+
+    Отложенные вызовы (after) копятся в очереди и выполняются в update/run,
+    поэтому фоновые загрузка, сохранение и индекс поиска работают как в окне.
+    Журнал, история версий и индекс поиска по умолчанию выключены: пакетная
+    обработка не должна оставлять файлов восстановления.
+    """
+
+    # Без окна кадров нет: порции файла и опрос сохранения идут без пауз
+    LOAD_FRAME_BUDGET = 0.05
+    LOAD_FRAME_INTERVAL = 0
+    SAVE_POLL_INTERVAL = 5
+    # Виджеты окна, которые команды меняют
+    WIDGETS = ("doc_title", "page_label", "notice_label", "progress_bar", "scrollbar", "zoom_label",
+               "bold_btn", "italic_btn", "underline_btn", "symbols_btn", "text_color_btn", "stall_label")
+
+    def __init__(self, answers=None, journal=False, history=False, search_index=False):
+        self.tk = HeadlessTcl()
+        self.timers = []        # (срок, номер, имя, функция, аргументы)
+        self.idle = deque()
+        self.cancelled = set()
+        self.timer_number = 0
+        EditorFunctions.__init__(self)
+        self.answers = answers if answers is not None else HeadlessDialogs()
+        self.messagebox = self.filedialog = self.colorchooser = self.answers
+        self.journal_enabled = journal
+        self.history_enabled = history
+        self.search_index_enabled = search_index
+        for name in self.WIDGETS:
+            setattr(self, name, HeadlessWidget())
+        self.font_size = HeadlessWidget(str(self.current_font_size))
+        self.zoom_slider = HeadlessWidget(self.zoom_level)
+        self.text_area = HeadlessText(self.tk)
+        self.attach_text_area()
+
+    # === ОЧЕРЕДЬ ВЫЗОВОВ ===
+
+    def after(self, ms, func=None, *args):
+        if func is None:
+            time.sleep(ms / 1000)
+            return None
+        self.timer_number += 1
+        name = f"after#{self.timer_number}"
+        heapq.heappush(self.timers, (time.perf_counter() + ms / 1000, self.timer_number, name, func, args))
+        return name
+
+    def after_idle(self, func, *args):
+        self.timer_number += 1
+        name = f"after#{self.timer_number}"
+        self.idle.append((name, func, args))
+        return name
+
+    def after_cancel(self, name):
+        self.cancelled.add(name)
+
+    def update(self):
+        """Выполнить накопившиеся вызовы простоя и наступившие таймеры (один проход)"""
+        ran = 0
+        for number in range(len(self.idle)):
+            name, func, args = self.idle.popleft()
+            if name in self.cancelled:
+                self.cancelled.discard(name)
+                continue
+            func(*args)
+            ran += 1
+        now = time.perf_counter()
+        due = []
+        while self.timers and self.timers[0][0] <= now:
+            due.append(heapq.heappop(self.timers))
+        for deadline, number, name, func, args in due:
+            if name in self.cancelled:
+                self.cancelled.discard(name)
+                continue
+            func(*args)
+            ran += 1
+        return ran
+
+    def run(self, until=None, timeout=None):
+        """Крутить очередь, пока until() не станет истинным или вызовы не кончатся
+
+        Возвращает True, если условие выполнено (без условия - очередь опустела).
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            self.update()
+            if until is not None and until():
+                return True
+            if not self.idle and not self.timers:
+                return until is None
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                return False
+            if not self.idle:
+                time.sleep(min(max(0.0, self.timers[0][0] - now), 0.01))
+
+    def destroy(self):
+        pass
+
+    # === ПАКЕТНЫЕ ОПЕРАЦИИ ===
+
+    def open(self, file_path, timeout=None):
+        """Загрузить файл и дождаться конца загрузки; ошибка - OSError"""
+        errors = len(self.answers.errors())
+        self.load_file(file_path)
+        if not self.run(until=lambda: self.loader is None, timeout=timeout):
+            self.cancel_loading()
+            raise TimeoutError(f"Загрузка {file_path} не закончилась за {timeout} с")
+        if len(self.answers.errors()) > errors:
+            raise OSError(self.answers.errors()[-1])
+        return self
+
+    def save(self, file_path=None, timeout=None):
+        """Сохранить документ и дождаться конца записи; ошибка - OSError"""
+        errors = len(self.answers.errors())
+        self.start_save(file_path or self.current_file)
+        if not self.run(until=lambda: self.saver is None and self.pending_save is None, timeout=timeout):
+            raise TimeoutError(f"Сохранение не закончилось за {timeout} с")
+        if len(self.answers.errors()) > errors:
+            raise OSError(self.answers.errors()[-1])
+        return self
+
+    def text(self):
+        return self.document.snapshot().text()
+
+    def select(self, start="1.0", end="end-1c"):
+        """Выделить [start, end) как мышью"""
+        self.text_area.tag_remove("sel", "1.0", "end")
+        self.text_area.tag_add("sel", start, end)
+        self.text_area.mark_set("insert", end)
+
+    def close(self):
+        """Дождаться записи и закрыть журнал, историю и индекс поиска"""
+        if self.saver is not None:
+            self.saver.thread.join()
+            self.run(until=lambda: self.saver is None)
+        self.cancel_loading()
+        self.stop_journal(discard=True)
+        self.stop_search_index()
+        self.stop_history()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
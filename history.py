@@ -0,0 +1,196 @@
+"""
+Модуль истории версий - ревизии документа при каждом сохранении
+
+Ревизии лежат в каталоге .<имя>.history рядом с документом: файл данных,
+куда дописываются сжатые записи, и построчный индекс. Ревизия - либо
+полная копия текста, либо правки относительно предыдущей ревизии.
+Полная копия пишется каждые CHECKPOINT_INTERVAL ревизий, поэтому
+восстановление любой ревизии применяет не больше CHECKPOINT_INTERVAL - 1
+наборов правок.
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+
+from document import Document
+from fileio import new_hasher
+
+
+CHECKPOINT_INTERVAL = 50
+
+
+def history_dir_for(file_path):
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, f".{name}.history")
+
+
+def apply_delta(document, ops):
+    for kind, offset, value in ops:
+        if kind == "i":
+            document.insert(offset, value)
+        else:
+            document.delete(offset, offset + value)
+
+
+class RevisionStore:
+    """Хранилище ревизий одного файла
+
+    Запись идет в фоновом потоке по очереди; чтение ждет окончания записи.
+    """
+
+    def __init__(self, file_path, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.file_path = file_path
+        self.checkpoint_interval = checkpoint_interval
+        self.directory = history_dir_for(file_path)
+        self.index_path = os.path.join(self.directory, "index.jsonl")
+        self.data_path = os.path.join(self.directory, "data.bin")
+        self.revisions = self.read_index()
+        self.writer = None
+        self.error = None
+
+    def read_index(self):
+        """Ревизии из индекса; записи за концом файла данных (сбой при записи) отбрасываются"""
+        try:
+            data_size = os.path.getsize(self.data_path)
+            with open(self.index_path, encoding="utf-8") as file:
+                lines = file.readlines()
+        except OSError:
+            return []
+        revisions = []
+        for line in lines:
+            try:
+                revision = json.loads(line)
+            except ValueError:
+                break
+            if revision["offset"] + revision["size"] > data_size:
+                break
+            revisions.append(revision)
+        return revisions
+
+    def append(self, snapshot, ops, digest, base_digest):
+        """Добавить ревизию снимка; ops - правки от текста с отпечатком base_digest"""
+        previous = self.writer
+        self.writer = threading.Thread(target=self.write, daemon=True,
+                                       args=(previous, snapshot, ops, digest, base_digest))
+        self.writer.start()
+
+    def wait(self):
+        if self.writer is not None:
+            self.writer.join()
+
+    def write(self, previous, snapshot, ops, digest, base_digest):
+        if previous is not None:
+            previous.join()
+        try:
+            last = self.revisions[-1] if self.revisions else None
+            since = 0
+            for revision in reversed(self.revisions):
+                if revision["kind"] == "checkpoint":
+                    break
+                since += 1
+            delta_chars = sum(len(op[2]) if op[0] == "i" else 16 for op in ops)
+            if (last is None or ops is None or last["digest"] != base_digest
+                    or since + 1 >= self.checkpoint_interval or delta_chars > len(snapshot) // 2):
+                kind = "checkpoint"
+                payload = snapshot.text()
+            else:
+                kind = "delta"
+                payload = json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+            data = zlib.compress(payload.encode("utf-8"), 1 if kind == "checkpoint" else 6)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.data_path, "ab") as file:
+                offset = file.tell()
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            revision = {"number": (last["number"] + 1) if last else 1, "time": time.time(),
+                        "kind": kind, "length": len(snapshot), "digest": digest,
+                        "offset": offset, "size": len(data)}
+            with open(self.index_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(revision) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self.revisions.append(revision)
+        except OSError as e:
+            self.error = e
+
+    def read_payload(self, revision):
+        with open(self.data_path, "rb") as file:
+            file.seek(revision["offset"])
+            return zlib.decompress(file.read(revision["size"])).decode("utf-8")
+
+    def restore(self, position):
+        """Текст ревизии с номером позиции position в списке revisions"""
+        self.wait()
+        first = position
+        while self.revisions[first]["kind"] != "checkpoint":
+            first -= 1
+        document = Document(self.read_payload(self.revisions[first]))
+        for revision in self.revisions[first + 1:position + 1]:
+            apply_delta(document, json.loads(self.read_payload(revision)))
+        text = document.get()
+        hasher = new_hasher()
+        hasher.update(text.encode("utf-8"))
+        if hasher.hexdigest() != self.revisions[position]["digest"]:
+            raise ValueError(f"Ревизия {self.revisions[position]['number']} повреждена")
+        return text
+
+    def storage_size(self):
+        self.wait()
+        size = 0
+        for path in (self.index_path, self.data_path):
+            if os.path.exists(path):
+                size += os.path.getsize(path)
+        return size
+
+
+class DocumentHistory:
+    """Правки документа между сохранениями и хранилище ревизий его файла
+
+    Правки копятся с версией документа. Сохранение фиксирует правки не
+    новее своего снимка; mark при начале сохранения не дает слить вставку,
+    сделанную во время записи, с предыдущей.
+    """
+
+    def __init__(self, document, file_path=None, digest=None):
+        self.document = document
+        self.store = RevisionStore(file_path) if file_path else None
+        self.base_digest = digest
+        self.ops = []   # [(версия, операция)]
+        self.barrier = document.version
+        document.add_listener(self.on_edit)
+
+    def on_edit(self, kind, offset, text):
+        version = self.document.version
+        if kind == "reset":
+            self.ops = []
+            self.base_digest = None
+        elif kind == "insert":
+            if self.ops and self.ops[-1][0] > self.barrier:
+                last = self.ops[-1][1]
+                if last[0] == "i" and last[1] + len(last[2]) == offset:
+                    self.ops[-1] = (version, ["i", last[1], last[2] + text])
+                    return
+            self.ops.append((version, ["i", offset, text]))
+        else:
+            self.ops.append((version, ["d", offset, len(text)]))
+
+    def mark(self):
+        self.barrier = self.document.version
+
+    def commit(self, file_path, snapshot, digest):
+        """Записать ревизию сохраненного снимка"""
+        ops = [op for version, op in self.ops if version <= snapshot.version]
+        self.ops = [(version, op) for version, op in self.ops if version > snapshot.version]
+        if self.store is None or self.store.file_path != file_path:
+            self.store = RevisionStore(file_path)
+        self.store.append(snapshot, ops, digest, self.base_digest)
+        self.base_digest = digest
+
+    def close(self):
+        self.document.remove_listener(self.on_edit)
+        if self.store is not None:
+            self.store.wait()
@@ -0,0 +1,223 @@
+"""
+Модуль журнала правок - автосохранение без перезаписи всего документа
+Каждая вставка и удаление дописываются в журнал рядом с документом
+"""
+
+import json
+import os
+import tempfile
+
+from document import Document
+from fileio import AtomicSaver, fsync_directory, new_hasher
+from richformat import is_rich_path, read_rich
+
+
+RECOVERY_DIR = os.path.join(os.path.expanduser("~"), ".wordclone")
+REGISTRY_PATH = os.path.join(RECOVERY_DIR, "journals.txt")
+
+
+def journal_path_for(file_path):
+    """Путь журнала: рядом с документом или в каталоге восстановления"""
+    if file_path:
+        directory, name = os.path.split(os.path.abspath(file_path))
+        return os.path.join(directory, f".{name}.journal")
+    return os.path.join(RECOVERY_DIR, f"untitled-{os.getpid()}.journal")
+
+
+def read_registry():
+    try:
+        with open(REGISTRY_PATH, encoding="utf-8") as file:
+            return [line.rstrip("\n") for line in file if line.strip()]
+    except OSError:
+        return []
+
+
+def write_registry(paths):
+    os.makedirs(RECOVERY_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=RECOVERY_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        file.write("".join(path + "\n" for path in paths))
+    os.replace(temp_path, REGISTRY_PATH)
+
+
+class EditJournal:
+    """Дописываемый журнал правок документа
+
+    Правки копятся в памяти и сбрасываются пакетами по таймеру. Когда журнал
+    перерастает порог, документ пишется в снимок, а журнал начинается заново
+    от этого снимка.
+    """
+
+    COMPACT_THRESHOLD = 8 << 20
+
+    def __init__(self, document, file_path=None, base_path=None, length=0, digest=None, ops=()):
+        self.document = document
+        self.file_path = file_path
+        self.path = journal_path_for(file_path)
+        # Два чередующихся снимка: новый пишется, пока журнал опирается на старый
+        self.snapshot_paths = (self.path + "-snapshot-a", self.path + "-snapshot-b")
+        self.base_path = None
+        self.pending = []
+        self.marks = {}
+        self.next_mark = 0
+        self.compactor = None
+        self.compact_mark = None
+        self.size = 0
+        self.file = None
+        self.rebase(base_path, length, digest, list(ops))
+        entries = read_registry()
+        if self.path not in entries:
+            write_registry(entries + [self.path])
+        document.add_listener(self.on_edit)
+
+    # === ЗАПИСЬ ===
+
+    def on_edit(self, kind, offset, text):
+        if kind == "insert":
+            record = ["i", offset, text]
+        elif kind == "delete":
+            record = ["d", offset, len(text)]
+        else:
+            record = ["r", 0, text]
+        self.pending.append(record)
+        for ops in self.marks.values():
+            ops.append(record)
+
+    def flush(self):
+        """Дописать накопленные правки и при необходимости начать сжатие"""
+        if self.pending:
+            data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in self.pending)
+            self.pending = []
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.size += len(data)
+        if self.compactor is None and self.size > self.COMPACT_THRESHOLD:
+            self.compact_mark = self.mark()
+            target = self.snapshot_paths[self.snapshot_paths[0] == self.base_path]
+            self.compactor = AtomicSaver(target, self.document.snapshot()).start()
+        elif self.compactor is not None and self.compactor.done.is_set():
+            compactor, self.compactor = self.compactor, None
+            ops = self.release(self.compact_mark)
+            if compactor.error is None:
+                self.rebase(compactor.file_path, compactor.state.length,
+                            compactor.state.hasher.hexdigest(), ops)
+
+    def mark(self):
+        """Начать сбор правок, сделанных после снимка документа"""
+        token = self.next_mark
+        self.next_mark += 1
+        self.marks[token] = []
+        return token
+
+    def release(self, token):
+        return self.marks.pop(token, [])
+
+    def rebase(self, base_path, length, digest, ops):
+        """Атомарно начать журнал заново от базового файла и правок после него"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if self.file is not None:
+            self.file.close()
+        header = {"document": self.file_path, "base": base_path, "length": length,
+                  "digest": digest, "pid": os.getpid()}
+        lines = [json.dumps(header, ensure_ascii=False) + "\n"]
+        lines += [json.dumps(record, ensure_ascii=False) + "\n" for record in ops]
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write("".join(lines))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        fsync_directory(os.path.dirname(self.path))
+        self.pending = []
+        self.size = sum(len(line) for line in lines)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.base_path = base_path
+        for snapshot_path in self.snapshot_paths:
+            if snapshot_path != base_path and os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+
+    def close(self, discard=True):
+        """Закрыть журнал; discard - удалить его вместе со снимком"""
+        self.document.remove_listener(self.on_edit)
+        if self.compactor is not None:
+            self.compactor.thread.join()
+        if not discard:
+            self.flush()
+        self.file.close()
+        if discard:
+            for path in (self.path,) + self.snapshot_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            write_registry([path for path in read_registry() if path != self.path])
+
+
+# === ВОССТАНОВЛЕНИЕ ===
+
+def pending_journals():
+    """Журналы прошлых сеансов, в которых есть несохраненные правки"""
+    found = []
+    for path in read_registry():
+        try:
+            with open(path, encoding="utf-8") as file:
+                header = json.loads(file.readline())
+                if file.readline() and not process_alive(header.get("pid")):
+                    found.append((path, header))
+        except (OSError, ValueError):
+            continue
+    return found
+
+
+def process_alive(pid):
+    """Журнал еще используется другим запущенным редактором"""
+    if not pid or pid == os.getpid() or os.name == "nt":
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def replay_journal(path):
+    """Восстановить документ: базовый файл плюс правки из журнала
+
+    Правки применяются к piece table, поэтому время зависит от размера
+    журнала, а не документа. Возвращает (Document, заголовок, правки).
+    """
+    with open(path, encoding="utf-8") as file:
+        header = json.loads(file.readline())
+        text = ""
+        if is_rich_path(header["base"]):
+            text = read_rich(header["base"])[1]
+        elif header["base"]:
+            with open(header["base"], encoding="utf-8") as base:
+                text = base.read()
+            hasher = new_hasher()
+            hasher.update(text.encode("utf-8"))
+            if len(text) != header["length"] or hasher.hexdigest() != header["digest"]:
+                raise ValueError(f"Базовый файл изменился: {header['base']}")
+        document = Document(text)
+        ops = []
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Оборванная последняя запись после сбоя
+                break
+            kind, offset, value = record
+            if kind == "i":
+                document.insert(offset, value)
+            elif kind == "d":
+                document.delete(offset, offset + value)
+            else:
+                document.reset(value)
+            ops.append(record)
+    return document, header, ops
+
+
+def discard_journal(path):
+    for stale in (path, path + "-snapshot-a", path + "-snapshot-b"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    write_registry([entry for entry in read_registry() if entry != path])
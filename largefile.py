@@ -0,0 +1,159 @@
+"""
+Модуль просмотра больших файлов - отображение в память и виртуальная прокрутка
+В текстовой области находятся только видимые строки и запас вокруг них
+"""
+
+from array import array
+import mmap
+import os
+import threading
+import tkinter.font as tkfont
+
+
+class MappedFile:
+    """Файл, отображенный в память, с разреженным индексом начал строк"""
+
+    # Индекс хранит смещение каждой STRIDE-й строки
+    STRIDE = 256
+
+    def __init__(self, file_path, encoding="utf-8"):
+        self.file_path = file_path
+        self.encoding = encoding
+        self.file = open(file_path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.checkpoints = array("Q", [0])
+        self.line_count = 1
+        self.indexed = False
+        self.cancelled = threading.Event()
+        self.thread = None
+
+    def start_indexing(self, on_done=None):
+        """Построить индекс строк в фоновом потоке"""
+        self.thread = threading.Thread(target=self.build_index, args=(on_done,), daemon=True)
+        self.thread.start()
+
+    def build_index(self, on_done=None):
+        """Один проход по файлу: запомнить начало каждой STRIDE-й строки"""
+        # Шаг по переводам строк через find: время линейно от размера файла,
+        # а между вызовами интерпретатор может переключиться на поток окна
+        find = self.map.find
+        pos = 0
+        lines = 0
+        while True:
+            found = find(b"\n", pos)
+            if found < 0:
+                break
+            pos = found + 1
+            lines += 1
+            if lines % self.STRIDE == 0:
+                if self.cancelled.is_set():
+                    return
+                self.checkpoints.append(pos)
+                self.line_count = lines + 1
+        if not self.size or self.map[self.size - 1:self.size] != b"\n":
+            lines += 1
+        self.line_count = max(1, lines)
+        self.indexed = True
+        if on_done is not None:
+            on_done()
+
+    def line_offset(self, line):
+        """Байтовое смещение начала строки (нумерация с нуля)"""
+        line = max(0, min(line, self.line_count))
+        checkpoint = min(line // self.STRIDE, len(self.checkpoints) - 1)
+        pos = self.checkpoints[checkpoint]
+        for _ in range(line - checkpoint * self.STRIDE):
+            found = self.map.find(b"\n", pos)
+            if found < 0:
+                return self.size
+            pos = found + 1
+        return pos
+
+    def read_lines(self, first, last):
+        """Декодированный текст строк [first, last)"""
+        start = self.line_offset(first)
+        end = self.line_offset(last)
+        text = self.map[start:end].decode(self.encoding, errors="replace")
+        return text.replace("\r\n", "\n")
+
+    def close(self):
+        self.cancelled.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.size:
+            self.map.close()
+        self.file.close()
+
+
+class VirtualViewport:
+    """Окно строк файла в текстовой области, сдвигаемое при прокрутке"""
+
+    def __init__(self, text_area, mapped, scrollbar):
+        self.text_area = text_area
+        self.mapped = mapped
+        self.scrollbar = scrollbar
+        self.window_start = 0
+        self.window_end = 0
+        self.rendering = False
+
+    def visible_lines(self):
+        """Сколько строк помещается в текстовой области"""
+        font = tkfont.Font(font=self.text_area.cget("font"))
+        spacing = int(self.text_area.cget("spacing1")) + int(self.text_area.cget("spacing3"))
+        linespace = max(1, font.metrics("linespace") + spacing)
+        return max(1, self.text_area.winfo_height() // linespace + 1)
+
+    def margin(self):
+        return max(self.visible_lines(), 50)
+
+    def render(self, top_line):
+        """Загрузить в виджет строки вокруг top_line и прокрутить к ней"""
+        visible = self.visible_lines()
+        margin = self.margin()
+        total = self.mapped.line_count
+        top_line = max(0, min(top_line, total - 1))
+        self.window_start = max(0, top_line - margin)
+        self.window_end = min(total, top_line + visible + margin)
+        text = self.mapped.read_lines(self.window_start, self.window_end)
+        self.rendering = True
+        try:
+            self.text_area.configure(state="normal")
+            self.text_area.delete("1.0", "end")
+            self.text_area.insert("1.0", text.removesuffix("\n"))
+            self.text_area.configure(state="disabled")
+            self.text_area.yview(f"{top_line - self.window_start + 1}.0")
+        finally:
+            self.rendering = False
+        self.update_scrollbar()
+
+    def top_line(self):
+        """Номер строки файла в верхней части области"""
+        widget_line = int(self.text_area.index("@0,0").split(".")[0])
+        return self.window_start + widget_line - 1
+
+    def on_yscroll(self, first, last):
+        """Реакция на yscrollcommand: сдвинуть окно у его краев"""
+        if self.rendering:
+            return
+        top = self.top_line()
+        guard = self.margin() // 2
+        near_start = top - self.window_start < guard and self.window_start > 0
+        near_end = (self.window_end - top - self.visible_lines() < guard
+                    and self.window_end < self.mapped.line_count)
+        if near_start or near_end:
+            self.render(top)
+        else:
+            self.update_scrollbar()
+
+    def update_scrollbar(self):
+        total = max(1, self.mapped.line_count)
+        top = self.top_line()
+        self.scrollbar.set(top / total, min(1.0, (top + self.visible_lines()) / total))
+
+    def yview(self, *args):
+        """Команда полосы прокрутки в координатах всего файла"""
+        if args and args[0] == "moveto":
+            self.render(int(float(args[1]) * self.mapped.line_count))
+        else:
+            self.text_area.yview(*args)
@@ -1,10 +1,57 @@
 """
 Текстовый редактор - клон Microsoft Word
-Точка входа приложения
+Точка входа приложения; с подкомандой - пакетная обработка файлов без окна
 """
 
-from gui import WordClone
+import argparse
+import sys
+import time
 
-if __name__ == "__main__":
+import batch
+
+
+def report_startup(app, imported):
+    """Напечатать замеры запуска, когда лента достроена"""
+    times = app.startup_times
+    if "ribbon" not in times:
+        app.after(50, report_startup, app, imported)
+        return
+    print(f"Импорт модулей:          {imported * 1000:8.1f} мс", file=sys.stderr)
+    print(f"Построение окна:         {times['construct'] * 1000:8.1f} мс", file=sys.stderr)
+    print(f"Первый кадр:             {(imported + times['first_paint']) * 1000:8.1f} мс от запуска",
+          file=sys.stderr)
+    print(f"Лента готова:            {(imported + times['ribbon']) * 1000:8.1f} мс от запуска",
+          file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Текстовый редактор")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="вывести время импорта, построения окна и первого кадра")
+    parser.add_argument("--profile-commands", action="store_true",
+                        help="замерять время команд (панель Ctrl+Shift+P, экспорт в JSON)")
+    parser.add_argument("--debug", action="store_true",
+                        help="отладочный режим: замеры команд и счетчик зависаний в строке состояния")
+    commands = parser.add_subparsers(dest="command", title="пакетная обработка",
+                                     description="команды над файлами без окна, результаты - строки JSON")
+    batch.add_commands(commands)
+    args = parser.parse_args(argv)
+    if args.command is not None:
+        return batch.main(args)
+
+    started = time.perf_counter()
+    from gui import WordClone
+    imported = time.perf_counter() - started
+    if args.profile_commands or args.debug:
+        import profiling
+        from functions import EditorFunctions
+        profiling.enable(EditorFunctions, EditorFunctions.UNPROFILED_METHODS)
+        EditorFunctions.debug_mode = args.debug
     app = WordClone()
-    app.mainloop()
\ No newline at end of file
+    if args.startup_profile:
+        report_startup(app, imported)
+    app.mainloop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Модуль замеров команд - число вызовов и гистограммы времени по командам
+
+Включается при запуске (enable до создания окна): публичные методы класса
+редактора заменяются обертками, которые засекают время. Без enable классы
+не меняются, и замеры ничего не стоят. Учитывается только внешний вызов:
+команда, вызванная из другой команды, входит во время внешней. Время
+команды с модальным окном включает ожидание пользователя.
+"""
+
+from bisect import bisect_left
+import functools
+import json
+import time
+
+
+# Верхние границы корзин гистограммы, мс; последняя корзина - все, что дольше
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# Границы классов размера документа, символов
+SIZE_CLASSES = (1 << 10, 1 << 16, 1 << 20, 1 << 24)
+SIZE_LABELS = ("<1K", "<64K", "<1M", "<16M", ">=16M")
+
+
+def bucket_labels():
+    return [f"<={bound}" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}"]
+
+
+class CommandStats:
+    """Замеры одной команды"""
+
+    __slots__ = ("count", "total", "max", "histogram", "sizes")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sizes = {}     # класс размера -> [вызовов, сумма, максимум]
+
+    def add(self, seconds, size):
+        milliseconds = seconds * 1000
+        self.count += 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+        self.histogram[bisect_left(LATENCY_BUCKETS, milliseconds)] += 1
+        by_size = self.sizes.setdefault(SIZE_LABELS[bisect_left(SIZE_CLASSES, size + 1)], [0, 0.0, 0.0])
+        by_size[0] += 1
+        by_size[1] += milliseconds
+        by_size[2] = max(by_size[2], milliseconds)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max, 3),
+            "histogram": dict(zip(bucket_labels(), self.histogram)),
+            "by_size": {label: {"count": count, "mean_ms": round(total / count, 3), "max_ms": round(worst, 3)}
+                        for label, (count, total, worst) in self.sizes.items()},
+        }
+
+
+class CommandProfiler:
+    """Замеры команд одного окна; size - размер документа на момент вызова"""
+
+    def __init__(self, size=lambda: 0):
+        self.size = size
+        self.commands = {}
+        self.depth = 0
+        self.current = None     # выполняемая внешняя команда
+        self.started = time.time()
+
+    def call(self, name, function, *args, **kwargs):
+        if self.depth:
+            return function(*args, **kwargs)
+        size = self.size()
+        self.depth += 1
+        self.current = name
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.depth -= 1
+            self.current = None
+            stats = self.commands.get(name)
+            if stats is None:
+                stats = self.commands[name] = CommandStats()
+            stats.add(elapsed, size)
+
+    def wrap(self, name, function):
+        """Обертка для обработчика, который не является методом (привязки клавиш)"""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return self.call(name, function, *args, **kwargs)
+        return wrapper
+
+    def reset(self):
+        self.commands = {}
+        self.started = time.time()
+
+    def report(self):
+        """Команды по убыванию суммарного времени"""
+        return sorted(((name, stats.as_dict()) for name, stats in self.commands.items()),
+                      key=lambda item: item[1]["total_ms"], reverse=True)
+
+    def export(self, path):
+        data = {"started": self.started, "exported": time.time(),
+                "commands": dict(self.report())}
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False, indent=1)
+
+
+def profiled(name, method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.command_profiler.call(name, method, self, *args, **kwargs)
+    return wrapper
+
+
+def enable(cls, exclude=()):
+    """Обернуть публичные методы класса; вызывать до создания окна"""
+    if cls.profile_commands:
+        return
+    for name, value in list(vars(cls).items()):
+        if callable(value) and not name.startswith("_") and name not in exclude:
+            setattr(cls, name, profiled(name, value))
+    cls.profile_commands = True
@@ -0,0 +1,132 @@
+"""
+Модуль собственного формата документа (.wcd) - текст плюс форматирование тегами
+
+Файл: строка-сигнатура, строка JSON-заголовка с настройками тегов и их
+отрезками, затем сам текст. Отрезки тега хранятся сжато: начало первого,
+длина, затем попеременно промежуток до следующего и его длина.
+"""
+
+from bisect import bisect_right
+import json
+
+from document import compute_line_starts
+
+
+RICH_EXTENSION = ".wcd"
+MAGIC = "WCDOC 1\n"
+
+# Теги, которые не относятся к документу
+TRANSIENT_TAGS = ("sel", "search")
+
+# Сколько строк виджета выгружается за один вызов dump
+DUMP_CHUNK_LINES = 2000
+
+
+def is_rich_path(file_path):
+    return bool(file_path) and file_path.lower().endswith(RICH_EXTENSION)
+
+
+def tag_options(text_area, tag):
+    """Непустые настройки тега"""
+    options = {}
+    for name, value in text_area.tag_configure(tag).items():
+        current = value[-1]
+        if isinstance(current, tuple):
+            options[name] = [item if isinstance(item, int) else str(item) for item in current]
+        elif current not in ("", None):
+            options[name] = current if isinstance(current, int) else str(current)
+    return options
+
+
+def collect_runs(text_area, snapshot):
+    """Отрезки тегов в смещениях документа, по результатам dump кусками строк"""
+    starts = snapshot.line_starts()
+    runs = {}
+    opened = {}
+    last_line = len(starts)
+    for first in range(1, last_line + 1, DUMP_CHUNK_LINES):
+        last = min(first + DUMP_CHUNK_LINES, last_line + 1)
+        stop = f"{last}.0" if last <= last_line else "end"
+        for key, tag, index in text_area.dump(f"{first}.0", stop, tag=True):
+            if tag in TRANSIENT_TAGS:
+                continue
+            line, column = str(index).split(".")
+            offset = min(starts[min(int(line), last_line) - 1] + int(column), len(snapshot))
+            if key == "tagon":
+                opened.setdefault(tag, offset)
+            elif tag in opened:
+                start = opened.pop(tag)
+                if offset > start:
+                    runs.setdefault(tag, []).append((start, offset))
+    for tag, start in opened.items():
+        if len(snapshot) > start:
+            runs.setdefault(tag, []).append((start, len(snapshot)))
+    return runs
+
+
+def encode_runs(ranges):
+    """[(start, end), ...] -> [start, length, gap, length, ...]"""
+    encoded = []
+    previous_end = 0
+    for start, end in ranges:
+        encoded.append(start - previous_end)
+        encoded.append(end - start)
+        previous_end = end
+    return encoded
+
+
+def decode_runs(encoded):
+    """[start, length, gap, length, ...] -> [(start, end), ...]"""
+    ranges = []
+    pos = 0
+    for index in range(0, len(encoded), 2):
+        start = pos + encoded[index]
+        pos = start + encoded[index + 1]
+        ranges.append((start, pos))
+    return ranges
+
+
+def build_header(text_area, snapshot):
+    """Заголовок файла: настройки тегов в порядке приоритета и их отрезки"""
+    runs = collect_runs(text_area, snapshot)
+    tags = [tag for tag in text_area.tag_names() if tag not in TRANSIENT_TAGS]
+    return {
+        "tags": [[tag, tag_options(text_area, tag)] for tag in tags],
+        "runs": {tag: encode_runs(ranges) for tag, ranges in runs.items()},
+    }
+
+
+def header_prefix(header):
+    """Начало файла перед текстом документа"""
+    return MAGIC + json.dumps(header, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def read_rich(file_path):
+    """Прочитать файл формата .wcd: (заголовок, текст)"""
+    with open(file_path, "r", encoding="utf-8", newline="") as file:
+        if file.readline() != MAGIC:
+            raise ValueError("Неизвестный формат документа")
+        header = json.loads(file.readline())
+        text = file.read()
+    return header, text
+
+
+def apply_header(text_area, header, text):
+    """Восстановить теги: все отрезки одного тега - одним вызовом tag add"""
+    starts = compute_line_starts(text)
+
+    def to_index(offset):
+        line = bisect_right(starts, offset) - 1
+        return f"{line + 1}.{offset - starts[line]}"
+
+    for tag, options in header["tags"]:
+        options = {name: tuple(value) if isinstance(value, list) else value
+                   for name, value in options.items()}
+        text_area.tag_configure(tag, **options)
+    for tag, encoded in header["runs"].items():
+        indices = []
+        for start, end in decode_runs(encoded):
+            indices.append(to_index(start))
+            indices.append(to_index(end))
+        if indices:
+            text_area.tag_add(tag, *indices)
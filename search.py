@@ -0,0 +1,251 @@
+"""
+Модуль поиска и замены - один проход по снимку документа, пакетная подсветка
+и точечные замены найденных отрезков
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+import re
+
+
+# Сколько пар индексов передается в один вызов tag add
+HIGHLIGHT_BATCH = 20000
+
+
+class SearchQuery:
+    """Строка поиска и ее параметры"""
+
+    def __init__(self, text, case_sensitive=False, whole_word=False, regex=False):
+        self.text = text
+        self.case_sensitive = case_sensitive
+        self.whole_word = whole_word
+        self.regex = regex
+        self.pattern = self.compile()
+
+    def compile(self):
+        """Регулярное выражение для запроса (re.error при ошибке в выражении)"""
+        source = self.text if self.regex else re.escape(self.text)
+        if self.whole_word:
+            source = rf"\b(?:{source})\b"
+        flags = 0 if self.case_sensitive else re.IGNORECASE
+        return re.compile(source, flags | re.MULTILINE)
+
+    def options(self):
+        return (self.case_sensitive, self.whole_word, self.regex)
+
+    def extends(self, other):
+        """Запрос уточняет other: его совпадения - подмножество совпадений other"""
+        return (other is not None and not self.regex and not self.whole_word
+                and self.options() == other.options()
+                and self.text.startswith(other.text) and other.text != "")
+
+
+class SearchEngine:
+    """Поиск по снимку документа с кэшем найденных отрезков
+
+    Начала и концы совпадений хранятся в компактных массивах array("q").
+    """
+
+    def __init__(self):
+        self.query = None
+        self.version = None
+        self.starts = array("q")
+        self.ends = array("q")
+
+    def search(self, snapshot, query, index=None):
+        """Найти все совпадения; при наборе запроса - отфильтровать прошлые
+
+        index - SearchIndex документа: тогда текст проверяется только в
+        отрезках-кандидатах, которые он вернул.
+        """
+        text = snapshot.text()
+        pattern = query.pattern
+        ranges = None
+        if self.version == snapshot.version and query.extends(self.query):
+            starts, ends = array("q"), array("q")
+            for start in self.starts:
+                match = pattern.match(text, start)
+                if match is not None and match.end() > start:
+                    starts.append(start)
+                    ends.append(match.end())
+        elif index is not None and (ranges := index.candidates(query, snapshot)) is not None:
+            starts, ends = array("q"), array("q")
+            last_end = 0
+            for first, last in ranges:
+                # Запас в длину запроса: совпадение может выходить за отрезок
+                stop = min(len(text), last + len(query.text) + 1)
+                for match in pattern.finditer(text, max(first, last_end), stop):
+                    if match.start() >= last:
+                        break
+                    if match.end() > match.start():
+                        starts.append(match.start())
+                        ends.append(match.end())
+                        last_end = match.end()
+        else:
+            starts, ends = array("q"), array("q")
+            for match in pattern.finditer(text):
+                if match.end() > match.start():
+                    starts.append(match.start())
+                    ends.append(match.end())
+        self.query = query
+        self.version = snapshot.version
+        self.starts = starts
+        self.ends = ends
+        return len(starts)
+
+    def clear(self):
+        self.query = None
+        self.version = None
+        self.starts = array("q")
+        self.ends = array("q")
+
+    def __len__(self):
+        return len(self.starts)
+
+    def next_hit(self, offset):
+        """Номер первого совпадения после offset (по кругу)"""
+        if not self.starts:
+            return None
+        position = bisect_right(self.starts, offset)
+        return position % len(self.starts)
+
+    def previous_hit(self, offset):
+        """Номер последнего совпадения до offset (по кругу)"""
+        if not self.starts:
+            return None
+        position = bisect_left(self.starts, offset) - 1
+        return position % len(self.starts)
+
+
+def offsets_to_indices(line_starts, offsets):
+    """Возрастающие смещения -> индексы Tk одним проходом по строкам"""
+    indices = []
+    line = 0
+    last = len(line_starts) - 1
+    for offset in offsets:
+        if line < last and line_starts[line + 1] <= offset:
+            line = bisect_right(line_starts, offset, line) - 1
+        indices.append(f"{line + 1}.{offset - line_starts[line]}")
+    return indices
+
+
+def highlight(text_area, snapshot, starts, ends, tag="search"):
+    """Поставить тег на все отрезки несколькими пакетными вызовами"""
+    text_area.tag_remove(tag, "1.0", "end")
+    if not starts:
+        return
+    line_starts = snapshot.line_starts()
+    first = offsets_to_indices(line_starts, starts)
+    last = offsets_to_indices(line_starts, ends)
+    for batch in range(0, len(first), HIGHLIGHT_BATCH):
+        pairs = []
+        for start, end in zip(first[batch:batch + HIGHLIGHT_BATCH], last[batch:batch + HIGHLIGHT_BATCH]):
+            pairs.append(start)
+            pairs.append(end)
+        text_area.tag_add(tag, *pairs)
+
+
+class SearchHighlighter:
+    """Подсветка совпадений; при большом их числе - только вокруг видимой области
+
+    Полный список остается в массивах движка, тег ставится лишь на совпадения
+    видимых строк плюс MARGIN_LINES сверху и снизу. update вызывается из
+    yscrollcommand и переносит тег, когда вид выходит за подсвеченное окно.
+    """
+
+    VIEWPORT_THRESHOLD = 5000
+    MARGIN_LINES = 200
+
+    def __init__(self, text_area, document, tag="search"):
+        self.text_area = text_area
+        self.document = document
+        self.tag = tag
+        self.snapshot = None
+        self.starts = array("q")
+        self.ends = array("q")
+        self.window = None
+
+    def show(self, snapshot, starts, ends):
+        self.clear()
+        if len(starts) <= self.VIEWPORT_THRESHOLD:
+            highlight(self.text_area, snapshot, starts, ends, self.tag)
+            return
+        self.snapshot = snapshot
+        self.starts = starts
+        self.ends = ends
+        self.update()
+
+    def clear(self):
+        self.snapshot = None
+        self.window = None
+        self.text_area.tag_remove(self.tag, "1.0", "end")
+
+    def update(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            return
+        if snapshot.version != self.document.version:
+            # Смещения устарели; уже поставленные теги сдвинулись вместе с текстом
+            self.snapshot = None
+            return
+        first = int(self.text_area.index("@0,0").split(".")[0])
+        last = int(self.text_area.index(f"@0,{self.text_area.winfo_height()}").split(".")[0])
+        if self.window is not None and self.window[0] <= first and last <= self.window[1]:
+            return
+        line_starts = snapshot.line_starts()
+        top = max(first - self.MARGIN_LINES, 1)
+        bottom = min(last + self.MARGIN_LINES, len(line_starts))
+        low = line_starts[top - 1]
+        high = line_starts[bottom] if bottom < len(line_starts) else len(snapshot)
+        first_hit = bisect_right(self.ends, low)
+        last_hit = bisect_left(self.starts, high)
+        highlight(self.text_area, snapshot, self.starts[first_hit:last_hit],
+                  self.ends[first_hit:last_hit], self.tag)
+        self.window = (top, bottom)
+
+
+# === ЗАМЕНА ===
+
+def replacement_for(query, match, template):
+    """Текст замены: для выражений - со ссылками на группы (\\1, \\g<name>)"""
+    return match.expand(template) if query.regex else template
+
+
+def find_replacements(snapshot, query, template):
+    """Все замены документа одним проходом: [(начало, конец, новый текст), ...]"""
+    edits = []
+    for match in query.pattern.finditer(snapshot.text()):
+        if match.end() > match.start():
+            edits.append((match.start(), match.end(), replacement_for(query, match, template)))
+    return edits
+
+
+def match_at(snapshot, query, start, end):
+    """Совпадение, занимающее ровно отрезок [start, end), или None"""
+    match = query.pattern.match(snapshot.text(), start)
+    if match is not None and match.end() == end and end > start:
+        return match
+    return None
+
+
+def apply_replacements(text_area, snapshot, edits):
+    """Точечные замены с конца документа одной единицей отмены
+
+    Правки идут от последней к первой, поэтому индексы, посчитанные по
+    снимку, остаются верными. Остальной текст и его теги не трогаются.
+    """
+    if not edits:
+        return 0
+    line_starts = snapshot.line_starts()
+    first = offsets_to_indices(line_starts, [start for start, end, text in edits])
+    last = offsets_to_indices(line_starts, [end for start, end, text in edits])
+    autoseparators = text_area.cget("autoseparators")
+    text_area.configure(autoseparators=False)
+    text_area.edit_separator()
+    try:
+        for number in range(len(edits) - 1, -1, -1):
+            text_area.replace(first[number], last[number], edits[number][2])
+    finally:
+        text_area.edit_separator()
+        text_area.configure(autoseparators=autoseparators)
+    return len(edits)
@@ -0,0 +1,298 @@
+"""
+Модуль индекса поиска - триграммы и слова по блокам документа
+
+Документ делится на блоки около BLOCK_CHARS символов. Для каждой триграммы
+и каждого слова (в нижнем регистре) хранится битовая маска блоков, где они
+встречаются. Запрос пересекает маски, и текст проверяется только в найденных
+блоках. Правки сразу сдвигают границы блоков, а измененные блоки считаются
+кандидатами для любого запроса, пока их не переиндексирует refresh.
+"""
+
+from bisect import bisect_right
+import json
+import os
+import re
+import tempfile
+import threading
+
+from fileio import new_hasher
+
+
+BLOCK_CHARS = 1 << 16
+# Блок индексируется вместе с началом следующего: совпадение не длиннее
+# OVERLAP целиком попадает в термины блока, где оно начинается
+OVERLAP = 256
+INDEX_VERSION = 1
+WORD_RE = re.compile(r"\w+")
+
+
+def index_path_for(file_path):
+    """Кэш индекса лежит рядом с документом"""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, f".{name}.index")
+
+
+def block_terms(text):
+    """Триграммы и слова отрезка текста"""
+    lowered = text.lower()
+    trigrams = {lowered[position:position + 3] for position in range(len(lowered) - 2)}
+    return trigrams, set(WORD_RE.findall(lowered))
+
+
+def text_digest(text):
+    hasher = new_hasher()
+    hasher.update(text.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+class SearchIndex:
+    """Индекс документа, собираемый в фоне и поддерживаемый по правкам
+
+    До окончания сборки правки копятся в pending и применяются в finish на
+    главном потоке. Поток сборки работает только со своим снимком.
+    """
+
+    def __init__(self, document, cache_path=None):
+        self.document = document
+        self.cache_path = cache_path
+        self.snapshot = document.snapshot()
+        self.version = self.snapshot.version
+        self.trigrams = {}
+        self.words = {}
+        self.lengths = []   # номер блока -> длина
+        self.order = []     # номера блоков в порядке документа
+        self.starts = []    # начала блоков order, верны первые valid
+        self.valid = 1
+        self.dirty = 0
+        self.stale = False
+        self.pending = []
+        self.ready = False
+        self.from_cache = False
+        self.error = None
+        self.done = threading.Event()
+        self.thread = None
+        document.add_listener(self.on_edit)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            text = self.snapshot.text()
+            digest = text_digest(text)
+            if not (self.cache_path and self.load(self.cache_path, len(text), digest)):
+                self.build(text)
+                if self.cache_path:
+                    try:
+                        self.write(self.cache_path, digest, dict(self.trigrams), dict(self.words),
+                                   list(self.lengths), list(self.order), self.dirty, len(text))
+                    except OSError:
+                        # Без кэша индекс работает, просто соберется заново
+                        pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+    def build(self, text):
+        for start in range(0, max(len(text), 1), BLOCK_CHARS):
+            block = len(self.lengths)
+            self.lengths.append(min(BLOCK_CHARS, len(text) - start))
+            self.order.append(block)
+            self.add_terms(block, text[start:start + BLOCK_CHARS + OVERLAP])
+        self.starts = [0] * len(self.order)
+
+    def add_terms(self, block, text):
+        bit = 1 << block
+        trigrams, words = block_terms(text)
+        postings = self.trigrams
+        for term in trigrams:
+            postings[term] = postings.get(term, 0) | bit
+        postings = self.words
+        for term in words:
+            postings[term] = postings.get(term, 0) | bit
+
+    def close(self):
+        self.document.remove_listener(self.on_edit)
+
+    # === КЭШ НА ДИСКЕ ===
+
+    def load(self, path, length, digest):
+        """Взять индекс из кэша, если он построен для этого же текста"""
+        try:
+            with open(path, encoding="utf-8") as file:
+                header = json.loads(file.readline())
+                if (header.get("version") != INDEX_VERSION or header.get("block") != BLOCK_CHARS
+                        or header.get("overlap") != OVERLAP or header.get("length") != length
+                        or header.get("digest") != digest):
+                    return False
+                trigrams = {term: int(mask, 16) for term, mask in json.loads(file.readline()).items()}
+                words = {term: int(mask, 16) for term, mask in json.loads(file.readline()).items()}
+        except (OSError, ValueError):
+            return False
+        self.trigrams = trigrams
+        self.words = words
+        self.lengths = header["lengths"]
+        self.order = header["order"]
+        self.dirty = int(header["dirty"], 16)
+        self.starts = [0] * len(self.order)
+        self.from_cache = True
+        return True
+
+    @staticmethod
+    def write(path, digest, trigrams, words, lengths, order, dirty, length):
+        header = {"version": INDEX_VERSION, "block": BLOCK_CHARS, "overlap": OVERLAP,
+                  "length": length, "digest": digest, "lengths": lengths, "order": order,
+                  "dirty": format(dirty, "x")}
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(json.dumps(header) + "\n")
+                file.write(json.dumps({term: format(mask, "x") for term, mask in trigrams.items()},
+                                      ensure_ascii=False) + "\n")
+                file.write(json.dumps({term: format(mask, "x") for term, mask in words.items()},
+                                      ensure_ascii=False) + "\n")
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def store(self, path, digest):
+        """Записать кэш в фоне для сохраненного текста (копии масок берутся сразу)"""
+        if not self.ready or self.stale:
+            return None
+        args = (path, digest, dict(self.trigrams), dict(self.words), list(self.lengths),
+                list(self.order), self.dirty, len(self.document))
+        thread = threading.Thread(target=self.write, args=args, daemon=True)
+        thread.start()
+        return thread
+
+    # === ПРАВКИ ===
+
+    def finish(self):
+        """Применить правки, сделанные во время сборки (главный поток)"""
+        self.ready = True
+        pending, self.pending = self.pending, []
+        for kind, offset, text, version in pending:
+            self.apply(kind, offset, text)
+            self.version = version
+
+    def on_edit(self, kind, offset, text):
+        if not self.ready:
+            self.pending.append((kind, offset, text, self.document.version))
+            return
+        self.apply(kind, offset, text)
+        self.version = self.document.version
+
+    def apply(self, kind, offset, text):
+        if self.stale:
+            return
+        if kind == "reset":
+            # Документ заменен целиком - индекс больше не отвечает на запросы
+            self.stale = True
+        elif kind == "insert":
+            self.insert(offset, len(text))
+        else:
+            self.delete(offset, offset + len(text))
+
+    def locate(self, offset):
+        """Позиция в order блока, в котором лежит offset"""
+        order, lengths, starts = self.order, self.lengths, self.starts
+        while self.valid < len(order):
+            following = starts[self.valid - 1] + lengths[order[self.valid - 1]]
+            if following > offset:
+                break
+            starts[self.valid] = following
+            self.valid += 1
+        return bisect_right(starts, offset, 0, self.valid) - 1
+
+    def mark_dirty(self, first, last):
+        # Предыдущий блок тоже: его перекрытие заходит в измененный текст
+        for position in range(max(first - 1, 0), last + 1):
+            self.dirty |= 1 << self.order[position]
+
+    def insert(self, offset, length):
+        position = self.locate(offset)
+        block = self.order[position]
+        self.lengths[block] += length
+        self.valid = min(self.valid, position + 1)
+        if self.lengths[block] > 2 * BLOCK_CHARS:
+            # Новый блок получает новый номер, маски остальных не сдвигаются
+            added = len(self.lengths)
+            self.lengths.append(self.lengths[block] // 2)
+            self.lengths[block] -= self.lengths[added]
+            self.order.insert(position + 1, added)
+            self.starts.insert(position + 1, 0)
+            self.mark_dirty(position, position + 1)
+        else:
+            self.mark_dirty(position, position)
+
+    def delete(self, start, end):
+        first = self.locate(start)
+        last = self.locate(end)
+        self.mark_dirty(first, last)
+        for position in range(first, last + 1):
+            block = self.order[position]
+            block_start = self.starts[position]
+            overlap = min(end, block_start + self.lengths[block]) - max(start, block_start)
+            self.lengths[block] -= max(overlap, 0)
+        removed = [position for position in range(first, last + 1)
+                   if self.lengths[self.order[position]] == 0]
+        if len(removed) == len(self.order):
+            removed = removed[1:]
+        for position in reversed(removed):
+            del self.order[position]
+            del self.starts[position]
+        self.starts[0] = 0
+        self.valid = min(self.valid, max(first, 1))
+
+    def refresh(self, blocks=1):
+        """Переиндексировать несколько измененных блоков по текущему тексту"""
+        if not self.ready or self.stale or not self.dirty:
+            return 0
+        self.locate(len(self.document))
+        done = 0
+        for position, block in enumerate(self.order):
+            if done >= blocks:
+                break
+            if self.dirty >> block & 1:
+                start = self.starts[position]
+                end = start + self.lengths[block]
+                self.add_terms(block, self.document.get(start, min(end + OVERLAP, len(self.document))))
+                self.dirty &= ~(1 << block)
+                done += 1
+        return done
+
+    # === ЗАПРОСЫ ===
+
+    def candidates(self, query, snapshot):
+        """Отрезки документа, где могут быть совпадения, или None - нужен полный проход"""
+        if not self.ready or self.stale or query.regex or snapshot.version != self.version:
+            return None
+        text = query.text.lower()
+        if query.whole_word and WORD_RE.fullmatch(text):
+            mask = self.words.get(text, 0)
+        elif len(text) >= 3:
+            text = text[:OVERLAP]
+            mask = -1
+            for position in range(len(text) - 2):
+                mask &= self.trigrams.get(text[position:position + 3], 0)
+                if not mask:
+                    break
+        else:
+            return None
+        mask |= self.dirty
+        self.locate(len(snapshot))
+        ranges = []
+        for position, block in enumerate(self.order):
+            if mask >> block & 1:
+                start = self.starts[position]
+                end = start + self.lengths[block]
+                if ranges and ranges[-1][1] == start:
+                    ranges[-1] = (ranges[-1][0], end)
+                else:
+                    ranges.append((start, end))
+        return ranges
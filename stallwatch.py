@@ -0,0 +1,122 @@
+"""
+Модуль сторожа - обнаружение зависаний главного цикла Tk
+
+Главный поток через after() отмечает пульс. Поток сторожа проверяет, как
+давно был последний пульс; если дольше порога, он снимает стек главного
+потока (sys._current_frames) и пишет его в журнал с ротацией. Если главный
+поток держит GIL в долгом вызове C (большое регулярное выражение), поток
+сторожа не получит управления - на этот случай faulthandler сам выводит
+стеки всех потоков через HARD_STALL_TIMEOUT секунд.
+"""
+
+import faulthandler
+import logging
+from logging.handlers import RotatingFileHandler
+import os
+import sys
+import threading
+import time
+import traceback
+
+
+STALL_THRESHOLD = 0.5
+HEARTBEAT_INTERVAL = 100
+HARD_STALL_TIMEOUT = 5.0
+# faulthandler перезапускает свой поток при каждом взводе, поэтому не чаще раза в секунду
+HARD_STALL_REARM = 1.0
+LOG_MAX_BYTES = 1 << 20
+LOG_BACKUPS = 3
+
+
+class StallWatchdog:
+    """Сторож главного цикла окна root
+
+    command(frame) возвращает имя выполняемой команды по кадру главного
+    потока; вызывается из потока сторожа.
+    """
+
+    def __init__(self, root, log_path, threshold=STALL_THRESHOLD, command=lambda frame: None):
+        self.root = root
+        self.log_path = log_path
+        self.threshold = threshold
+        self.command = command
+        self.thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.armed = 0.0
+        self.captured = None    # last_beat зависания, стек которого уже записан
+        self.stalls = 0
+        self.worst = 0.0
+        self.job = None
+        self.handler = None
+        self.hard_log = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.logger = logging.getLogger("wordclone.stalls")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        self.handler = RotatingFileHandler(self.log_path, maxBytes=LOG_MAX_BYTES,
+                                           backupCount=LOG_BACKUPS, encoding="utf-8")
+        self.handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self.logger.addHandler(self.handler)
+        self.hard_log = open(os.path.splitext(self.log_path)[0] + ".faulthandler.log", "a")
+        self.last_beat = time.monotonic()
+        self.heartbeat()
+        self.thread = threading.Thread(target=self.monitor, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+        faulthandler.cancel_dump_traceback_later()
+        if self.thread is not None:
+            self.thread.join()
+        if self.handler is not None:
+            self.logger.removeHandler(self.handler)
+            self.handler.close()
+            self.handler = None
+        if self.hard_log is not None:
+            self.hard_log.close()
+            self.hard_log = None
+
+    def heartbeat(self):
+        """Пульс на главном потоке; здесь же считается длительность закончившегося зависания"""
+        now = time.monotonic()
+        late = now - self.last_beat - HEARTBEAT_INTERVAL / 1000
+        if late >= self.threshold:
+            self.stalls += 1
+            self.worst = max(self.worst, late)
+            self.logger.warning(f"Зависание закончилось: {late:.2f} с"
+                                + ("" if self.captured == self.last_beat else " (стек не снят)"))
+        self.last_beat = now
+        if now - self.armed >= HARD_STALL_REARM:
+            faulthandler.dump_traceback_later(HARD_STALL_TIMEOUT, file=self.hard_log)
+            self.armed = now
+        self.job = self.root.after(HEARTBEAT_INTERVAL, self.heartbeat)
+
+    def monitor(self):
+        while not self.stop_event.wait(self.threshold / 4):
+            beat = self.last_beat
+            late = time.monotonic() - beat - HEARTBEAT_INTERVAL / 1000
+            if late < self.threshold or self.captured == beat:
+                continue
+            self.captured = beat
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            try:
+                command = self.command(frame)
+            except Exception:
+                command = None
+            stack = "".join(traceback.format_stack(frame))
+            del frame
+            self.logger.warning(f"Зависание главного цикла: {late:.2f} с, "
+                                f"команда: {command or 'неизвестна'}\n{stack}")
+
+    def stats(self):
+        return {"stalls": self.stalls, "worst": self.worst, "threshold": self.threshold}
@@ -0,0 +1,189 @@
+"""
+Модуль стилей символов - один тег Tk на каждый различный составной стиль
+
+Каждый символ несет не больше одного тега стиля. Изменение выделения
+(жирный, размер, цвет...) не перенастраивает общий тег, а переводит каждый
+отрезок выделения на тег стиля "прежний стиль + изменение". Одинаковые
+стили делят один тег, неиспользуемые теги удаляются.
+"""
+
+from collections import namedtuple
+
+from richformat import TRANSIENT_TAGS
+
+
+STYLE_PREFIX = "style_"
+# При таком числе стилей неиспользуемые теги удаляются
+SWEEP_THRESHOLD = 64
+
+
+def index_key(index):
+    line, column = str(index).split(".")
+    return int(line), int(column)
+
+
+class Style(namedtuple("Style", "family size weight slant underline overstrike foreground background offset")):
+    """Составной стиль символов"""
+
+    __slots__ = ()
+
+    @classmethod
+    def default(cls, family, size):
+        return cls(family, size, "normal", "roman", False, False, None, None, 0)
+
+    @classmethod
+    def from_options(cls, split, options):
+        """Стиль по настройкам тега (split - разбор списка Tcl)"""
+        font = [str(item) for item in split(options["font"])]
+        words = " ".join(font[2:]).split()
+        return cls(font[0], int(font[1]),
+                   "bold" if "bold" in words else "normal",
+                   "italic" if "italic" in words else "roman",
+                   bool(int(options.get("underline") or 0)),
+                   bool(int(options.get("overstrike") or 0)),
+                   str(options["foreground"]) if options.get("foreground") else None,
+                   str(options["background"]) if options.get("background") else None,
+                   int(options.get("offset") or 0))
+
+    def options(self):
+        """Настройки тега Tk"""
+        font = [self.family, self.size]
+        if self.weight == "bold":
+            font.append("bold")
+        if self.slant == "italic":
+            font.append("italic")
+        options = {"font": tuple(font)}
+        if self.underline:
+            options["underline"] = 1
+        if self.overstrike:
+            options["overstrike"] = 1
+        if self.foreground:
+            options["foreground"] = self.foreground
+        if self.background:
+            options["background"] = self.background
+        if self.offset:
+            options["offset"] = self.offset
+        return options
+
+
+class StyleRegistry:
+    """Интернированные стили текстовой области"""
+
+    def __init__(self, text_area):
+        self.text_area = text_area
+        self.tags = {}      # Style -> имя тега
+        self.styles = {}    # имя тега -> Style
+        self.next_id = 0
+
+    def tag_for(self, style):
+        """Тег стиля; создается при первом использовании"""
+        tag = self.tags.get(style)
+        if tag is None:
+            tag = f"{STYLE_PREFIX}{self.next_id}"
+            self.next_id += 1
+            self.text_area.tag_configure(tag, **style.options())
+            # Выделение и подсветка поиска остаются поверх стилей
+            names = self.text_area.tag_names()
+            for transient in TRANSIENT_TAGS:
+                if transient in names:
+                    self.text_area.tag_raise(transient)
+            self.tags[style] = tag
+            self.styles[tag] = style
+        return tag
+
+    def style_at(self, index, base):
+        for tag in self.text_area.tag_names(index):
+            if tag in self.styles:
+                return self.styles[tag]
+        return base
+
+    def segments(self, start, end):
+        """Отрезки [start, end) с их тегом стиля (None - без стиля) в порядке текста"""
+        text = self.text_area
+        start = text.index(start)
+        end = text.index(end)
+        found = []
+        for tag in text.tag_names(start):
+            if tag in self.styles:
+                last = str(text.tag_prevrange(tag, f"{start}+1c")[1])
+                found.append((start, last if text.compare(last, "<", end) else end, tag))
+        for tag in self.styles:
+            position = start
+            while True:
+                tag_range = text.tag_nextrange(tag, position, end)
+                if not tag_range:
+                    break
+                first, last = (str(index) for index in tag_range)
+                if first != start:
+                    found.append((first, last if text.compare(last, "<", end) else end, tag))
+                position = last
+        found.sort(key=lambda segment: index_key(segment[0]))
+        segments = []
+        position = start
+        for first, last, tag in found:
+            if index_key(first) > index_key(position):
+                segments.append((position, first, None))
+            segments.append((first, last, tag))
+            position = last
+        if index_key(position) < index_key(end):
+            segments.append((position, end, None))
+        return segments
+
+    def apply(self, start, end, base, **changes):
+        """Изменить поля стиля на [start, end); base - стиль текста без тега"""
+        text = self.text_area
+        added = {}
+        for first, last, tag in self.segments(start, end):
+            style = self.styles[tag] if tag is not None else base
+            new_style = style._replace(**changes)
+            if new_style == base:
+                # Стиль совпал с обычным текстом: тег снимается, новый не нужен
+                if tag is not None:
+                    text.tag_remove(tag, first, last)
+                continue
+            new_tag = self.tag_for(new_style)
+            if new_tag == tag:
+                continue
+            if tag is not None:
+                text.tag_remove(tag, first, last)
+            added.setdefault(new_tag, []).extend((first, last))
+        for tag, indices in added.items():
+            text.tag_add(tag, *indices)
+        if len(self.styles) > SWEEP_THRESHOLD:
+            self.sweep()
+
+    def sweep(self):
+        """Удалить теги стилей, которые больше нигде не стоят"""
+        removed = 0
+        for tag in list(self.styles):
+            if not self.text_area.tag_nextrange(tag, "1.0"):
+                self.text_area.tag_delete(tag)
+                del self.tags[self.styles.pop(tag)]
+                removed += 1
+        return removed
+
+    def adopt(self):
+        """Принять теги стилей, загруженные вместе с документом"""
+        text = self.text_area
+        self.tags = {}
+        self.styles = {}
+        for tag in text.tag_names():
+            if not tag.startswith(STYLE_PREFIX):
+                continue
+            try:
+                number = int(tag[len(STYLE_PREFIX):])
+                options = {name: text.tag_cget(tag, name)
+                           for name in ("font", "underline", "overstrike", "foreground", "background", "offset")}
+                style = Style.from_options(text.tk.splitlist, options)
+            except (ValueError, IndexError):
+                continue
+            self.next_id = max(self.next_id, number + 1)
+            if not text.tag_nextrange(tag, "1.0") or style in self.tags:
+                # Пустой тег или повтор стиля - остается обычным тегом
+                continue
+            self.tags[style] = tag
+            self.styles[tag] = style
+
+    def stats(self):
+        """Число живых стилей и всех тегов текстовой области"""
+        return {"styles": len(self.styles), "tags": len(self.text_area.tag_names())}
@@ -0,0 +1,18 @@
+"""
+Общие настройки тестов: модули редактора лежат в корне репозитория
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def headless():
+    """Модуль редактора без окна; functions все равно импортирует customtkinter"""
+    pytest.importorskip("customtkinter")
+    import headless
+    return headless
@@ -0,0 +1,93 @@
+"""
+Тесты пакетного режима: команды над файлами без окна и вывод строками JSON
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import batch
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def files(tmp_path, headless):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_text("бета\nальфа\nгамма альфа\n", encoding="utf-8")
+    (tmp_path / "sub" / "b.txt").write_text("Один два\nтри", encoding="utf-8")
+    (tmp_path / "skip.log").write_text("альфа", encoding="utf-8")
+    return tmp_path
+
+
+def run(command, paths, **options):
+    out = io.StringIO()
+    code = batch.run(command, [str(path) for path in paths], options, jobs=1, out=out)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    return code, {os.path.basename(result["file"]): result for result in results}
+
+
+def test_collect_files_walks_directories(files):
+    found = [os.path.relpath(path, files) for path in batch.collect_files([str(files)])]
+    assert found == ["a.txt", os.path.join("sub", "b.txt")]
+
+
+def test_stats(files):
+    code, results = run("stats", [files])
+    assert code == 0
+    assert results["a.txt"]["ok"]
+    assert (results["a.txt"]["words"], results["a.txt"]["lines"]) == (4, 4)
+    assert results["b.txt"]["chars"] == len("Один два\nтри")
+
+
+def test_find_reports_line_and_column(files):
+    code, results = run("find", [files], pattern="альфа")
+    assert results["a.txt"]["hits"] == 2
+    assert [(match["line"], match["column"]) for match in results["a.txt"]["matches"]] == [(2, 0), (3, 6)]
+    assert results["a.txt"]["matches"][1]["context"] == "гамма альфа"
+    assert results["b.txt"]["hits"] == 0
+
+
+def test_replace_all_writes_to_output_dir(files, tmp_path_factory):
+    output = tmp_path_factory.mktemp("out")
+    code, results = run("replace-all", [files], pattern="альфа", replacement="омега",
+                        output_dir=str(output))
+    assert results["a.txt"]["replaced"] == 2
+    assert (output / "a.txt").read_text(encoding="utf-8") == "бета\nомега\nгамма омега\n"
+    assert results["b.txt"]["written"] is None
+    assert (files / "a.txt").read_text(encoding="utf-8").count("альфа") == 2
+
+
+def test_sort_and_case_in_place(files):
+    run("sort", [files / "a.txt"], in_place=True)
+    assert (files / "a.txt").read_text(encoding="utf-8") == "альфа\nбета\nгамма альфа\n"
+    run("case", [files / "sub"], mode="upper", in_place=True)
+    assert (files / "sub" / "b.txt").read_text(encoding="utf-8") == "ОДИН ДВА\nТРИ"
+
+
+def test_convert_writes_file_beside_source(files):
+    run("convert", [files / "a.txt"], to="wcd")
+    code, results = run("stats", [files / "a.wcd"])
+    assert results["a.wcd"]["chars"] == len("бета\nальфа\nгамма альфа\n")
+    code, results = run("convert", [files / "a.wcd"], to="wcd")
+    assert results["a.wcd"]["written"] is None
+
+
+def test_failed_file_sets_exit_code(files):
+    code, results = run("stats", [files / "missing.txt"])
+    assert code == 1
+    assert not results["missing.txt"]["ok"]
+    assert results["missing.txt"]["error"]
+
+
+def test_command_line(files):
+    completed = subprocess.run([sys.executable, "main.py", "find", "альфа", str(files), "-j", "2"],
+                               cwd=ROOT, capture_output=True, text=True, encoding="utf-8", timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    results = [json.loads(line) for line in completed.stdout.splitlines()]
+    assert sorted(result["hits"] for result in results) == [0, 2]
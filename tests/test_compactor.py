@@ -0,0 +1,110 @@
+"""
+Тесты уборки тегов: вид документа не меняется, лишние отрезки и теги уходят
+"""
+
+import random
+
+import pytest
+
+import compactor
+from richformat import tag_options
+
+
+COLORS = ["#ff0000", "#00ff00", "#0000ff"]
+
+
+def appearance(editor):
+    """Итоговые настройки каждого символа: выше по приоритету - сильнее"""
+    text_area = editor.text_area
+    options = {tag: tag_options(text_area, tag) for tag in text_area.tag_names()}
+    result = []
+    for offset in range(len(editor.document)):
+        current = {}
+        for tag in text_area.tag_names(editor.offset_index(offset)):
+            current.update(options[tag])
+        result.append(current)
+    return result
+
+
+def compact(editor):
+    editor.compact_tags_slice()
+    assert editor.run(until=lambda: editor.tag_compactor.steps is None, timeout=30)
+    return editor.tag_compactor.last
+
+
+@pytest.fixture
+def editor(headless, monkeypatch):
+    # Маленькие порции: уборка тега проходит через много шагов
+    monkeypatch.setattr(compactor, "RANGE_CHUNK", 3)
+    monkeypatch.setattr(headless.HeadlessEditor, "TAG_COMPACT_BUDGET", 0)
+    with headless.HeadlessEditor() as editor:
+        editor.text_area.insert("1.0", "строка текста для уборки\n" * 20)
+        yield editor
+
+
+def test_compaction_keeps_appearance(editor):
+    rng = random.Random(13)
+    text_area = editor.text_area
+    for number in range(12):
+        text_area.tag_configure(f"color{number}", foreground=rng.choice(COLORS))
+    for _ in range(300):
+        start = rng.randrange(len(editor.document))
+        first = editor.offset_index(start)
+        last = editor.offset_index(min(len(editor.document), start + rng.randint(1, 40)))
+        if rng.random() < 0.2:
+            editor.select(first, last)
+            editor.apply_char_style(**rng.choice([{"weight": "bold"}, {"slant": "italic"}, {"weight": "normal"}]))
+        else:
+            text_area.tag_add(f"color{rng.randrange(12)}", first, last)
+    before = appearance(editor)
+    tags = len(text_area.tag_names())
+    ranges = sum(len(text_area.tag_ranges(tag)) for tag in text_area.tag_names())
+    text_area.edit_modified(False)
+    depth = len(editor.undo_manager.undo_stack)
+    report = compact(editor)
+    assert appearance(editor) == before
+    assert report["ranges"] > 0
+    assert sum(len(text_area.tag_ranges(tag)) for tag in text_area.tag_names()) < ranges
+    assert len(text_area.tag_names()) <= tags
+    # Уборка не правка документа
+    assert not text_area.edit_modified()
+    assert len(editor.undo_manager.undo_stack) == depth
+
+
+def test_empty_and_duplicate_tags_are_removed(editor):
+    text_area = editor.text_area
+    text_area.tag_configure("empty", foreground="#ff0000")
+    text_area.tag_configure("low", foreground="#00ff00")
+    text_area.tag_configure("high", foreground="#00ff00")
+    text_area.tag_add("low", "1.0", "1.5", "3.0", "3.5")
+    text_area.tag_add("high", "2.0", "2.5")
+    before = appearance(editor)
+    compact(editor)
+    assert appearance(editor) == before
+    names = text_area.tag_names()
+    assert "empty" not in names and "low" not in names
+    assert len(text_area.tag_ranges("high")) == 6
+
+
+def test_edit_between_steps_postpones_tag(editor):
+    text_area = editor.text_area
+    text_area.tag_configure("low", foreground="#00ff00")
+    text_area.tag_configure("high", foreground="#ff0000")
+    for line in range(1, 21):
+        text_area.tag_add("low", f"{line}.0", f"{line}.3")
+    text_area.tag_add("high", "1.0", "end")
+    steps = editor.tag_compactor.pass_steps()
+    # Шаги прохода идут с quiet_tags, как в compact_tags_slice
+    editor.quiet_tags = True
+    for _ in range(3):
+        # Первые шаги читают отрезки "low", затем приходит правка
+        next(steps)
+    editor.quiet_tags = False
+    text_area.insert("1.0", "правка ")
+    editor.quiet_tags = True
+    for _ in steps:
+        pass
+    editor.quiet_tags = False
+    assert len(text_area.tag_ranges("low")) == 40
+    compact(editor)
+    assert "low" not in text_area.tag_names()
@@ -0,0 +1,122 @@
+"""
+Тесты модели документа: piece table против обычной строки
+"""
+
+import random
+
+from document import Document, EditTracker, TextStats, compute_line_starts
+
+
+ALPHABET = "ab c\nйё\t"
+
+
+def random_text(rng, limit=12):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, limit)))
+
+
+def check(document, text):
+    assert len(document) == len(text)
+    assert document.get() == text
+    snapshot = document.snapshot()
+    assert snapshot.text() == text
+    assert snapshot.line_starts() == compute_line_starts(text)
+
+
+def test_random_edits_match_string():
+    rng = random.Random(1)
+    for _ in range(40):
+        text = random_text(rng, 50) if rng.random() < 0.5 else ""
+        document = Document(text)
+        for step in range(300):
+            if step % 25 == 0:
+                check(document, text)
+            action = rng.random()
+            if action < 0.45 or not text:
+                offset = rng.randint(0, len(text))
+                chunk = random_text(rng)
+                document.insert(offset, chunk)
+                text = text[:offset] + chunk + text[offset:]
+            elif action < 0.8:
+                start = rng.randint(0, len(text))
+                end = rng.randint(start, min(len(text), start + 20))
+                assert document.delete(start, end) == text[start:end]
+                text = text[:start] + text[end:]
+            else:
+                start = rng.randint(0, len(text))
+                end = rng.randint(start, len(text))
+                assert document.get(start, end) == text[start:end]
+        check(document, text)
+
+
+def test_typing_runs_coalesce():
+    document = Document()
+    for char in "hello world":
+        document.insert(len(document), char)
+    assert document.piece_count == 1
+    check(document, "hello world")
+
+
+def test_snapshot_is_immutable():
+    document = Document("one\ntwo")
+    snapshot = document.snapshot()
+    document.insert(3, "!")
+    document.delete(0, 1)
+    assert snapshot.text() == "one\ntwo"
+    assert document.snapshot() is not snapshot
+    assert document.snapshot().version > snapshot.version
+
+
+def test_snapshot_index_conversion():
+    document = Document("ab\n\ncd\n")
+    snapshot = document.snapshot()
+    for offset in range(len(snapshot) + 1):
+        assert snapshot.index_to_offset(snapshot.offset_to_index(offset)) == offset
+    assert snapshot.offset_to_index(4) == "3.0"
+    assert snapshot.index_to_offset("9.0") == len(snapshot)
+
+
+def test_iter_chunks_from_offset():
+    document = Document("x" * 10)
+    document.insert(5, "yyy")
+    snapshot = document.snapshot()
+    assert "".join(snapshot.iter_chunks(chunk_size=4, start=3)) == snapshot.text()[3:]
+    assert all(len(chunk) <= 4 for chunk in snapshot.iter_chunks(chunk_size=4))
+
+
+def test_listeners_see_every_edit():
+    document = Document("abc")
+    events = []
+    document.add_listener(lambda kind, offset, text: events.append((kind, offset, text)))
+    document.replace(1, 2, "XY")
+    document.reset("new")
+    assert events == [("delete", 1, "b"), ("insert", 1, "XY"), ("reset", 0, "new")]
+
+
+def test_text_stats_follow_edits():
+    rng = random.Random(2)
+    document = Document("first line\nsecond")
+    stats = TextStats(document)
+    text = document.get()
+    for _ in range(500):
+        if rng.random() < 0.6 or not text:
+            offset = rng.randint(0, len(text))
+            chunk = random_text(rng, 5)
+            document.insert(offset, chunk)
+            text = text[:offset] + chunk + text[offset:]
+        else:
+            start = rng.randint(0, len(text) - 1)
+            end = rng.randint(start + 1, min(len(text), start + 6))
+            document.delete(start, end)
+            text = text[:start] + text[end:]
+        assert (stats.chars, stats.lines, stats.words) == (len(text), text.count("\n") + 1, len(text.split()))
+
+
+def test_edit_tracker_marks_lowest_offset():
+    document = Document("0123456789")
+    tracker = EditTracker(document)
+    document.insert(7, "x")
+    document.delete(3, 4)
+    assert tracker.mark() == 3
+    assert tracker.min_offset == float("inf")
+    tracker.restore(3)
+    assert tracker.min_offset == 3
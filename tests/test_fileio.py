@@ -0,0 +1,139 @@
+"""
+Тесты потоковой загрузки и атомарного сохранения
+"""
+
+import os
+import stat
+
+from document import Document
+from fileio import UMASK, AtomicSaver, ChunkedLoader
+
+
+TEXT = "первая строка\nsecond line\n" * 300 + "без перевода строки"
+
+
+def save(path, snapshot, **options):
+    saver = AtomicSaver(str(path), snapshot, **options).start()
+    assert saver.done.wait(10)
+    assert saver.error is None
+    return saver
+
+
+def load(path, chunk_chars=100):
+    loader = ChunkedLoader(str(path), chunk_chars=chunk_chars).start()
+    chunks = []
+    while True:
+        item = loader.queue.get(timeout=10)
+        if item[0] == "chunk":
+            chunks.append(item[1])
+        elif item[0] == "done":
+            return "".join(chunks), loader.state
+        else:
+            raise item[1]
+
+
+def test_save_and_reload_are_byte_identical(tmp_path):
+    path = tmp_path / "doc.txt"
+    document = Document(TEXT)
+    document.insert(5, "вставка")
+    document.delete(100, 120)
+    expected = document.get()
+    saver = save(path, document.snapshot())
+    assert path.read_bytes() == expected.encode("utf-8")
+    text, state = load(path)
+    assert text == expected
+    assert state.length == saver.state.length == len(expected)
+    assert state.hasher.digest() == saver.state.hasher.digest()
+    assert state.matches_disk()
+
+
+def test_rewrite_leaves_no_temporary_files(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("old")
+    save(path, Document(TEXT).snapshot())
+    assert os.listdir(tmp_path) == ["doc.txt"]
+
+
+def test_new_file_gets_umask_permissions(tmp_path):
+    path = tmp_path / "new.txt"
+    save(path, Document("x").snapshot())
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~UMASK
+
+
+def test_existing_file_keeps_its_mode(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("old")
+    os.chmod(path, 0o640)
+    save(path, Document("new").snapshot())
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    assert path.read_text() == "new"
+
+
+def test_failed_save_keeps_original(tmp_path):
+    path = tmp_path / "missing" / "doc.txt"
+    saver = AtomicSaver(str(path), Document("x").snapshot()).start()
+    assert saver.done.wait(10)
+    assert saver.error is not None
+    assert not path.parent.exists()
+
+
+def test_prefix_is_written_before_text(tmp_path):
+    path = tmp_path / "doc.wcd"
+    save(path, Document("a\nb").snapshot(), prefix="HEADER\n", newline="\n")
+    assert path.read_bytes() == b"HEADER\na\nb"
+
+
+def test_unchanged_document_is_not_rewritten(tmp_path):
+    path = tmp_path / "doc.txt"
+    document = Document(TEXT)
+    first = save(path, document.snapshot())
+    inode = os.stat(path).st_ino
+    second = save(path, document.snapshot(), previous=first.state)
+    assert second.skipped
+    assert second.state is first.state
+    assert os.stat(path).st_ino == inode
+
+
+def test_changed_file_on_disk_is_rewritten(tmp_path):
+    path = tmp_path / "doc.txt"
+    document = Document(TEXT)
+    first = save(path, document.snapshot())
+    path.write_text("чужая правка")
+    second = save(path, document.snapshot(), previous=first.state)
+    assert not second.skipped
+    assert path.read_bytes() == TEXT.encode("utf-8")
+
+
+def test_append_writes_only_the_tail(tmp_path):
+    path = tmp_path / "doc.txt"
+    document = Document(TEXT)
+    first = save(path, document.snapshot())
+    inode = os.stat(path).st_ino
+    end = len(document)
+    document.insert(end, "\nдописано в конец")
+    second = save(path, document.snapshot(), previous=first.state, append_from=end)
+    assert second.appended
+    assert os.stat(path).st_ino == inode
+    assert path.read_bytes() == document.get().encode("utf-8")
+    text, state = load(path)
+    assert text == document.get()
+    assert state.hasher.digest() == second.state.hasher.digest()
+    assert second.state.matches_disk()
+
+
+def test_append_falls_back_to_rewrite_when_file_changed(tmp_path):
+    path = tmp_path / "doc.txt"
+    document = Document(TEXT)
+    first = save(path, document.snapshot())
+    path.write_text("чужая правка")
+    end = len(document)
+    document.insert(end, "хвост")
+    second = save(path, document.snapshot(), previous=first.state, append_from=end)
+    assert not second.appended
+    assert path.read_bytes() == document.get().encode("utf-8")
+
+
+def test_file_with_header_is_not_appendable(tmp_path):
+    path = tmp_path / "doc.wcd"
+    saver = save(path, Document("a").snapshot(), prefix="HEADER\n")
+    assert not saver.state.appendable
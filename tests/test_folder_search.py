@@ -0,0 +1,88 @@
+"""
+Тесты поиска в папке: номера строк и столбцов, обход каталогов и потоковые результаты
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import random
+import re
+
+from folder_search import FolderSearch, search_files, search_text, split_patterns, walk_files
+from richformat import header_prefix
+from search import SearchQuery
+
+
+def expected_hits(text, pattern):
+    hits = []
+    for match in pattern.finditer(text):
+        if match.end() == match.start():
+            continue
+        start = match.start()
+        line_start = text.rfind("\n", 0, start) + 1
+        line_end = text.find("\n", start)
+        line_end = len(text) if line_end < 0 else line_end
+        hits.append((text.count("\n", 0, start) + 1, start - line_start, match.end() - start,
+                     text[line_start:line_end][:240]))
+    return hits
+
+
+def test_line_and_column_numbers():
+    rng = random.Random(12)
+    pieces = ["аб", "в", "\n", "\n\n", "абв ", "x" * 300]
+    for _ in range(100):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 60)))
+        for source in ("аб", "б\\s*в", "^в", "x+", "\\w*"):
+            pattern = re.compile(source, re.MULTILINE)
+            assert search_text(text, pattern) == (expected_hits(text, pattern), False)
+
+
+def test_hits_are_truncated():
+    hits, truncated = search_text("а\n" * 10, re.compile("а"), max_hits=3)
+    assert truncated
+    assert [hit[0] for hit in hits] == [1, 2, 3]
+
+
+def test_split_patterns():
+    assert split_patterns("*.txt; *.wcd,") == ("*.txt", "*.wcd")
+    assert split_patterns(" ") == ("*",)
+
+
+def make_tree(root):
+    (root / "sub").mkdir()
+    (root / ".hidden").mkdir()
+    (root / "a.txt").write_text("один\nнайти тут\n", encoding="utf-8")
+    (root / "sub" / "b.txt").write_text("найти\n", encoding="utf-8")
+    (root / "sub" / "c.wcd").write_text(header_prefix({"tags": [], "runs": {}}) + "и здесь найти",
+                                        encoding="utf-8")
+    (root / ".hidden" / "d.txt").write_text("найти", encoding="utf-8")
+    (root / "big.txt").write_text("найти" * 100, encoding="utf-8")
+    (root / "binary.txt").write_bytes("\0найти".encode("utf-8"))
+
+
+def test_walk_skips_hidden_and_large_files(tmp_path):
+    make_tree(tmp_path)
+    found = [path[len(str(tmp_path)) + 1:] for path in walk_files(str(tmp_path), ("*.txt",), max_size=100)]
+    assert found == ["a.txt", "binary.txt", "sub/b.txt"]
+
+
+def test_search_files_reads_rich_and_skips_binary(tmp_path):
+    make_tree(tmp_path)
+    paths = [str(tmp_path / name) for name in ("sub/c.wcd", "binary.txt", "missing.txt")]
+    results = search_files(paths, "найти", 0)
+    assert results[0][:3] == (paths[0], [(1, 8, 5, "и здесь найти")], False)
+    assert results[1][0] == paths[2] and results[1][3]
+    assert len(results) == 2
+
+
+def test_folder_search_streams_all_hits(tmp_path):
+    make_tree(tmp_path)
+    with ThreadPoolExecutor(2) as executor:
+        search = FolderSearch(executor, str(tmp_path), SearchQuery("найти"), ("*.txt", "*.wcd"),
+                              max_size=100, workers=2).start()
+        items = []
+        while not items or items[-1][0] != "done":
+            items.append(search.results.get(timeout=10))
+    hits = {item[1][len(str(tmp_path)) + 1:]: item[2] for item in items if item[0] == "hits"}
+    assert hits == {"a.txt": [(2, 0, 5, "найти тут")], "sub/b.txt": [(1, 0, 5, "найти")],
+                    "sub/c.wcd": [(1, 8, 5, "и здесь найти")]}
+    assert search.searched == search.files == 4
+    assert search.hits == 3
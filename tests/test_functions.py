@@ -0,0 +1,121 @@
+"""
+Тесты команд редактора без окна: загрузка и сохранение файла
+"""
+
+import os
+
+
+TEXT = "строка большого файла\n" * 200_000
+
+
+def test_save_during_loading_is_refused(tmp_path, headless):
+    path = tmp_path / "big.txt"
+    path.write_text(TEXT, encoding="utf-8")
+    with headless.HeadlessEditor() as editor:
+        editor.load_file(str(path))
+        editor.update()
+        assert editor.loader is not None
+        assert editor.current_file is None
+        editor.save_file()
+        assert editor.saver is None
+        assert editor.notice_label.cget("text") == "Дождитесь окончания загрузки файла"
+        assert editor.answers.errors() == []
+        assert editor.run(until=lambda: editor.loader is None, timeout=60)
+        assert editor.current_file == str(path)
+        assert editor.text() == TEXT
+        editor.text_area.insert("end", "конец")
+        editor.save_file()
+        assert editor.run(until=lambda: editor.saver is None, timeout=60)
+    assert path.read_text(encoding="utf-8") == TEXT + "конец"
+    assert os.listdir(tmp_path) == ["big.txt"]
+
+
+def test_font_change_on_plain_selection(headless):
+    with headless.HeadlessEditor() as editor:
+        editor.text_area.insert("1.0", "обычный текст")
+        font = editor.text_area.cget("font")
+        editor.select("1.0", "1.7")
+        editor.change_font_family("Courier New")
+        tags = [tag for tag in editor.text_area.tag_names("1.0") if tag != "sel"]
+        assert len(tags) == 1
+        assert editor.style_registry.styles[tags[0]].family == "Courier New"
+        assert editor.text_area.tag_names("1.8") == ()
+        editor.change_font_size("20")
+        style = editor.style_registry.styles[editor.text_area.tag_names("1.0")[0]]
+        assert (style.family, style.size) == ("Courier New", 20)
+        assert editor.text_area.cget("font") == font
+        editor.select("1.8", "1.13")
+        editor.change_font_size("14")
+        assert editor.style_registry.styles[editor.text_area.tag_names("1.9")[0]].size == 14
+
+
+def test_open_file_from_read_only_mode(tmp_path, headless, monkeypatch):
+    import largefile
+    # Без окна высоту строки шрифта не измерить
+    monkeypatch.setattr(largefile.VirtualViewport, "visible_lines", lambda viewport: 30)
+    viewed = tmp_path / "viewed.log"
+    viewed.write_text("журнал\n" * 1000, encoding="utf-8")
+    other = tmp_path / "other.txt"
+    other.write_text("другой файл\n", encoding="utf-8")
+    with headless.HeadlessEditor() as editor:
+        editor.text_area.insert("1.0", "черновик")
+        editor.text_area.edit_modified(False)
+        editor.current_file = str(viewed)
+        editor.enter_read_only_mode()
+        assert editor.viewer is not None
+        mapped = editor.viewer.mapped
+        # Текст документа не попадает в стек отмены при входе в режим
+        assert editor.undo_manager.undo_stack == []
+        editor.open(str(other))
+        assert editor.viewer is None
+        assert mapped.file.closed
+        assert editor.current_file == str(other)
+        assert editor.text() == "другой файл\n"
+        assert editor.text_area.get("1.0", "end-1c") == "другой файл\n"
+        assert editor.text_area.cget("state") == "normal"
+        editor.enter_read_only_mode()
+        editor.new_file()
+        assert editor.viewer is None
+        assert editor.text() == "" and editor.text_area.get("1.0", "end-1c") == ""
+        editor.text_area.insert("1.0", "новый")
+        assert editor.text() == "новый"
+
+
+def test_append_after_open_is_saved_incrementally(tmp_path, headless):
+    path = tmp_path / "app.log"
+    path.write_text("запись журнала\n" * 1000, encoding="utf-8")
+    with headless.HeadlessEditor() as editor:
+        editor.open(str(path))
+        inode = os.stat(path).st_ino
+        editor.text_area.insert("end-1c", "новая запись\n")
+        editor.start_save(editor.current_file)
+        saver = editor.saver
+        assert editor.run(until=lambda: editor.saver is None, timeout=60)
+        assert saver.appended
+        assert os.stat(path).st_ino == inode
+    assert path.read_text(encoding="utf-8") == "запись журнала\n" * 1000 + "новая запись\n"
+
+
+def test_unprofiled_methods_exist(headless):
+    editor_class = headless.HeadlessEditor
+    assert [name for name in editor_class.UNPROFILED_METHODS if not hasattr(editor_class, name)] == []
+
+
+def test_index_cache_is_stored_only_for_unchanged_document(tmp_path, headless, monkeypatch):
+    path = tmp_path / "doc.txt"
+    path.write_text("индекс поиска\n" * 100, encoding="utf-8")
+    monkeypatch.setattr(headless.HeadlessEditor, "SEARCH_INDEX_MIN_CHARS", 0)
+    with headless.HeadlessEditor(search_index=True) as editor:
+        editor.open(str(path))
+        index = editor.search_index
+        assert editor.run(until=lambda: index.ready, timeout=30)
+        stored = []
+        monkeypatch.setattr(index, "store", lambda *args: stored.append(args))
+        editor.text_area.insert("1.0", "а")
+        editor.start_save(editor.current_file)
+        # Правка во время записи: снимок на диске старше документа
+        editor.text_area.insert("1.0", "б")
+        assert editor.run(until=lambda: editor.saver is None, timeout=30)
+        assert stored == []
+        editor.save()
+        assert len(stored) == 1
@@ -0,0 +1,113 @@
+"""
+Тесты HeadlessText: разбор индексов и сдвиг тегов при правках
+"""
+
+import pytest
+
+
+@pytest.fixture
+def text_area(headless):
+    text_area = headless.HeadlessText(headless.HeadlessTcl())
+    text_area.insert("1.0", "первая строка\nвторая строка\n\nконец")
+    return text_area
+
+
+@pytest.mark.parametrize("index, expected", [
+    ("end", "5.0"),
+    ("end-1c", "4.5"),
+    ("end+5c", "5.0"),
+    ("1.end", "1.13"),
+    ("1.99", "1.13"),
+    ("10.4", "5.0"),
+    ("1.0-3c", "1.0"),
+    ("2.3+4c", "2.7"),
+    ("3.0+2c", "4.1"),
+    ("2.3 linestart", "2.0"),
+    ("2.3 lineend", "2.13"),
+    ("2.5 -1 lines", "1.5"),
+    ("end-1c linestart", "4.0"),
+    ("1.3 wordstart", "1.0"),
+    ("1.3 wordend", "1.6"),
+    ("@0,0", "1.0"),
+    ("@100,200", "1.0"),
+    ("insert", "4.5"),
+])
+def test_index(text_area, index, expected):
+    assert text_area.index(index) == expected
+
+
+def test_index_marks_and_tags(text_area, headless):
+    text_area.mark_set("place", "2.2")
+    text_area.tag_add("bold", "1.2", "1.5", "2.0", "2.4")
+    assert text_area.index("place+1c") == "2.3"
+    assert text_area.index("bold.first+1c") == "1.3"
+    assert text_area.index("bold.last") == "2.4"
+    with pytest.raises(headless.tk.TclError):
+        text_area.index("missing")
+    with pytest.raises(headless.tk.TclError):
+        text_area.index("italic.first")
+
+
+def test_insert_inside_range_extends_it(text_area):
+    text_area.tag_add("bold", "1.2", "1.5")
+    text_area.insert("1.3", "xx")
+    assert text_area.tag_ranges("bold") == ("1.2", "1.7")
+
+
+def test_insert_at_range_edges_is_untagged(text_area):
+    text_area.tag_add("bold", "1.2", "1.5")
+    text_area.insert("1.5", "xx")
+    text_area.insert("1.2", "yy")
+    assert text_area.tag_ranges("bold") == ("1.4", "1.7")
+    assert text_area.get("1.4", "1.7") == "рва"
+
+
+def test_insert_lines_before_range_shifts_it(text_area):
+    text_area.tag_add("bold", "2.0", "2.6")
+    text_area.insert("1.0", "новая\n")
+    assert text_area.tag_ranges("bold") == ("3.0", "3.6")
+    text_area.insert("3.3", "a\nb")
+    assert text_area.tag_ranges("bold") == ("3.0", "4.4")
+
+
+def test_insert_with_tags(text_area):
+    text_area.tag_add("bold", "1.0", "1.6")
+    text_area.insert("1.6", "++", ("bold", "italic"))
+    assert text_area.tag_ranges("bold") == ("1.0", "1.8")
+    assert text_area.tag_ranges("italic") == ("1.6", "1.8")
+    text_area.insert("1.2", "--", ())
+    assert text_area.tag_ranges("bold") == ("1.0", "1.2", "1.4", "1.10")
+
+
+def test_delete_inside_range_shrinks_it(text_area):
+    text_area.tag_add("bold", "1.2", "1.8")
+    text_area.delete("1.3", "1.5")
+    assert text_area.tag_ranges("bold") == ("1.2", "1.6")
+
+
+def test_delete_across_ranges(text_area):
+    text_area.tag_add("bold", "1.2", "1.5", "1.7", "1.10", "2.0", "2.4")
+    text_area.delete("1.4", "1.8")
+    assert text_area.tag_ranges("bold") == ("1.2", "1.6", "2.0", "2.4")
+    text_area.delete("1.6", "2.1")
+    # Сошедшиеся отрезки сливаются, как в Tk
+    assert text_area.tag_ranges("bold") == ("1.2", "1.9")
+    assert text_area.tag_nextrange("bold", "1.3") == ()
+
+
+def test_delete_whole_range_drops_it(text_area):
+    text_area.tag_add("bold", "1.2", "1.5", "2.0", "2.4")
+    text_area.delete("1.0", "1.end")
+    assert text_area.tag_ranges("bold") == ("2.0", "2.4")
+    text_area.delete("1.0", "end")
+    assert text_area.tag_ranges("bold") == ()
+    assert text_area.index("end-1c") == "1.0"
+
+
+def test_replace_keeps_neighbouring_tags(text_area):
+    text_area.tag_add("bold", "1.0", "1.6")
+    text_area.tag_add("italic", "1.7", "1.13")
+    text_area.replace("1.0", "1.6", "одна")
+    assert text_area.tag_ranges("bold") == ()
+    assert text_area.tag_ranges("italic") == ("1.5", "1.11")
+    assert text_area.get("1.0", "1.end") == "одна строка"
@@ -0,0 +1,101 @@
+"""
+Тесты истории версий: любая ревизия восстанавливается по контрольным точкам и правкам
+"""
+
+import os
+import random
+
+import pytest
+
+from document import Document
+from fileio import new_hasher
+from history import DocumentHistory, RevisionStore
+
+
+def digest(text):
+    hasher = new_hasher()
+    hasher.update(text.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def random_edits(document, rng, count):
+    for _ in range(count):
+        length = len(document)
+        if length and rng.random() < 0.4:
+            start = rng.randrange(length)
+            document.delete(start, min(length, start + rng.randint(1, 8)))
+        else:
+            document.insert(rng.randint(0, length), rng.choice(["а", "bc", "\n", "слово "]))
+
+
+def saved_history(tmp_path, saves, interval=5):
+    path = str(tmp_path / "doc.txt")
+    text = "исходный текст документа\n" * 40
+    document = Document(text)
+    history = DocumentHistory(document, path, digest(text))
+    history.store = RevisionStore(path, checkpoint_interval=interval)
+    rng = random.Random(9)
+    saved = []
+    for _ in range(saves):
+        random_edits(document, rng, rng.randint(1, 20))
+        snapshot = document.snapshot()
+        history.commit(path, snapshot, digest(snapshot.text()))
+        saved.append(snapshot.text())
+    history.close()
+    return path, history.store, saved
+
+
+def test_every_revision_is_restored(tmp_path):
+    path, store, saved = saved_history(tmp_path, 23)
+    kinds = [revision["kind"] for revision in store.revisions]
+    assert kinds.count("delta") > kinds.count("checkpoint") > 1
+    since = 0
+    for kind in kinds:
+        # Между контрольными точками не больше interval - 1 наборов правок
+        since = 0 if kind == "checkpoint" else since + 1
+        assert since < 5
+    assert [revision["number"] for revision in store.revisions] == list(range(1, 24))
+    for position, text in enumerate(saved):
+        assert store.restore(position) == text
+
+
+def test_store_is_read_back_from_disk(tmp_path):
+    path, store, saved = saved_history(tmp_path, 12)
+    reopened = RevisionStore(path)
+    assert reopened.revisions == store.revisions
+    assert reopened.restore(len(saved) - 1) == saved[-1]
+
+
+def test_torn_write_drops_last_revision(tmp_path):
+    path, store, saved = saved_history(tmp_path, 6)
+    with open(store.data_path, "r+b") as file:
+        file.truncate(store.revisions[-1]["offset"] + 1)
+    reopened = RevisionStore(path)
+    assert len(reopened.revisions) == 5
+    assert reopened.restore(4) == saved[4]
+
+
+def test_damaged_revision_is_reported(tmp_path):
+    path, store, saved = saved_history(tmp_path, 3)
+    store.revisions[1]["digest"] = digest("другой текст")
+    with pytest.raises(ValueError):
+        store.restore(1)
+
+
+def test_edits_after_snapshot_go_to_next_revision(tmp_path):
+    path = str(tmp_path / "doc.txt")
+    document = Document("abc")
+    history = DocumentHistory(document, path, digest("abc"))
+    document.insert(3, "d")
+    snapshot = document.snapshot()
+    history.mark()
+    # Правка во время записи не должна слиться со вставкой в снимке
+    document.insert(4, "e")
+    history.commit(path, snapshot, digest("abcd"))
+    history.commit(path, document.snapshot(), digest("abcde"))
+    history.close()
+    store = history.store
+    assert [revision["kind"] for revision in store.revisions] == ["checkpoint", "delta"]
+    assert store.restore(0) == "abcd"
+    assert store.restore(1) == "abcde"
+    assert os.path.isdir(os.path.join(str(tmp_path), ".doc.txt.history"))
@@ -0,0 +1,112 @@
+"""
+Тесты журнала правок и восстановления по нему
+"""
+
+import os
+import random
+
+import pytest
+
+import journal
+from document import Document
+from fileio import new_hasher
+from journal import EditJournal, pending_journals, replay_journal
+
+
+@pytest.fixture(autouse=True)
+def recovery_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "recovery"
+    monkeypatch.setattr(journal, "RECOVERY_DIR", str(directory))
+    monkeypatch.setattr(journal, "REGISTRY_PATH", str(directory / "journals.txt"))
+    return directory
+
+
+def random_edits(document, rng, count):
+    for _ in range(count):
+        length = len(document)
+        if length and rng.random() < 0.4:
+            start = rng.randrange(length)
+            document.delete(start, min(length, start + rng.randint(1, 10)))
+        else:
+            document.insert(rng.randint(0, length), rng.choice(["а", "bc", "\n", "слово ", "x\ny"]))
+
+
+def open_with_base(tmp_path, text):
+    path = tmp_path / "doc.txt"
+    path.write_bytes(text.encode("utf-8"))
+    hasher = new_hasher()
+    hasher.update(text.encode("utf-8"))
+    document = Document(text)
+    edit_journal = EditJournal(document, str(path), str(path), len(text), hasher.hexdigest())
+    return path, document, edit_journal
+
+
+def test_replay_restores_untitled_document():
+    rng = random.Random(7)
+    document = Document()
+    edit_journal = EditJournal(document)
+    for _ in range(5):
+        random_edits(document, rng, 40)
+        edit_journal.flush()
+    document.reset("заново\n")
+    random_edits(document, rng, 20)
+    edit_journal.close(discard=False)
+    restored, header, ops = replay_journal(edit_journal.path)
+    assert restored.get() == document.get()
+    assert header["base"] is None
+    assert len(ops) == 221
+
+
+def test_replay_applies_edits_to_base_file(tmp_path):
+    path, document, edit_journal = open_with_base(tmp_path, "исходный текст\n" * 50)
+    random_edits(document, random.Random(3), 200)
+    edit_journal.close(discard=False)
+    restored = replay_journal(edit_journal.path)[0]
+    assert restored.get() == document.get()
+    assert edit_journal.path == os.path.join(str(tmp_path), ".doc.txt.journal")
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    path, document, edit_journal = open_with_base(tmp_path, "abc")
+    document.insert(3, "def")
+    edit_journal.close(discard=False)
+    with open(edit_journal.path, "a", encoding="utf-8") as file:
+        file.write('["i", 0, "обо')
+    assert replay_journal(edit_journal.path)[0].get() == "abcdef"
+
+
+def test_changed_base_file_is_rejected(tmp_path):
+    path, document, edit_journal = open_with_base(tmp_path, "abc")
+    document.insert(0, "x")
+    edit_journal.close(discard=False)
+    path.write_text("abd")
+    with pytest.raises(ValueError):
+        replay_journal(edit_journal.path)
+
+
+def test_compaction_rebases_on_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(EditJournal, "COMPACT_THRESHOLD", 200)
+    path, document, edit_journal = open_with_base(tmp_path, "база\n" * 20)
+    rng = random.Random(11)
+    random_edits(document, rng, 50)
+    edit_journal.flush()
+    assert edit_journal.compactor is not None
+    # Правки во время записи снимка должны попасть в новый журнал
+    random_edits(document, rng, 50)
+    edit_journal.compactor.done.wait(10)
+    edit_journal.flush()
+    assert edit_journal.base_path in edit_journal.snapshot_paths
+    random_edits(document, rng, 50)
+    edit_journal.close(discard=False)
+    assert replay_journal(edit_journal.path)[0].get() == document.get()
+
+
+def test_pending_and_discarded_journals(tmp_path):
+    path, document, edit_journal = open_with_base(tmp_path, "abc")
+    assert pending_journals() == []
+    document.insert(0, "x")
+    edit_journal.flush()
+    assert [found[0] for found in pending_journals()] == [edit_journal.path]
+    edit_journal.close()
+    assert not os.path.exists(edit_journal.path)
+    assert pending_journals() == []
@@ -0,0 +1,96 @@
+"""
+Тесты индекса строк файла, отображенного в память
+"""
+
+import random
+
+import pytest
+
+from largefile import MappedFile
+
+
+def expected_checkpoints(data, stride):
+    offsets = [0]
+    lines = 0
+    for pos, byte in enumerate(data):
+        if byte == ord("\n"):
+            lines += 1
+            if lines % stride == 0:
+                offsets.append(pos + 1)
+    return offsets
+
+
+def expected_line_count(data):
+    lines = data.count(b"\n")
+    if not data or not data.endswith(b"\n"):
+        lines += 1
+    return lines
+
+
+@pytest.fixture
+def mapped(tmp_path):
+    opened = []
+
+    def open_mapped(data, stride=MappedFile.STRIDE):
+        path = tmp_path / f"file{len(opened)}.txt"
+        path.write_bytes(data)
+        mapped = MappedFile(str(path))
+        mapped.STRIDE = stride
+        opened.append(mapped)
+        mapped.build_index()
+        return mapped
+
+    yield open_mapped
+    for mapped in opened:
+        mapped.close()
+
+
+@pytest.mark.parametrize("lines", [0, 1, 255, 256, 257, 513])
+@pytest.mark.parametrize("tail", [b"", b"no newline"])
+def test_checkpoints_every_stride_lines(mapped, lines, tail):
+    data = b"".join(b"line %d\n" % number for number in range(lines)) + tail
+    result = mapped(data)
+    assert result.indexed
+    assert list(result.checkpoints) == expected_checkpoints(data, MappedFile.STRIDE)
+    assert result.line_count == expected_line_count(data)
+
+
+def test_random_files_small_stride(mapped):
+    rng = random.Random(3)
+    for _ in range(50):
+        data = b"".join(b"x" * rng.randint(0, 4) + rng.choice([b"\n", b"\r\n"])
+                        for _ in range(rng.randint(0, 60)))
+        if rng.random() < 0.5:
+            data += b"tail"
+        result = mapped(data, stride=rng.randint(1, 7))
+        assert list(result.checkpoints) == expected_checkpoints(data, result.STRIDE)
+        assert result.line_count == expected_line_count(data)
+
+
+def test_line_offsets_and_reads(mapped):
+    lines = [b"%d\xd0\xb9\n" % number for number in range(40)]
+    data = b"".join(lines)
+    result = mapped(data, stride=8)
+    for number in range(40):
+        assert result.line_offset(number) == sum(len(line) for line in lines[:number])
+    assert result.read_lines(3, 6) == b"".join(lines[3:6]).decode("utf-8")
+    assert result.line_offset(1000) == len(data)
+
+
+def test_tail_shorter_than_stride(mapped):
+    # Такой хвост раньше сканировался заново с каждой позиции (квадратичное время)
+    data = (b"z" * 999 + b"\n") * (MappedFile.STRIDE - 1)
+    result = mapped(data)
+    assert list(result.checkpoints) == [0]
+    assert result.line_count == MappedFile.STRIDE - 1
+
+
+def test_cancelled_index_stops(tmp_path):
+    path = tmp_path / "cancel.txt"
+    path.write_bytes(b"a\n" * 10000)
+    result = MappedFile(str(path))
+    result.STRIDE = 4
+    result.cancelled.set()
+    result.build_index()
+    assert not result.indexed
+    result.close()
@@ -0,0 +1,92 @@
+"""
+Тесты формата .wcd: сжатые отрезки тегов и сохранение с загрузкой
+"""
+
+import random
+
+import pytest
+
+from richformat import (MAGIC, build_header, decode_runs, encode_runs, header_prefix, is_rich_path,
+                         read_rich)
+
+
+def test_runs_round_trip():
+    rng = random.Random(5)
+    for _ in range(200):
+        ranges = []
+        pos = 0
+        for _ in range(rng.randint(0, 20)):
+            start = pos + rng.randint(0, 50)
+            pos = start + rng.randint(1, 50)
+            ranges.append((start, pos))
+        assert decode_runs(encode_runs(ranges)) == ranges
+
+
+def test_runs_are_relative():
+    assert encode_runs([(3, 5), (10, 11)]) == [3, 2, 5, 1]
+
+
+def test_rich_path():
+    assert is_rich_path("a/B.WCD")
+    assert not is_rich_path("a.txt")
+    assert not is_rich_path(None)
+
+
+def test_read_rejects_other_files(tmp_path):
+    path = tmp_path / "plain.wcd"
+    path.write_text("просто текст")
+    with pytest.raises(ValueError):
+        read_rich(str(path))
+
+
+def test_read_keeps_newlines(tmp_path):
+    path = tmp_path / "doc.wcd"
+    header = {"tags": [], "runs": {}}
+    path.write_bytes((header_prefix(header) + "a\r\nb\n").encode("utf-8"))
+    assert read_rich(str(path)) == (header, "a\r\nb\n")
+
+
+def formatted_editor(headless):
+    editor = headless.HeadlessEditor()
+    editor.text_area.insert("1.0", "жирный и курсив\n" * 30 + "конец")
+    for line in range(1, 31, 3):
+        editor.select(f"{line}.0", f"{line}.6")
+        editor.apply_char_style(weight="bold")
+        editor.select(f"{line}.9", f"{line + 1}.6")
+        editor.apply_char_style(slant="italic")
+    editor.text_area.tag_configure("custom", foreground="#ff0000")
+    editor.text_area.tag_add("custom", "2.0", "2.3", "5.1", "5.4")
+    return editor
+
+
+def test_save_and_load_keep_tags(tmp_path, headless):
+    path = str(tmp_path / "doc.wcd")
+    with formatted_editor(headless) as editor:
+        text = editor.text()
+        header = build_header(editor.text_area, editor.document.snapshot())
+        editor.save(path)
+    assert len(header["runs"]) == 3
+    with open(path, encoding="utf-8", newline="") as file:
+        assert file.readline() == MAGIC
+    assert read_rich(path)[1] == text
+    with headless.HeadlessEditor() as editor:
+        editor.open(path)
+        assert editor.text() == text
+        assert build_header(editor.text_area, editor.document.snapshot()) == header
+        # Загрузка тегов не правка: документ не изменен и отменять нечего
+        assert not editor.text_area.edit_modified()
+        assert editor.undo_manager.undo_stack == []
+
+
+def test_tag_operation_without_change_is_not_recorded(headless):
+    with formatted_editor(headless) as editor:
+        tag = editor.text_area.tag_names("1.2")[0]
+        editor.text_area.edit_modified(False)
+        depth = len(editor.undo_manager.undo_stack)
+        editor.text_area.tag_add(tag, "1.1", "1.4")
+        editor.text_area.tag_remove("custom", "3.0", "3.5")
+        assert not editor.text_area.edit_modified()
+        assert len(editor.undo_manager.undo_stack) == depth
+        editor.text_area.tag_remove("custom", "2.0", "2.1")
+        assert editor.text_area.edit_modified()
+        assert len(editor.undo_manager.undo_stack) == depth + 1
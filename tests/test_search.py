@@ -0,0 +1,73 @@
+"""
+Тесты поиска и замены по снимку документа
+"""
+
+import random
+import re
+
+from document import Document
+from search import SearchEngine, SearchQuery, find_replacements, offsets_to_indices
+
+
+TEXT = "Кот и кот, котенок.\nКОТ ловит мышь; код котика\n"
+
+
+def found(text, query):
+    snapshot = Document(text).snapshot()
+    engine = SearchEngine()
+    engine.search(snapshot, query)
+    return [text[start:end] for start, end in zip(engine.starts, engine.ends)]
+
+
+def test_case_filter():
+    assert found(TEXT, SearchQuery("кот")) == ["Кот", "кот", "кот", "КОТ", "кот"]
+    assert found(TEXT, SearchQuery("кот", case_sensitive=True)) == ["кот", "кот", "кот"]
+
+
+def test_whole_word():
+    assert found(TEXT, SearchQuery("кот", whole_word=True)) == ["Кот", "кот", "КОТ"]
+    assert found(TEXT, SearchQuery("кот", case_sensitive=True, whole_word=True)) == ["кот"]
+
+
+def test_regex_and_escaping():
+    assert found(TEXT, SearchQuery(r"ко[тд]\w*", regex=True)) == [
+        "Кот", "кот", "котенок", "КОТ", "код", "котика"]
+    assert found(TEXT, SearchQuery("^кот", regex=True)) == ["Кот", "КОТ"]
+    # Без флага выражения спецсимволы ищутся как текст
+    assert found("a.b a+b", SearchQuery(".")) == ["."]
+    assert found("aaa", SearchQuery("x*", regex=True)) == []
+
+
+def test_typing_filters_previous_hits():
+    rng = random.Random(14)
+    text = "".join(rng.choice(["ко", "т", "кот", " ", "\n", "котел"]) for _ in range(2000))
+    snapshot = Document(text).snapshot()
+    engine = SearchEngine()
+    for prefix in ("к", "ко", "кот", "коте", "котел"):
+        query = SearchQuery(prefix)
+        engine.search(snapshot, query)
+        expected = [match.span() for match in re.finditer(re.escape(prefix), text, re.IGNORECASE)]
+        assert list(zip(engine.starts, engine.ends)) == expected
+
+
+def test_hits_wrap_around():
+    engine = SearchEngine()
+    engine.search(Document("ab ab ab").snapshot(), SearchQuery("ab"))
+    assert engine.next_hit(0) == 1
+    assert engine.next_hit(6) == 0
+    assert engine.previous_hit(0) == 2
+
+
+def test_replacements_with_groups():
+    snapshot = Document("Иванов Иван, Петров Петр").snapshot()
+    query = SearchQuery(r"(\w+) (?P<name>\w+)", regex=True)
+    assert find_replacements(snapshot, query, r"\g<name> \1") == [
+        (0, 11, "Иван Иванов"), (13, 24, "Петр Петров")]
+    # Для обычного поиска шаблон - просто текст
+    assert find_replacements(snapshot, SearchQuery("Иван"), r"\1") == [(0, 4, r"\1"), (7, 11, r"\1")]
+
+
+def test_offsets_to_indices():
+    snapshot = Document("ab\ncd\n\nef").snapshot()
+    assert offsets_to_indices(snapshot.line_starts(), [0, 2, 3, 6, 7, 9]) == [
+        "1.0", "1.2", "2.0", "3.0", "4.0", "4.2"]
@@ -0,0 +1,109 @@
+"""
+Тесты индекса поиска: кандидаты покрывают все совпадения полного прохода
+"""
+
+import random
+
+import pytest
+
+import search_index
+from document import Document
+from search import SearchQuery
+from search_index import SearchIndex
+
+
+WORDS = ["альфа", "бета", "Гамма", "delta", "EPSILON", "zeta", "эта", "тета"]
+QUERIES = ["альфа", "ГАММ", "lta", "psilon zet", "эта", "бета тета", "zzz"]
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(search_index, "BLOCK_CHARS", 64)
+    monkeypatch.setattr(search_index, "OVERLAP", 16)
+
+
+def random_text(rng, words):
+    return "".join(rng.choice(WORDS) + rng.choice([" ", " ", "\n", ", "]) for _ in range(words))
+
+
+def built_index(document, cache_path=None):
+    index = SearchIndex(document, cache_path).start()
+    assert index.done.wait(10)
+    assert index.error is None
+    index.finish()
+    return index
+
+
+def assert_covers(index, document, query):
+    snapshot = document.snapshot()
+    ranges = index.candidates(query, snapshot)
+    assert ranges is not None
+    for match in query.pattern.finditer(snapshot.text()):
+        assert any(start <= match.start() < end for start, end in ranges), (query.text, match.start())
+
+
+def test_candidates_cover_matches():
+    document = Document(random_text(random.Random(1), 400))
+    index = built_index(document)
+    for text in QUERIES:
+        assert_covers(index, document, SearchQuery(text))
+    assert_covers(index, document, SearchQuery("эта", whole_word=True))
+
+
+def test_missing_term_has_no_candidates():
+    document = Document(random_text(random.Random(2), 200))
+    index = built_index(document)
+    assert index.candidates(SearchQuery("zzz"), document.snapshot()) == []
+
+
+def test_candidates_follow_edits():
+    rng = random.Random(3)
+    document = Document(random_text(rng, 300))
+    index = built_index(document)
+    for step in range(300):
+        length = len(document)
+        if length and rng.random() < 0.4:
+            start = rng.randrange(length)
+            document.delete(start, min(length, start + rng.randint(1, 200)))
+        else:
+            document.insert(rng.randint(0, length), random_text(rng, rng.randint(1, 60)))
+        if step % 7 == 0:
+            index.refresh(blocks=rng.randint(1, 5))
+        for text in QUERIES:
+            assert_covers(index, document, SearchQuery(text))
+
+
+def test_edits_during_build_are_applied():
+    rng = random.Random(4)
+    document = Document(random_text(rng, 300))
+    index = SearchIndex(document)
+    document.insert(10, "gamma альфа")
+    document.delete(100, 150)
+    index.start().done.wait(10)
+    index.finish()
+    assert index.version == document.version
+    assert_covers(index, document, SearchQuery("альфа"))
+
+
+def test_unsupported_queries_need_full_scan():
+    document = Document(random_text(random.Random(5), 50))
+    index = built_index(document)
+    snapshot = document.snapshot()
+    assert index.candidates(SearchQuery("эт"), snapshot) is None
+    assert index.candidates(SearchQuery("эт.", regex=True), snapshot) is None
+    document.reset("новый текст")
+    assert index.candidates(SearchQuery("новый"), document.snapshot()) is None
+
+
+def test_cache_is_reused_for_same_text(tmp_path):
+    text = random_text(random.Random(6), 200)
+    path = str(tmp_path / "index")
+    first = built_index(Document(text), path)
+    assert not first.from_cache
+    document = Document(text)
+    second = built_index(document, path)
+    assert second.from_cache
+    assert second.trigrams == first.trigrams and second.words == first.words
+    for query in QUERIES:
+        assert_covers(second, document, SearchQuery(query))
+    assert not built_index(Document(text + "!"), path).from_cache
@@ -0,0 +1,94 @@
+"""
+Тесты реестра стилей: один тег на составной стиль
+"""
+
+import pytest
+
+from styles import Style
+
+
+BASE = Style.default("Arial", 12)
+
+
+@pytest.fixture
+def text_area(headless):
+    text_area = headless.HeadlessText(headless.HeadlessTcl())
+    text_area.insert("1.0", "первая строка\nвторая строка")
+    return text_area
+
+
+@pytest.fixture
+def registry(text_area):
+    from styles import StyleRegistry
+    return StyleRegistry(text_area)
+
+
+def styles_of(registry, text_area, first, last):
+    """Стиль каждого символа [first, last)"""
+    count = text_area.count(first, last, "chars")[0]
+    return [registry.style_at(f"{first}+{number}c", BASE) for number in range(count)]
+
+
+def test_equal_styles_share_a_tag(registry, text_area):
+    bold = BASE._replace(weight="bold")
+    assert registry.tag_for(bold) == registry.tag_for(Style.default("Arial", 12)._replace(weight="bold"))
+    assert registry.tag_for(bold) != registry.tag_for(bold._replace(slant="italic"))
+    assert text_area.tag_cget(registry.tag_for(bold), "font") == "Arial 12 bold"
+
+
+def test_style_options_round_trip(text_area):
+    style = Style("Courier New", 14, "bold", "italic", True, False, "#ff0000", None, 4)
+    options = {name: "" for name in ("underline", "overstrike", "foreground", "background", "offset")}
+    options.update(style.options())
+    assert Style.from_options(text_area.tk.splitlist, options) == style
+
+
+def test_segments_split_by_style(registry, text_area):
+    bold = registry.tag_for(BASE._replace(weight="bold"))
+    italic = registry.tag_for(BASE._replace(slant="italic"))
+    text_area.tag_add(bold, "1.0", "1.6")
+    text_area.tag_add(italic, "1.8", "2.3")
+    assert registry.segments("1.2", "2.5") == [
+        ("1.2", "1.6", bold), ("1.6", "1.8", None), ("1.8", "2.3", italic), ("2.3", "2.5", None)]
+
+
+def test_apply_combines_changes(registry, text_area):
+    registry.apply("1.0", "1.6", BASE, weight="bold")
+    registry.apply("1.3", "1.10", BASE, slant="italic")
+    styles = styles_of(registry, text_area, "1.0", "1.10")
+    assert [style.weight for style in styles] == ["bold"] * 6 + ["normal"] * 4
+    assert [style.slant for style in styles] == ["roman"] * 3 + ["italic"] * 7
+    # На каждом символе не больше одного тега стиля
+    for number in range(10):
+        assert len([tag for tag in text_area.tag_names(f"1.{number}") if tag in registry.styles]) == 1
+
+
+def test_apply_back_to_base_removes_tag(registry, text_area):
+    registry.apply("1.0", "1.6", BASE, weight="bold")
+    registry.apply("1.0", "1.6", BASE, weight="normal")
+    assert text_area.tag_names("1.2") == ()
+    registry.apply("1.0", "1.6", BASE, size=20)
+    # Новый обычный стиль совпал с тегом: тег тоже снимается
+    registry.apply("1.0", "1.3", BASE._replace(size=20), family="Arial")
+    assert text_area.tag_names("1.1") == ()
+    assert registry.style_at("1.4", BASE).size == 20
+
+
+def test_sweep_removes_unused_tags(registry, text_area):
+    registry.apply("1.0", "1.6", BASE, weight="bold")
+    registry.apply("1.0", "1.6", BASE, slant="italic")
+    assert len(registry.styles) == 2
+    assert registry.sweep() == 1
+    assert list(registry.styles.values()) == [BASE._replace(weight="bold", slant="italic")]
+    assert [tag for tag in text_area.tag_names() if tag in registry.styles] == list(registry.styles)
+    assert registry.sweep() == 0
+
+
+def test_adopt_reads_loaded_tags(registry, text_area):
+    from styles import StyleRegistry
+    registry.apply("1.0", "1.6", BASE, weight="bold", foreground="#00ff00")
+    registry.apply("2.0", "2.6", BASE, underline=True)
+    adopted = StyleRegistry(text_area)
+    adopted.adopt()
+    assert adopted.styles == registry.styles
+    assert adopted.next_id == registry.next_id
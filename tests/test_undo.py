@@ -0,0 +1,136 @@
+"""
+Тесты отмены и повтора: текст и форматирование возвращаются шаг за шагом
+"""
+
+import json
+import random
+
+import pytest
+
+from undo import UndoManager
+
+
+def state(editor):
+    """Текст и форматирование без имен тегов: имена стилей могут смениться"""
+    from richformat import build_header, decode_runs
+    header = build_header(editor.text_area, editor.document.snapshot())
+    options = {tag: json.dumps(config, sort_keys=True) for tag, config in header["tags"]}
+    runs = sorted((options[tag], decode_runs(encoded)) for tag, encoded in header["runs"].items())
+    return editor.text(), runs
+
+
+def random_step(editor, rng):
+    text_area = editor.text_area
+    length = len(editor.document)
+    kind = rng.choice(["insert", "delete", "style", "style", "tag", "untag"])
+    start = rng.randint(0, length)
+    end = min(length, start + rng.randint(1, 30))
+    first, last = editor.offset_index(start), editor.offset_index(end)
+    if kind == "insert":
+        text_area.insert(first, rng.choice(["слово ", "a", "\n", "две\nстроки"]))
+    elif kind == "delete":
+        text_area.delete(first, last)
+    elif kind == "style" and end > start:
+        editor.select(first, last)
+        editor.apply_char_style(**rng.choice([{"weight": "bold"}, {"weight": "normal"},
+                                              {"slant": "italic"}, {"underline": True}]))
+    elif kind == "tag":
+        text_area.tag_add("custom", first, last)
+    else:
+        text_area.tag_remove("custom", first, last)
+    text_area.edit_separator()
+
+
+@pytest.fixture
+def editor(headless):
+    with headless.HeadlessEditor() as editor:
+        editor.text_area.tag_configure("custom", foreground="#ff0000")
+        editor.text_area.insert("1.0", "начальный текст документа\n" * 10)
+        editor.text_area.edit_reset()
+        yield editor
+
+
+def test_undo_and_redo_walk_through_states(editor):
+    rng = random.Random(8)
+    stack = editor.undo_manager.undo_stack
+    states = [state(editor)]
+    for _ in range(150):
+        depth = len(stack)
+        random_step(editor, rng)
+        if len(stack) > depth:
+            states.append(state(editor))
+    for expected in reversed(states[:-1]):
+        editor.undo()
+        assert state(editor) == expected
+    editor.undo()
+    assert state(editor) == states[0]
+    for expected in states[1:]:
+        editor.redo()
+        assert state(editor) == expected
+
+
+def test_undo_after_sweep_restores_style(editor):
+    editor.select("1.0", "1.9")
+    editor.apply_char_style(weight="bold")
+    bold = state(editor)
+    editor.apply_char_style(weight="normal")
+    plain = state(editor)
+    assert plain[1] == []
+    editor.compact_tags_slice()
+    assert editor.run(until=lambda: editor.tag_compactor.steps is None, timeout=10)
+    assert editor.style_registry.styles == {}
+    editor.undo()
+    assert state(editor) == bold
+    editor.redo()
+    assert state(editor) == plain
+
+
+def test_undo_restores_formatting_of_deleted_text(editor):
+    editor.select("1.2", "1.7")
+    editor.apply_char_style(weight="bold")
+    editor.text_area.tag_add("custom", "1.5", "2.3")
+    formatted = state(editor)
+    for column in range(7, 1, -1):
+        # Backspace по одному символу сливается в одну запись
+        editor.text_area.delete(f"1.{column}-1c")
+    assert len(editor.undo_manager.undo_stack[-1].ops) == 1
+    editor.text_area.delete("1.0", "3.0")
+    editor.undo()
+    editor.undo()
+    assert state(editor) == formatted
+
+
+def test_undo_restores_deleted_custom_tag(editor):
+    editor.text_area.tag_add("custom", "2.0", "2.5")
+    tagged = state(editor)
+    editor.text_area.edit_separator()
+    editor.text_area.tag_remove("custom", "1.0", "end")
+    editor.text_area.tag_delete("custom")
+    editor.undo()
+    assert state(editor) == tagged
+
+
+def test_change_case_is_one_step(editor):
+    before = state(editor)
+    editor.select("1.0", "1.9")
+    editor.apply_char_style(weight="bold")
+    bold = state(editor)
+    editor.change_case()
+    assert editor.text().startswith("Начальный")
+    editor.undo()
+    assert state(editor) == bold
+    editor.redo()
+    assert editor.text().startswith("Начальный")
+    editor.undo()
+    editor.undo()
+    assert state(editor) == before
+
+
+def test_keystrokes_are_coalesced():
+    manager = UndoManager()
+    for offset, char in enumerate("слово"):
+        manager.on_edit("insert", offset, char)
+    assert len(manager.undo_stack) == 1
+    manager.separator()
+    manager.on_edit("insert", 5, " ")
+    assert len(manager.undo_stack) == 2
@@ -0,0 +1,261 @@
+"""
+Модуль отмены правок - собственный стек отмены вместо встроенного в Tk
+
+Операции записи:
+    ["i", смещение, текст]              вставка
+    ["d", смещение, текст, теги]        удаление (текст - удаленный); теги -
+                                        [тег, начало, конец, настройки] его
+                                        форматирования от смещения, если оно было
+    ["t", тег, добавлен, отрезки, было, настройки]
+                                        tag add/remove: отрезки операции, отрезки
+                                        тега внутри них до нее и настройки тега
+                                        (поля Style для тегов стилей), чтобы
+                                        удаленный уборкой тег можно было вернуть
+Набор символов подряд сливается в одну запись до конца слова. Когда
+записи занимают больше бюджета, старые сжимаются, затем выбрасываются.
+"""
+
+from contextlib import contextmanager
+import json
+import sys
+import zlib
+
+
+# Команды и настройки виджета Text, которые обслуживает UndoManager
+UNDO_SUBCOMMANDS = ("undo", "redo", "separator", "reset", "canundo", "canredo")
+UNDO_OPTIONS = ("-undo", "-autoseparators", "-maxundo")
+
+# Оценка служебных расходов на операцию и запись, байт
+OP_OVERHEAD = 120
+ENTRY_OVERHEAD = 200
+
+
+def op_size(op):
+    if op[0] == "t":
+        return OP_OVERHEAD + 64 * (len(op[3]) + len(op[4]))
+    return OP_OVERHEAD + sys.getsizeof(op[2]) + 64 * len(op[3] if len(op) > 3 else ())
+
+
+class UndoEntry:
+    """Запись стека: операции одного действия, возможно сжатые"""
+
+    __slots__ = ("ops", "packed", "size")
+
+    def __init__(self):
+        self.ops = []
+        self.packed = None
+        self.size = ENTRY_OVERHEAD
+
+    def pack(self):
+        self.packed = zlib.compress(json.dumps(self.ops, ensure_ascii=False).encode("utf-8"), 1)
+        self.ops = None
+        self.size = ENTRY_OVERHEAD + len(self.packed)
+
+    def unpack(self):
+        if self.ops is None:
+            self.ops = json.loads(zlib.decompress(self.packed).decode("utf-8"))
+            self.packed = None
+            self.size = ENTRY_OVERHEAD + sum(op_size(op) for op in self.ops)
+        return self.ops
+
+
+class UndoManager:
+    """Стеки отмены и повтора с бюджетом памяти
+
+    Правки текста приходят слушателем документа, операции с тегами - из
+    прокси текстовой области. Отмену выполняет apply(op, reverse),
+    переданная вызывающим; записанные в это время правки не попадают в стек.
+    """
+
+    def __init__(self, budget=64 << 20):
+        self.budget = budget
+        self.undo_stack = []
+        self.redo_stack = []
+        self.enabled = True
+        self.autoseparators = True
+        self.replaying = False
+        self.open = False
+        self.memory = 0
+        self.dropped = 0
+        # Теги следующего удаления; их выставляет прокси виджета перед правкой документа
+        self.deleted_tags = None
+
+    def recording(self):
+        return self.enabled and not self.replaying
+
+    # === ЗАПИСЬ ===
+
+    def on_edit(self, kind, offset, text):
+        """Слушатель документа"""
+        tags, self.deleted_tags = self.deleted_tags, None
+        if kind == "reset":
+            self.reset()
+        elif self.recording():
+            op = ["i" if kind == "insert" else "d", offset, text]
+            if kind == "delete" and tags:
+                op.append(tags)
+            self.record(op)
+
+    def record_tag(self, tag, added, spans, before, config=None):
+        if self.recording():
+            self.record(["t", tag, added, spans, before, config])
+
+    def record(self, op):
+        if self.redo_stack:
+            self.memory -= sum(entry.size for entry in self.redo_stack)
+            self.redo_stack = []
+        entry = self.undo_stack[-1] if self.open and self.undo_stack else None
+        if entry is not None and self.autoseparators:
+            joined = self.join(entry, op)
+            if joined is None:
+                entry = None
+            elif joined:
+                self.enforce_budget()
+                return
+        if entry is None:
+            entry = UndoEntry()
+            self.undo_stack.append(entry)
+            self.memory += entry.size
+            self.open = True
+        entry.ops.append(op)
+        size = op_size(op)
+        entry.size += size
+        self.memory += size
+        self.enforce_budget()
+
+    def join(self, entry, op):
+        """Как op продолжает открытую запись при автоматических разделителях
+
+        None - нужна новая запись, False - op добавляется в запись, True - op
+        слит с последней операцией (набор и удаление по одному символу до
+        конца слова).
+        """
+        last = entry.ops[-1]
+        if op[0] == "t" or last[0] == "t" or len(op[2]) != 1:
+            return None
+        char = op[2]
+        if op[0] == "i" and last[0] == "d":
+            # Набор поверх выделения - одно действие с его удалением
+            return False if len(entry.ops) == 1 and op[1] == last[1] else None
+        if op[0] == "i":
+            if op[1] != last[1] + len(last[2]) or (not char.isspace() and last[2][-1].isspace()):
+                return None
+            self.grow(entry, last, last[2] + char)
+            return True
+        if last[0] != "d":
+            return None
+        if op[1] + 1 == last[1] and not (char.isspace() and not last[2][0].isspace()):
+            # Backspace
+            self.join_tags(entry, last, op, 1, 0)
+            last[1] = op[1]
+            self.grow(entry, last, char + last[2])
+            return True
+        if op[1] == last[1] and not (char.isspace() and not last[2][-1].isspace()):
+            # Delete
+            self.join_tags(entry, last, op, 0, len(last[2]))
+            self.grow(entry, last, last[2] + char)
+            return True
+        return None
+
+    def join_tags(self, entry, last, op, last_shift, op_shift):
+        """Теги удаления op, слитого с last, со сдвигами в координатах слитой операции"""
+        if len(op) < 4 and (len(last) < 4 or not last_shift):
+            return
+        tags = [[tag, start + last_shift, end + last_shift, config]
+                for tag, start, end, config in (last[3] if len(last) > 3 else ())]
+        tags += [[tag, start + op_shift, end + op_shift, config]
+                 for tag, start, end, config in (op[3] if len(op) > 3 else ())]
+        delta = 64 * (len(tags) - (len(last[3]) if len(last) > 3 else 0))
+        last[3:] = [tags]
+        entry.size += delta
+        self.memory += delta
+
+    def grow(self, entry, op, text):
+        delta = sys.getsizeof(text) - sys.getsizeof(op[2])
+        op[2] = text
+        entry.size += delta
+        self.memory += delta
+
+    def separator(self):
+        self.open = False
+
+    @contextmanager
+    def group(self):
+        """Все операции внутри - одна запись"""
+        autoseparators = self.autoseparators
+        self.separator()
+        self.autoseparators = False
+        try:
+            yield
+        finally:
+            self.autoseparators = autoseparators
+            self.separator()
+
+    def reset(self):
+        self.undo_stack = []
+        self.redo_stack = []
+        self.open = False
+        self.memory = 0
+
+    def enforce_budget(self):
+        """Сжать, затем выбросить самые старые записи; последняя остается всегда"""
+        if self.memory <= self.budget:
+            return
+        for entry in self.undo_stack[:-1]:
+            if entry.packed is None:
+                before = entry.size
+                entry.pack()
+                self.memory += entry.size - before
+                if self.memory <= self.budget:
+                    return
+        while self.memory > self.budget and len(self.undo_stack) > 1:
+            self.memory -= self.undo_stack.pop(0).size
+            self.dropped += 1
+
+    # === ОТМЕНА И ПОВТОР ===
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self, apply):
+        if not self.undo_stack:
+            return False
+        entry = self.undo_stack.pop()
+        self.open = False
+        self.replay(entry, apply, reverse=True)
+        self.redo_stack.append(entry)
+        return True
+
+    def redo(self, apply):
+        if not self.redo_stack:
+            return False
+        entry = self.redo_stack.pop()
+        self.open = False
+        self.replay(entry, apply, reverse=False)
+        self.undo_stack.append(entry)
+        return True
+
+    def replay(self, entry, apply, reverse):
+        before = entry.size
+        ops = entry.unpack()
+        self.memory += entry.size - before
+        self.replaying = True
+        try:
+            for op in (reversed(ops) if reverse else ops):
+                apply(op, reverse)
+        finally:
+            self.replaying = False
+
+    def stats(self):
+        """Занятая память и состояние стеков"""
+        return {
+            "memory": self.memory,
+            "budget": self.budget,
+            "undo": len(self.undo_stack),
+            "redo": len(self.redo_stack),
+            "packed": sum(1 for entry in self.undo_stack + self.redo_stack if entry.packed is not None),
+            "dropped": self.dropped,
+        }